@@ -0,0 +1,41 @@
+"""Compare the fast and BeautifulSoup HTML backends on the captured CMI pages.
+
+Usage: python scripts/bench_parse_backends.py [--repeat N]
+"""
+import argparse
+import logging
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from uvr_parse import parse_html_bs, parse_html_fast  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='parses per backend and page')
+    parser.add_argument('--fixtures', default=str(Path(__file__).resolve().parent.parent / 'debug_html'))
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    pages = [p.read_text(encoding='utf-8') for p in sorted(Path(args.fixtures).glob('*.html'))]
+    if not pages:
+        raise SystemExit(f'no .html fixtures in {args.fixtures}')
+    for html in pages:
+        fast = parse_html_fast(html)
+        if fast != parse_html_bs(html):
+            raise SystemExit('backends disagree on a fixture; fix that before benchmarking')
+
+    results = {}
+    for name, func in (('bs4', parse_html_bs), ('fast', parse_html_fast)):
+        seconds = timeit.timeit(lambda: [func(html) for html in pages], number=args.repeat)
+        results[name] = seconds
+        per_page = seconds / (args.repeat * len(pages))
+        print(f'{name:5s} {per_page * 1e6:9.1f} us/page  {1 / per_page:9.0f} pages/s')
+    print(f'speedup {results["bs4"] / results["fast"]:.1f}x over {len(pages)} pages')
+
+
+if __name__ == '__main__':
+    main()
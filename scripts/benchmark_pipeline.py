@@ -0,0 +1,190 @@
+"""Per-stage benchmark of the fetch -> parse -> combine -> publish pipeline.
+
+Runs without a CMI or broker: pages come from the `debug_html/` captures and
+from synthetic TA-Designer exports (`uvr_synthetic`), publishing goes to a
+fake MQTT client. For every stage and input size it reports throughput and
+memory (peak traced KiB and net allocated blocks per iteration).
+
+Usage:
+    python scripts/benchmark_pipeline.py                 # captures + 1k/5k/10k positions
+    python scripts/benchmark_pipeline.py --sizes 1000 --min-time 0.5
+    python scripts/benchmark_pipeline.py --json > bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from contextlib import redirect_stdout
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from uvr_layout import compile_layout  # noqa: E402
+from uvr_mqtt import EntityRegistry, StateDeltaFilter, send_values  # noqa: E402
+from uvr_parse import (  # noqa: E402
+    MyHTMLParser,
+    _decode,
+    _scan_fragments,
+    combine_html_xml,
+    decode_cache_clear,
+    decode_fragments,
+    filter_empty_values,
+    iter_pos_fragments,
+    parse_html_bs,
+    read_xml,
+    separate,
+)
+from uvr_synthetic import SyntheticSchema  # noqa: E402
+
+
+class FakeMQTTClient:
+    """Counts publishes like the FakeClient in tests/test_mqtt_integration.py."""
+
+    def __init__(self):
+        self.count = 0
+
+    def publish(self, topic, payload, retain=False):
+        self.count += 1
+
+
+class Case:
+    """One input: pages of HTML plus their (beschreibung, id_conf, xml_dict) layout."""
+
+    def __init__(self, name, pages, layouts, root=None):
+        self.name = name
+        self.pages = pages
+        self.layouts = layouts
+        self.root = root
+        self.fragments = [text for html in pages for _pos, _raw, text, _lines in iter_pos_fragments(html)]
+
+
+def capture_case(directory):
+    pages = [p.read_text(encoding='utf-8') for p in sorted(Path(directory).glob('*.html'))]
+    layouts = []
+    for html in pages:
+        ids, content, _html_dict, _lines = parse_html_bs(html)
+        xml_dict = {}
+        for pos in ids:
+            is_modus = '%' in content[pos] and ('AUTO' in content[pos] or 'HAND' in content[pos])
+            xml_dict[f'Modus (Hand/Auto) {pos}' if is_modus else f'Wert {pos}'] = pos
+        layouts.append((list(xml_dict), list(range(len(ids))), xml_dict))
+    return Case(f'captures({len(pages)} pages)', pages, layouts)
+
+
+def synthetic_case(positions, seed=0):
+    schema = SyntheticSchema.generate([positions], seed=seed)
+    root = ET.fromstring(schema.xml())
+    layouts = [page[:3] for page in compile_layout(root)]
+    pages = [schema.html(0, random.Random(seed))]
+    return Case(f'synthetic({positions} pos)', pages, layouts, root=root)
+
+
+def measure(func, min_time):
+    """Return (iterations, seconds, peak traced KiB, net allocated blocks) for func."""
+    func()  # warm-up (imports, caches that production keeps warm too)
+    iterations = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        iterations += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    # net blocks still allocated after one call (growth here means a leak/cache)
+    blocks_before = sys.getallocatedblocks()
+    func()
+    blocks = sys.getallocatedblocks() - blocks_before
+    tracemalloc.start()
+    func()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return iterations, elapsed, peak / 1024, blocks
+
+
+def stages(case, devnull):
+    combined = []
+
+    def combine(backend):
+        def run():
+            with redirect_stdout(devnull):
+                combined[:] = [combine_html_xml(MyHTMLParser, *layout, html, backend=backend)
+                               for layout, html in zip(case.layouts, case.pages)]
+        return run
+
+    def cold_separate():
+        for fragment in case.fragments:
+            _decode(fragment)
+
+    def warm_separate():
+        for fragment in case.fragments:
+            separate(fragment)
+
+    yield 'separate (uncached)', 'fragments', len(case.fragments), cold_separate
+    decode_cache_clear()
+    yield 'separate (cached)', 'fragments', len(case.fragments), warm_separate
+    yield 'decode_fragments (uncached)', 'fragments', len(case.fragments), lambda: _scan_fragments(case.fragments)
+    yield 'decode_fragments (cached)', 'fragments', len(case.fragments), lambda: decode_fragments(case.fragments)
+    if case.root is not None:
+        yield 'read_xml', 'pages', len(case.pages), lambda: [read_xml(case.root, s) for s in range(len(case.pages))]
+        yield 'compile_layout', 'pages', len(case.pages), lambda: compile_layout(case.root)
+    yield 'combine_html_xml (bs4)', 'pages', len(case.pages), combine('bs4')
+    yield 'combine_html_xml (fast)', 'pages', len(case.pages), combine('fast')
+    combine('fast')()
+    yield 'filter_empty_values', 'pages', len(combined), lambda: filter_empty_values(combined)
+    values = filter_empty_values(combined)
+    messages = sum(len(page) for page in values)
+    client = FakeMQTTClient()
+    registry = EntityRegistry('UVR')
+    yield 'send_values', 'messages', messages, lambda: send_values(client, 'UVR', values, registry=registry)
+    delta = StateDeltaFilter(heartbeat=0)
+    yield 'send_values (unchanged, delta)', 'messages', messages, \
+        lambda: send_values(client, 'UVR', values, delta=delta, registry=registry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark each stage of the UVR pipeline.')
+    parser.add_argument('--fixtures', default=str(ROOT / 'debug_html'), help='directory of captured CMI pages')
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 5000, 10000],
+                        help='positions per synthetic page')
+    parser.add_argument('--min-time', type=float, default=0.3, help='seconds to run each stage')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    cases = []
+    if any(Path(args.fixtures).glob('*.html')):
+        cases.append(capture_case(args.fixtures))
+    cases.extend(synthetic_case(n) for n in args.sizes)
+
+    results = []
+    with open(os.devnull, 'w') as devnull:
+        for case in cases:
+            for stage, unit, items, func in stages(case, devnull):
+                iterations, seconds, peak_kib, blocks = measure(func, args.min_time)
+                results.append({
+                    'input': case.name,
+                    'stage': stage,
+                    'unit': unit,
+                    'items': items,
+                    'rate': items * iterations / seconds,
+                    'ms_per_iteration': seconds / iterations * 1000,
+                    'peak_kib': round(peak_kib, 1),
+                    'net_blocks': blocks,
+                })
+                if not args.json:
+                    r = results[-1]
+                    print(f"{r['input']:24s} {r['stage']:32s} {r['rate']:12.1f} {unit + '/s':12s}"
+                          f" {r['ms_per_iteration']:9.2f} ms {r['peak_kib']:9.1f} KiB {blocks:7d} blk")
+    if args.json:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == '__main__':
+    main()
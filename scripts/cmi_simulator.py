@@ -0,0 +1,77 @@
+"""Run one or more simulated C.M.I.s for load and latency tests.
+
+Usage:
+    python scripts/cmi_simulator.py --xml Neu.xml --port 8080
+    python scripts/cmi_simulator.py --synthetic 200 200 --write-xml sim.xml --controllers 3 --port 8080
+    python scripts/cmi_simulator.py --records debug_html --latency 0.2 --jitter 0.1 --error-rate 0.05
+
+Point ``uvr.ip`` (or an entry of ``uvr.controllers``) at the printed
+``host:port`` addresses; use the same XML as the simulator.
+"""
+import argparse
+import logging
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from uvr_replay import load_records  # noqa: E402
+from uvr_simulator import RecordedPages, SimulatedCMI, Simulator, SyntheticPages  # noqa: E402
+from uvr_synthetic import SyntheticSchema  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--xml', help='TA-Designer XML to generate values for')
+    source.add_argument('--synthetic', type=int, nargs='+', metavar='POSITIONS',
+                        help='made-up pages with this many value objects each')
+    source.add_argument('--records', help='capture archive or debug_html directory to serve')
+    parser.add_argument('--write-xml', help='write the XML of a --synthetic schema here')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--controllers', type=int, default=1, help='number of controllers (consecutive ports)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help='port of the first controller')
+    parser.add_argument('--user', default='user')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--latency', type=float, default=0.0, help='response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+- seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of HTTP 500 responses')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='share of requests that never answer')
+    parser.add_argument('--hang', type=float, default=30.0, help='seconds a timed-out request is held open')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    schema = None
+    if args.xml:
+        schema = SyntheticSchema.from_xml(ET.parse(args.xml).getroot())
+    elif args.synthetic:
+        schema = SyntheticSchema.generate(args.synthetic, seed=args.seed)
+        if args.write_xml:
+            Path(args.write_xml).write_text(schema.xml(), encoding='utf-8')
+    records = load_records(args.records) if args.records else None
+
+    simulators = []
+    for i in range(args.controllers):
+        pages = SyntheticPages(schema, seed=args.seed + i) if schema is not None else RecordedPages(records)
+        cmi = SimulatedCMI(pages, user=args.user, password=args.password, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, timeout_rate=args.timeout_rate, hang=args.hang,
+                           seed=args.seed + i)
+        simulators.append(Simulator(cmi, host=args.host, port=args.port + i).start())
+        logging.info('Simulated CMI %d with %d pages on %s', i, len(pages), simulators[-1].address)
+    try:
+        while True:
+            time.sleep(60)
+            for sim in simulators:
+                logging.info('%s %s', sim.address, sim.cmi.counters)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for sim in simulators:
+            sim.stop()
+
+
+if __name__ == '__main__':
+    main()
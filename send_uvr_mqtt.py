@@ -4,11 +4,19 @@ import os
 import signal
 import threading
 from pathlib import Path
-from time import sleep
 import logging
 import pprint
-
-from uvr import filter_empty_values, read_data
+from typing import List
+
+from uvr import page_cache_stats
+from uvr_capture import capture_from_config, capture_stats, close as close_capture
+from uvr_controllers import ControllerPool, controllers_from_config
+from uvr_metrics import start_from_config as start_metrics_server
+from uvr_profile import profiler_from_config
+from uvr_publisher import publisher_from_config
+from uvr_spool import SpoolClient, drain_options, spool_from_config
+from uvr_fetch import fetcher_stats
+from uvr_parse import decode_cache_info
 from uvr_mqtt import (
     build_mqtt_client,
     create_config,
@@ -16,7 +24,10 @@ from uvr_mqtt import (
     send_config,
     sanitize_name,
     check_mqtt_connection,
+    wait_connected,
+    wait_for_acks,
 )
+from uvr_startup import StartupReport
 
 logger = logging.getLogger("UVR2MQTT")
 logger.setLevel(logging.INFO)
@@ -61,11 +72,71 @@ def load_configs():
     mqtt.setdefault("port", int(os.environ.get("MQTT_PORT", 1883)))
     mqtt.setdefault("user", os.environ.get("MQTT_USER", ""))
     mqtt.setdefault("password", os.environ.get("MQTT_PASSWORD", ""))
+    # publish state topics only on change (per-unit deadbands) plus a heartbeat in seconds
+    mqtt.setdefault("change_only", os.environ.get("MQTT_CHANGE_ONLY", "1").lower() in ("1", "true", "yes"))
+    mqtt.setdefault("deadbands", {})
+    mqtt.setdefault("heartbeat", float(os.environ.get("MQTT_HEARTBEAT", 300)))
+    # "entity": one state topic per entity; "device": one JSON state document per device and value_templates
+    mqtt.setdefault("state_mode", os.environ.get("MQTT_STATE_MODE", "entity"))
+    # hashes of published discovery configs; "" republishes everything on every start
+    mqtt.setdefault("discovery_manifest", os.environ.get("MQTT_DISCOVERY_MANIFEST", "discovery_manifest.json"))
+    # background reconnects: paho's doubling backoff between these bounds (seconds); wait for the first CONNACK
+    mqtt.setdefault("reconnect_min_delay", float(os.environ.get("MQTT_RECONNECT_MIN_DELAY", 1)))
+    mqtt.setdefault("reconnect_max_delay", float(os.environ.get("MQTT_RECONNECT_MAX_DELAY", 60)))
+    mqtt.setdefault("connect_timeout", float(os.environ.get("MQTT_CONNECT_TIMEOUT", 60)))
+    # seconds to wait after publishing discovery configs of new entities, before their first states
+    mqtt.setdefault("discovery_settle", float(os.environ.get("MQTT_DISCOVERY_SETTLE", 0)))
+    # QoS per message class, in-flight window and queued-state bound of uvr_publisher
+    qos = mqtt.setdefault("qos", {})
+    qos.setdefault("discovery", int(os.environ.get("MQTT_QOS_DISCOVERY", 1)))
+    qos.setdefault("state", int(os.environ.get("MQTT_QOS_STATE", 0)))
+    qos.setdefault("availability", int(os.environ.get("MQTT_QOS_AVAILABILITY", 1)))
+    mqtt.setdefault("max_inflight", int(os.environ.get("MQTT_MAX_INFLIGHT", 20)))
+    mqtt.setdefault("max_queued", int(os.environ.get("MQTT_MAX_QUEUED", 1000)))
+    # store-and-forward of states during broker outages; "" drops them like before
+    spool = mqtt.setdefault("spool", {})
+    spool.setdefault("directory", os.environ.get("MQTT_SPOOL_DIR", "spool"))
+    spool.setdefault("max_mb", float(os.environ.get("MQTT_SPOOL_MAX_MB", 20)))
+    spool.setdefault("batch_size", int(os.environ.get("MQTT_SPOOL_BATCH", 100)))
+    spool.setdefault("rate", float(os.environ.get("MQTT_SPOOL_RATE", 50)))
+    spool.setdefault("aggregate", os.environ.get("MQTT_SPOOL_AGGREGATE", "0").lower() in ("1", "true", "yes"))
 
     uvr.setdefault("xml_filename", os.environ.get("UVR_XML", "Neu.xml"))
     uvr.setdefault("ip", os.environ.get("UVR_IP", "192.168.177.5"))
     uvr.setdefault("user", os.environ.get("UVR_USER", "user"))
     uvr.setdefault("password", os.environ.get("UVR_PASSWORD", ""))
+    # number of schematic pages fetched in parallel (1 = sequential)
+    uvr.setdefault("max_workers", int(os.environ.get("UVR_MAX_WORKERS", 4)))
+    # compiled XML layout cache; None = "<xml_filename>.layout.json", "" = memory only
+    uvr.setdefault("layout_cache", os.environ.get("UVR_LAYOUT_CACHE"))
+    # HTML parser backend: "fast" (single-pass scanner) or "bs4" (BeautifulSoup)
+    uvr.setdefault("parser_backend", os.environ.get("UVR_PARSER_BACKEND", "fast"))
+    # per-page polling: start interval, adaptive bounds and fixed intervals ({"<Seite>": seconds});
+    # min_interval None keeps the start interval as the floor, so adaptation only backs off
+    uvr.setdefault("poll_interval", float(os.environ.get("UVR_POLL_INTERVAL", 60)))
+    min_interval = os.environ.get("UVR_MIN_INTERVAL")
+    uvr.setdefault("min_interval", float(min_interval) if min_interval else None)
+    uvr.setdefault("max_interval", float(os.environ.get("UVR_MAX_INTERVAL", 300)))
+    uvr.setdefault("adaptive_polling", os.environ.get("UVR_ADAPTIVE_POLLING", "1").lower() in ("1", "true", "yes"))
+    uvr.setdefault("page_intervals", {})
+    # several CMIs: [{"name": ..., "ip": ..., "user": ..., "password": ..., "xml_filename": ...}, ...]
+    uvr.setdefault("controllers", [])
+    # opt-in capture of fetched pages ("off", "anomaly" or "all") into a compressed ring archive
+    capture = uvr.setdefault("capture", {})
+    capture.setdefault("mode", os.environ.get("UVR_CAPTURE", "off"))
+    capture.setdefault("directory", os.environ.get("UVR_CAPTURE_DIR", "captures"))
+    capture.setdefault("max_mb", float(os.environ.get("UVR_CAPTURE_MAX_MB", 20)))
+    # rows of in-memory history per controller (uvr_history); 0 keeps no history
+    uvr.setdefault("history_size", int(os.environ.get("UVR_HISTORY_SIZE", 0)))
+    # Prometheus /metrics endpoint; 0 disables it
+    uvr.setdefault("metrics_port", int(os.environ.get("UVR_METRICS_PORT", 0)))
+    uvr.setdefault("metrics_host", os.environ.get("UVR_METRICS_HOST", "127.0.0.1"))
+    # profile the first N cycles (UVR_PROFILE) or, after SIGUSR1, the next signal_cycles ones
+    profile = uvr.setdefault("profile", {})
+    profile.setdefault("cycles", int(os.environ.get("UVR_PROFILE", 0)))
+    profile.setdefault("signal_cycles", int(os.environ.get("UVR_PROFILE_CYCLES", 3)))
+    profile.setdefault("mode", os.environ.get("UVR_PROFILER", "cprofile"))
+    profile.setdefault("directory", os.environ.get("UVR_PROFILE_DIR", "profiles"))
 
     device_name = device.get("name", os.environ.get("DEVICE_NAME", "UVR_TADesigner"))
 
@@ -85,14 +156,6 @@ def load_configs():
 #send_config(mqtt_client,"bedroom", "temp1", "humidity")
 
 
-def create_config(mqtt_client, mqtt_device_name, values):
-    for entry in values:
-        for name, data in entry.items():
-            entity_name  = sanitize_name(name)
-            # pass the original/prettified label as the friendly name
-            send_config(mqtt_client, mqtt_device_name, entity_name, data["unit"], friendly_name=name)
-            
-
 def get_device_class(unit,t):
 
     #(°C|Â°C|l/h|W/m²|W/m°²|%|kWh|kW|min|AUS|AN|ON|OFF|AUTO|EIN)'
@@ -310,34 +373,21 @@ alle_werte =[{'VERGL. 2 Vergleichswert a': {'value': 59.8, 'unit': '°C'},
  'WMZ HZK. Momentanleistung': {'value': 0.37, 'unit': 'kW'},
  'WMZ HZK. Kilowattstunden (Zähler)': {'value': 24.1, 'unit': 'kWh'}}]
 
-# load config in place (keep original load_configs in main file for now)
-mqtt_config, uvr_config, device_name = load_configs()
-
-# Enable debug logging when requested by environment (useful for foreground debugging)
-if os.environ.get("UVR_DEBUG", "").lower() in ("1", "true", "yes"):
-    configure_logging(True)
-    logger.info("Debug logging enabled via UVR_DEBUG environment variable")
-
-# Optional: limit number of polling cycles for foreground debug runs.
-# Set UVR_CYCLES=1 to run one cycle and exit.
-try:
-    UVR_CYCLES = int(os.environ.get("UVR_CYCLES", "0"))
-except Exception:
-    UVR_CYCLES = 0
-
-
+AVAILABILITY_ACK_TIMEOUT = 10
+DISCOVERY_ACK_TIMEOUT = 10
 
-# Verbindung zum MQTT-Broker herstellen
+# set when SIGINT/SIGTERM arrive; the main loop waits on it instead of sleeping
 stop_event = threading.Event()
 
 
-def graceful_shutdown(client, availability_topic: str) -> None:
+def graceful_shutdown(client, availability_topics: List[str]) -> None:
     try:
         logger.info("Shutting down: publishing offline and disconnecting MQTT")
-        try:
-            client.publish(availability_topic, "offline", retain=True)
-        except Exception:
-            logger.debug("Failed to publish offline availability")
+        for availability_topic in availability_topics:
+            try:
+                client.publish(availability_topic, "offline", retain=True)
+            except Exception:
+                logger.debug("Failed to publish offline availability")
         try:
             client.loop_stop()
         except Exception:
@@ -355,7 +405,64 @@ def _signal_handler(signum, frame):
     stop_event.set()
 
 
-if __name__ == '__main__':
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Poll a UVR/CMI and publish its values to MQTT.")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        default=os.environ.get("UVR_ASYNC", "").lower() in ("1", "true", "yes"),
+        help="run the asyncio daemon (uvr_async) instead of the blocking loop (env UVR_ASYNC=1)",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="replay recorded pages (capture archive or debug_html directory) instead of polling the CMI",
+    )
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="replay N times faster than recorded (default: as fast as possible)")
+    parser.add_argument("--loops", type=int, default=1, help="number of passes over the recorded pages")
+    parser.add_argument("--startup-report", action="store_true",
+                        default=os.environ.get("UVR_STARTUP_REPORT", "").lower() in ("1", "true", "yes"),
+                        help="log how long each startup phase took until the first states were published")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = StartupReport() if args.startup_report else None
+    if report is not None:
+        report.mark("interpreter and imports")
+    mqtt_config, uvr_config, device_name = load_configs()
+
+    # Enable debug logging when requested by environment (useful for foreground debugging)
+    if os.environ.get("UVR_DEBUG", "").lower() in ("1", "true", "yes"):
+        configure_logging(True)
+        logger.info("Debug logging enabled via UVR_DEBUG environment variable")
+
+    # Optional: limit number of polling cycles for foreground debug runs.
+    # Set UVR_CYCLES=1 to run one cycle and exit.
+    try:
+        UVR_CYCLES = int(os.environ.get("UVR_CYCLES", "0"))
+    except Exception:
+        UVR_CYCLES = 0
+
+    if args.replay:
+        from uvr_replay import run as run_replay
+        run_replay(args.replay, uvr_config, mqtt_config, device_name, speed=args.speed, loops=args.loops)
+        return
+    capture_from_config(uvr_config)
+    start_metrics_server(uvr_config)
+    if args.use_async:
+        from uvr_async import run as run_async
+        if uvr_config.get("controllers"):
+            raise SystemExit("uvr.controllers is only supported by the blocking runtime; drop --async")
+        try:
+            run_async(mqtt_config, uvr_config, device_name, cycles=UVR_CYCLES)
+        finally:
+            close_capture()
+        return
+
     # register termination signals
     try:
         signal.signal(signal.SIGINT, _signal_handler)
@@ -365,64 +472,151 @@ if __name__ == '__main__':
         signal.signal(signal.SIGTERM, _signal_handler)
     except Exception:
         logger.debug("SIGTERM handler registration failed")
+    if report is not None:
+        report.mark("config")
+
+    # one controller per entry of uvr.controllers (or just the uvr section), sharing mqtt_client
+    pool = ControllerPool(controllers_from_config(uvr_config, device_name, mqtt_config))
     try:
-        mqtt_client = build_mqtt_client(mqtt_config)
+        # the CONNACK arrives in the background while the layouts load
+        mqtt_client = build_mqtt_client(mqtt_config, wait=False)
+        pool.prepare()
+        if report is not None:
+            report.mark("layouts and HTTP sessions")
+        wait_connected(mqtt_client, mqtt_config)
     except Exception as e:
         logger.exception("Failed to establish MQTT connection: %s", e)
+        pool.close()
         raise SystemExit(1)
+    if report is not None:
+        report.mark("MQTT CONNACK")
+    # every publish goes through the flow-controlled publisher (QoS per message class, bounded queue)
+    publisher = publisher_from_config(mqtt_client, mqtt_config)
+
+    pool.start(publisher)
+    if report is not None:
+        report.mark("first read and discovery")
+    # the broker must have the configs of new entities before their first states
+    if not wait_for_acks(pool.discovery_infos(), DISCOVERY_ACK_TIMEOUT):
+        logger.warning("Broker did not acknowledge the discovery configs within %s s", DISCOVERY_ACK_TIMEOUT)
+    if report is not None:
+        report.mark("discovery PUBACKs")
 
-    # use device_name loaded from config.json (set earlier by load_configs())
-
-    # create_config(mqtt_client, device_name, alle_werte)
-    # send_values(mqtt_client, device_name, alle_werte)
-
-    page_values = filter_empty_values(read_data(uvr_config))
-
-    # publish discovery configs
-    create_config(mqtt_client, device_name, page_values)
-    sleep(5)
-
-    device_id = sanitize_name(device_name)
-    availability_topic = f"homeassistant/{device_id}/availability"
     # publish initial availability retained
-    mqtt_client.publish(availability_topic, "online", retain=True)
+    if not wait_for_acks(pool.publish_availability(publisher, "online"), AVAILABILITY_ACK_TIMEOUT):
+        logger.warning("Broker did not acknowledge the availability message within %s s", AVAILABILITY_ACK_TIMEOUT)
+    if report is not None:
+        report.mark("availability PUBACK")
+    discovery_settle = float(mqtt_config.get("discovery_settle", 0))
+    if discovery_settle > 0 and any(c.new_entities for c in pool.controllers):
+        # optionally give Home Assistant time to subscribe to the state topics of new entities
+        stop_event.wait(discovery_settle)
+        if report is not None:
+            report.mark("discovery settle")
+
+    profiler = profiler_from_config(uvr_config)
+    profiler.install_signal_handler()
+
+    # readings taken while the broker is unreachable are queued on disk and sent after reconnecting
+    spool = spool_from_config(mqtt_config)
+    spool_client = SpoolClient(spool) if spool is not None else None
+    spool_dropped = spool.dropped if spool is not None else 0
+    spool_options = drain_options(mqtt_config)
+    spool_pacing = spool_options["batch_size"] / spool_options["rate"] if spool_options["rate"] > 0 else 0.0
 
     try:
         cycle_count = 0
+        offline = False
+        # the backlog of an earlier run is compacted like that of an outage
+        reconnected = True
         while not stop_event.is_set():
             try:
-                # Check MQTT connection status and attempt reconnect if needed
+                # the client reconnects in the background; this only reads its state
                 if not check_mqtt_connection(mqtt_client):
-                    logger.error("MQTT connection unavailable; skipping cycle")
-                    mqtt_client.publish(availability_topic, "offline", retain=True)
-                    time.sleep(30)
+                    if not offline:
+                        logger.error("MQTT connection unavailable; %s",
+                                     "skipping cycles" if spool is None else f"spooling readings to {spool.directory}")
+                        offline = True
+                        reconnected = True
+                    if spool_client is None:
+                        # republish everything once the broker is back
+                        pool.reset()
+                    else:
+                        pool.poll(spool_client)
+                    # look at the connection again soon, even if no page is due
+                    stop_event.wait(min(max(pool.seconds_until_next(), 1), 5))
                     continue
-                # Read and filter UVR data
-                page_values = filter_empty_values(read_data(uvr_config))
-
-                # Send UVR data via MQTT
-                send_values(mqtt_client, device_name, page_values)
-
-                logger.info("Completed one cycle.")
-                cycle_count += 1
-                if UVR_CYCLES > 0 and cycle_count >= UVR_CYCLES:
-                    logger.info("Reached UVR_CYCLES=%s, exiting loop.", UVR_CYCLES)
-                    break
+                if offline:
+                    pool.publish_availability(publisher, "online")
+                    offline = False
+                target = publisher
+                if spool is not None and len(spool):
+                    if reconnected and spool_options["aggregate"]:
+                        spool.compact()
+                    # one rate-limited batch per iteration, past the publisher's supersede/overflow policy
+                    spool.drain_batch(publisher.send, spool_options["batch_size"])
+                    if spool.dropped != spool_dropped:
+                        # the last state of some entities may have been dropped; republish everything
+                        spool_dropped = spool.dropped
+                        pool.reset()
+                    if len(spool):
+                        # keep polling, but behind the backlog so no older reading overwrites a newer one
+                        target = spool_client
+                if target is publisher:
+                    # discovery configs that only reached the spool (or were refused) while offline
+                    pool.resend_discovery(publisher)
+                reconnected = False
+                # Read the due UVR pages of every controller and send them via MQTT
+                with profiler.cycle(cycle_count + 1) as profile:
+                    polled = pool.poll(target)
+                    if not polled:
+                        profile.discard()
+                if polled:
+                    logger.info("Completed one cycle (pages %s).", polled)
+                    if report is not None:
+                        report.mark("first states")
+                        logger.info("%s", report.format())
+                        report = None
+                    # always taken: it also updates the pending gauge and warns on backpressure
+                    mqtt_report = publisher.cycle_report()
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("CMI connection stats: %s", fetcher_stats())
+                        logger.debug("Decode cache: %s", decode_cache_info())
+                        logger.debug("Unchanged pages: %s", page_cache_stats())
+                        logger.debug("Controllers: %s", pool.stats())
+                        capture = capture_stats()
+                        if capture is not None:
+                            logger.debug("Capture: %s", capture)
+                        if spool is not None:
+                            logger.debug("Spool: %s", spool.stats())
+                        logger.debug("MQTT publishing: %s", mqtt_report)
+                    cycle_count += 1
+                    if UVR_CYCLES > 0 and cycle_count >= UVR_CYCLES:
+                        logger.info("Reached UVR_CYCLES=%s, exiting loop.", UVR_CYCLES)
+                        break
             except Exception as e:
                 logger.exception("Error during cycle: %s", e)
-            # wait 60 seconds before next poll
-            # allow early exit during sleep
-            for _ in range(60):
-                if stop_event.is_set():
-                    break
-                sleep(1)
+            # sleep until the next page is due, or the next spool batch; returns early on shutdown
+            delay = max(pool.seconds_until_next(), 1)
+            if spool is not None and len(spool) and check_mqtt_connection(mqtt_client):
+                delay = min(delay, spool_pacing)
+            stop_event.wait(delay)
     except KeyboardInterrupt:
         logger.info("KeyboardInterrupt received, shutting down")
         stop_event.set()
     finally:
         # Always attempt graceful shutdown
         try:
-            graceful_shutdown(mqtt_client, availability_topic)
+            if not publisher.flush(5):
+                logger.warning("%d MQTT messages were not sent before shutdown", publisher.pending())
+            graceful_shutdown(mqtt_client, pool.availability_topics)
+            pool.close()
+            close_capture()
+            if spool is not None:
+                spool.close()
         except Exception:
             logger.exception("Error during final shutdown")
 
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import uvr_async
+from uvr_publisher import Publisher
+from uvr_spool import Spool
+
+XML = """<?xml version="1.0" encoding="utf-8"?>
+<TA>
+  <Seiten>
+    <Seite_0>
+      <Objekte>
+        <Objekt_0 Bezeichnung="Seite 1: T.Kollektor Wert" Objekt_Typ="Text_Obj"/>
+        <Objekt_1 Bezeichnung="Bild" Objekt_Typ="Pic_Obj"/>
+        <Objekt_2 Bezeichnung="Seite 1: Pumpe Status" Objekt_Typ="Text_Obj"/>
+      </Objekte>
+    </Seite_0>
+    <Seite_1>
+      <Objekte>
+        <Objekt_0 Bezeichnung="Seite 2: T.Speicher 1 Wert" Objekt_Typ="Text_Obj"/>
+      </Objekte>
+    </Seite_1>
+  </Seiten>
+</TA>
+"""
+
+PAGES = {
+    0: '<div id="pos0" >\n 63,3 Â°C</div>\n<div id="pos1" >\nEIN</div>\n',
+    1: '<div id="pos0" >\n 50,0 Â°C</div>\n',
+}
+
+
+class FakeClient:
+    def __init__(self, connected=True):
+        self.published = []
+        self.connected = connected
+        self.stopped = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload, retain))
+
+    def is_connected(self):
+        return self.connected
+
+    def loop_stop(self):
+        self.stopped.append('loop_stop')
+
+    def disconnect(self):
+        self.stopped.append('disconnect')
+
+
+class TestAsyncDaemon(unittest.TestCase):
+    def setUp(self):
+        fd, self.xml_path = tempfile.mkstemp(suffix='.xml')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(XML)
+
+    def tearDown(self):
+        os.unlink(self.xml_path)
+
+    def test_single_cycle_publishes_discovery_and_states(self):
+        client = FakeClient()
+        uvr_cfg = {'xml_filename': self.xml_path, 'ip': '127.0.0.1', 'user': 'u', 'password': 'p', 'max_workers': 2,
+                   'layout_cache': ''}
+
+        def fake_read_html(ip, Seite, username, password, timeout=10, fetcher=None):
+            return PAGES[Seite]
+
+        with mock.patch.object(uvr_async, 'build_mqtt_client', return_value=client), \
+                mock.patch.object(uvr_async, 'read_html', side_effect=fake_read_html):
+            uvr_async.run({'broker': 'localhost'}, uvr_cfg, 'UVR', interval=0, cycles=1)
+
+        topics = {t: p for t, p, _ in client.published}
+        self.assertEqual(topics['homeassistant/sensor/uvr/t_kollektor_wert/state'], json.dumps(63.3))
+        self.assertEqual(topics['homeassistant/binary_sensor/uvr/pumpe_status/state'], 'ON')
+        self.assertEqual(topics['homeassistant/sensor/uvr/t_speicher_1_wert/state'], json.dumps(50.0))
+        self.assertIn('homeassistant/sensor/uvr_sensor_t_kollektor_wert/config', topics)
+        # availability goes online first and offline on shutdown
+        availability = [p for t, p, _ in client.published if t == 'homeassistant/uvr/availability']
+        self.assertEqual(availability, ['online', 'offline'])
+
+    def test_client_is_stopped_when_publisher_setup_fails(self):
+        client = FakeClient()
+        uvr_cfg = {'xml_filename': self.xml_path, 'ip': '127.0.0.1', 'user': 'u', 'password': 'p'}
+        with mock.patch.object(uvr_async, 'build_mqtt_client', return_value=client), \
+                mock.patch.object(uvr_async, 'publisher_from_config', side_effect=ValueError('bad qos')):
+            with self.assertRaisesRegex(ValueError, 'bad qos'):
+                uvr_async.run({'broker': 'localhost'}, uvr_cfg, 'UVR', interval=0, cycles=1)
+        self.assertEqual(client.stopped, ['loop_stop', 'disconnect'])
+        self.assertEqual(client.published, [])
+
+    def test_offline_readings_are_spooled_and_drained(self):
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir)
+        client = FakeClient(connected=False)
+        uvr_cfg = {'xml_filename': self.xml_path, 'ip': '127.0.0.1', 'user': 'u', 'password': 'p', 'max_workers': 2,
+                   'layout_cache': ''}
+        mqtt_cfg = {'broker': 'localhost', 'discovery_manifest': '', 'spool': {'directory': spool_dir}}
+
+        def fake_read_html(ip, Seite, username, password, timeout=10, fetcher=None):
+            return PAGES[Seite]
+
+        with mock.patch.object(uvr_async, 'build_mqtt_client', return_value=client), \
+                mock.patch.object(uvr_async, 'read_html', side_effect=fake_read_html):
+            uvr_async.run(mqtt_cfg, uvr_cfg, 'UVR', interval=0, cycles=1)
+        self.assertNotIn('homeassistant/sensor/uvr/t_kollektor_wert/state', {t for t, _p, _r in client.published})
+
+        daemon = uvr_async.AsyncDaemon(mqtt_cfg, uvr_cfg, 'UVR')
+        self.assertTrue(daemon._spool_backlog())
+        daemon.publisher = Publisher(client)
+        while daemon._spool_backlog():
+            daemon._drain_spool(reconnected=False)
+        daemon.spool.close()
+        topics = {t: p for t, p, _ in client.published}
+        self.assertEqual(topics['homeassistant/sensor/uvr/t_kollektor_wert/state'], json.dumps(63.3))
+        self.assertEqual(topics['homeassistant/sensor/uvr/t_speicher_1_wert/state'], json.dumps(50.0))
+        self.assertEqual(len(Spool(spool_dir)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+import uvr
+import uvr_capture
+from uvr_capture import CaptureArchive, read_archive
+from uvr_fetch import read_html
+from uvr_layout import compile_layout
+
+XML = """<?xml version="1.0" encoding="utf-8"?>
+<TA>
+  <Seiten>
+    <Seite_0>
+      <Objekte>
+        <Objekt_0 Bezeichnung="Seite 1: T.Kollektor Wert" Objekt_Typ="Text_Obj"/>
+        <Objekt_1 Bezeichnung="Seite 1: Pumpe Status" Objekt_Typ="Text_Obj"/>
+      </Objekte>
+    </Seite_0>
+  </Seiten>
+</TA>
+"""
+
+
+class FakeFetcher:
+    def fetch(self, url, timeout=10):
+        return '<div id="pos0" >\n 63,3 Â°C</div>\n'
+
+
+class TestCaptureArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        uvr_capture.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_ring_is_bounded_and_readable(self):
+        archive = CaptureArchive(self.tmpdir, max_bytes=4096, segments=4)
+        for i in range(200):
+            archive.write([{'Seite': i, 'html': os.urandom(64).hex()}])
+        archive.close()
+        segments = archive.segments()
+        self.assertLessEqual(sum(p.stat().st_size for p in segments), 4096 + archive.segment_bytes)
+        seen = [record['Seite'] for record in read_archive(self.tmpdir)]
+        # oldest records were dropped, the newest ones are kept in order
+        self.assertEqual(seen, list(range(seen[0], 200)))
+        self.assertGreater(seen[0], 0)
+
+    def test_unclosed_segment_keeps_flushed_records(self):
+        archive = CaptureArchive(self.tmpdir)
+        archive.write([{'Seite': 0}, {'Seite': 1}])
+        # simulate a crash: the gzip trailer is never written
+        archive._raw.close()
+        self.assertEqual([r['Seite'] for r in read_archive(self.tmpdir)], [0, 1])
+        # a new run starts a new segment instead of appending to the broken one
+        CaptureArchive(self.tmpdir).write([{'Seite': 2}])
+        self.assertEqual(len(CaptureArchive(self.tmpdir).segments()), 2)
+        self.assertEqual([r['Seite'] for r in read_archive(self.tmpdir)], [0, 1, 2])
+
+    def test_read_html_writes_nothing_unless_capturing(self):
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            read_html('10.0.0.1', 0, 'u', 'p', fetcher=FakeFetcher())
+            self.assertEqual(os.listdir(self.tmpdir), [])
+            uvr_capture.configure('all', os.path.join(self.tmpdir, 'captures'))
+            read_html('10.0.0.1', 3, 'u', 'p', fetcher=FakeFetcher())
+            uvr_capture.close()
+        finally:
+            os.chdir(cwd)
+        (record,) = read_archive(os.path.join(self.tmpdir, 'captures'))
+        self.assertEqual((record['ip'], record['Seite'], record['reason']), ('10.0.0.1', 3, 'fetch'))
+        self.assertIn('63,3', record['html'])
+        self.assertIsInstance(record['time'], float)
+
+    def test_anomalies_are_captured_once(self):
+        uvr.page_cache.clear()
+        uvr_capture.configure('anomaly', self.tmpdir)
+        layout = compile_layout(ET.fromstring(XML))[0]
+        html = '<div id="pos0" >\n 63,3 Â°C</div>\n'
+        uvr.combine_page_cached(('10.0.0.1', 0), layout, html)
+        uvr.combine_page_cached(('10.0.0.1', 0), layout, html.replace('63,3', '64,0'))
+        # complete pages and plain fetches are not captured in anomaly mode
+        uvr_capture.on_fetch('10.0.0.1', 0, html)
+        uvr.combine_page_cached(('10.0.0.1', 1), layout, html + '<div id="pos1" >\nEIN</div>\n')
+        uvr_capture.close()
+        uvr.page_cache.clear()
+        records = list(read_archive(self.tmpdir))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['Seite'], 0)
+        self.assertIn("'Pumpe Status'", records[0]['reason'])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        archive = CaptureArchive(self.tmpdir)
+        with mock.patch.object(uvr_capture.Capture, '_run'):
+            capture = uvr_capture.Capture(archive, 'all', queue_size=1)
+            capture.submit('10.0.0.1', 0, 'x', 'fetch')
+            capture.submit('10.0.0.1', 1, 'x', 'fetch')
+        self.assertEqual(capture.stats(), {'written': 0, 'dropped': 1, 'queued': 1})
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            uvr_capture.configure('sometimes', self.tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import uvr
+from uvr_controllers import ControllerPool, controllers_from_config
+
+XML = """<?xml version="1.0" encoding="utf-8"?>
+<TA>
+  <Seiten>
+    <Seite_0>
+      <Objekte>
+        <Objekt_0 Bezeichnung="Seite 1: T.Kollektor Wert" Objekt_Typ="Text_Obj"/>
+      </Objekte>
+    </Seite_0>
+  </Seiten>
+</TA>
+"""
+
+PAGES = {
+    '10.0.0.1': '<div id="pos0" >\n 63,3 Â°C</div>\n',
+    '10.0.0.2': '<div id="pos0" >\n 41,0 Â°C</div>\n',
+}
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload, retain))
+
+
+def fake_read_pages(ip, Seiten, username, password, timeout=10, max_workers=None):
+    if ip not in PAGES:
+        raise ConnectionError(ip)
+    return [PAGES[ip] for _ in Seiten]
+
+
+class TestControllers(unittest.TestCase):
+    def setUp(self):
+        fd, self.xml_path = tempfile.mkstemp(suffix='.xml')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(XML)
+        self.uvr_cfg = {'xml_filename': self.xml_path, 'layout_cache': '', 'user': 'u', 'password': 'p',
+                        'max_workers': 2, 'controllers': [{'name': 'UVR Haus', 'ip': '10.0.0.1'},
+                                                          {'name': 'UVR Halle', 'ip': '10.0.0.2', 'user': 'x'}]}
+        self.mqtt_cfg = {'discovery_manifest': ''}
+        uvr.page_cache.clear()
+
+    def tearDown(self):
+        os.unlink(self.xml_path)
+        uvr.page_cache.clear()
+
+    def test_entries_inherit_shared_settings(self):
+        haus, halle = controllers_from_config(self.uvr_cfg, 'ignored', self.mqtt_cfg)
+        self.assertEqual((haus.device_id, haus.uvr_cfg['ip'], haus.uvr_cfg['user']), ('uvr_haus', '10.0.0.1', 'u'))
+        self.assertEqual(halle.uvr_cfg['user'], 'x')
+        self.assertEqual(halle.availability_topic, 'homeassistant/uvr_halle/availability')
+        self.assertNotIn('controllers', haus.uvr_cfg)
+
+    def test_single_controller_without_list(self):
+        del self.uvr_cfg['controllers']
+        (only,) = controllers_from_config(self.uvr_cfg, 'UVR', self.mqtt_cfg)
+        self.assertEqual(only.device_id, 'uvr')
+
+    def test_invalid_entries(self):
+        self.uvr_cfg['controllers'].append({'name': 'uvr-haus', 'ip': '10.0.0.3'})
+        with self.assertRaises(ValueError):
+            controllers_from_config(self.uvr_cfg, 'UVR', self.mqtt_cfg)
+        with self.assertRaises(ValueError):
+            controllers_from_config({'controllers': [{'ip': '10.0.0.3'}]}, 'UVR', self.mqtt_cfg)
+
+    def test_failing_controller_and_unchanged_pages(self):
+        self.uvr_cfg['controllers'].append({'name': 'UVR Offline', 'ip': '10.0.0.9'})
+        client = FakeClient()
+        pool = ControllerPool(controllers_from_config(self.uvr_cfg, 'UVR', self.mqtt_cfg))
+        try:
+            with mock.patch.object(uvr, 'read_pages', side_effect=fake_read_pages):
+                pool.start(client)
+                polled = pool.poll(client)
+                client.published.clear()
+                for controller in pool.controllers[:2]:
+                    controller.scheduler.next_poll[0] = 0
+                # byte-identical pages are not published again
+                self.assertEqual(pool.poll(client), {'uvr_haus': [0], 'uvr_halle': [0]})
+                self.assertEqual(client.published, [])
+        finally:
+            pool.close()
+        # the unreachable controller is logged and skipped, the others are polled
+        self.assertEqual(polled, {'uvr_haus': [0], 'uvr_halle': [0]})
+        self.assertEqual(pool.controllers[2].seconds_until_next(), 60)
+
+    def test_failed_read_reschedules_due_pages(self):
+        del self.uvr_cfg['controllers']
+        self.uvr_cfg['ip'] = '10.0.0.1'
+        (controller,) = controllers_from_config(self.uvr_cfg, 'UVR', self.mqtt_cfg)
+        client = FakeClient()
+        with mock.patch.object(uvr, 'read_pages', side_effect=fake_read_pages):
+            controller.start(client)
+        with mock.patch.object(uvr, 'load_layout', side_effect=OSError('layout unreadable')):
+            with self.assertLogs('UVR2MQTT', 'ERROR'):
+                self.assertEqual(controller.poll(client), [])
+        # the page is retried one interval later, not on every loop iteration
+        self.assertAlmostEqual(controller.seconds_until_next(), 60, delta=1)
+
+    def test_malformed_page_is_skipped(self):
+        del self.uvr_cfg['controllers']
+        self.uvr_cfg['ip'] = '10.0.0.1'
+        with mock.patch.object(uvr, 'read_pages', side_effect=fake_read_pages), \
+                mock.patch.object(uvr, 'combine_html_xml', side_effect=ValueError('malformed page')):
+            self.assertEqual(uvr.read_page_data(self.uvr_cfg), {})
+
+    def test_pool_publishes_each_device_through_one_client(self):
+        client = FakeClient()
+        pool = ControllerPool(controllers_from_config(self.uvr_cfg, 'UVR', self.mqtt_cfg))
+        try:
+            with mock.patch.object(uvr, 'read_pages', side_effect=fake_read_pages):
+                pool.start(client)
+                self.assertEqual(pool.poll(client), {'uvr_haus': [0], 'uvr_halle': [0]})
+        finally:
+            pool.close()
+        topics = {t: p for t, p, _ in client.published}
+        self.assertEqual(topics['homeassistant/sensor/uvr_haus/t_kollektor_wert/state'], '63.3')
+        self.assertEqual(topics['homeassistant/sensor/uvr_halle/t_kollektor_wert/state'], '41.0')
+        self.assertIn('homeassistant/sensor/uvr_halle_sensor_t_kollektor_wert/config', topics)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,15 @@
 import json
 import logging
+import os
+import shutil
+import tempfile
 import unittest
 
+import paho.mqtt.client as mqtt
+
 from send_uvr_mqtt import send_config, configure_logging, sanitize_name
+from uvr_mqtt import DiscoveryManifest, create_config
+from uvr_spool import Spool, SpoolClient
 
 
 class FakeClient:
@@ -11,6 +18,12 @@ class FakeClient:
 
     def publish(self, topic, payload, retain=False):
         self.published.append((topic, payload, retain))
+        return mqtt.MQTTMessageInfo(len(self.published))
+
+
+class FakeInfo:
+    def __init__(self, rc):
+        self.rc = rc
 
 
 class TestDiscoveryAndDebug(unittest.TestCase):
@@ -49,5 +62,80 @@ class TestDiscoveryAndDebug(unittest.TestCase):
         self.assertEqual(logger.level, logging.INFO)
 
 
+class TestDiscoveryManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "manifest.json")
+        self.values = [{
+            "T.Speicher 1 Wert": {"value": 61.9, "unit": "°C"},
+            "Pumpe 1 Status": {"value": 1.0, "unit": "switch"},
+        }]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def publish(self, values, prune=True):
+        client = FakeClient()
+        create_config(client, "UVR", values, manifest=DiscoveryManifest(self.path), prune=prune)
+        return client.published
+
+    def test_restart_publishes_nothing(self):
+        self.assertEqual(len(self.publish(self.values)), 2)
+        self.assertEqual(self.publish(self.values), [])
+
+    def test_changed_and_removed_entities(self):
+        self.publish(self.values)
+        changed = [{"T.Speicher 1 Wert": {"value": 61.9, "unit": "kW"}}]
+        published = self.publish(changed)
+        topics = {t: p for t, p, _ in published}
+        self.assertIn("homeassistant/sensor/uvr_sensor_t_speicher_1_wert/config", topics)
+        self.assertEqual(json.loads(topics["homeassistant/sensor/uvr_sensor_t_speicher_1_wert/config"])["unit_of_measurement"], "kW")
+        # removed entity gets an empty retained config
+        self.assertEqual(topics["homeassistant/binary_sensor/uvr_binary_sensor_pumpe_1_status/config"], "")
+        self.assertTrue(all(retain for _, _, retain in published))
+
+    def test_no_prune_keeps_missing_entities(self):
+        self.publish(self.values)
+        self.assertEqual(self.publish(self.values[:0], prune=False), [])
+        self.assertEqual(self.publish(self.values), [])
+
+    def test_publish_results_are_collected(self):
+        client, sent = FakeClient(), []
+        create_config(client, "UVR", self.values, manifest=DiscoveryManifest(self.path), sent=sent)
+        self.assertEqual([info.mid for info in sent], [1, 2])
+        # nothing to wait for on a restart without changes
+        sent = []
+        create_config(client, "UVR", self.values, manifest=DiscoveryManifest(self.path), sent=sent)
+        self.assertEqual(sent, [])
+        create_config(client, "UVR", self.values, sent=sent)
+        self.assertEqual([info.mid for info in sent], [3, 4])
+
+    def test_spooled_configs_stay_pending_until_sent(self):
+        spool_dir = os.path.join(self.tmpdir, "spool")
+        spool = Spool(spool_dir, 1024 * 1024)
+        manifest = DiscoveryManifest(self.path)
+        counts = create_config(SpoolClient(spool), "UVR", self.values, manifest=manifest)
+        self.assertEqual(counts["added"], 2)
+        spool.close()
+        # the spool segment is lost before the broker is back
+        shutil.rmtree(spool_dir)
+        self.assertEqual(len(self.publish(self.values)), 2)
+        client = FakeClient()
+        self.assertEqual(manifest.resend_pending(client), 0)
+        self.assertEqual(len(client.published), 2)
+        self.assertEqual(self.publish(self.values), [])
+
+    def test_refused_removal_is_retried(self):
+        self.publish(self.values)
+        manifest = DiscoveryManifest(self.path)
+        refused = FakeClient()
+        refused.publish = lambda topic, payload, retain=False: FakeInfo(rc=mqtt.MQTT_ERR_NO_CONN)
+        create_config(refused, "UVR", self.values[:0], manifest=manifest)
+        client = FakeClient()
+        self.assertEqual(manifest.resend_pending(client), 0)
+        self.assertEqual({payload for _topic, payload, _retain in client.published}, {""})
+        self.assertEqual(self.publish(self.values[:0]), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,129 @@
+import base64
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+import uvr_fetch
+
+
+def isolate_fetchers(test):
+    """Give ``test`` an empty shared-fetcher registry and close what it created afterwards."""
+    patcher = mock.patch.object(uvr_fetch, '_fetchers', {})
+    fetchers = patcher.start()
+    test.addCleanup(patcher.stop)
+    test.addCleanup(lambda: [fetcher.close() for fetcher in fetchers.values()])
+
+
+class TestReadPages(unittest.TestCase):
+    def setUp(self):
+        isolate_fetchers(self)
+
+    def test_results_keep_page_order(self):
+        def fake_read_html(ip, Seite, username, password, timeout=10, fetcher=None):
+            # later pages finish first
+            time.sleep(0.02 * (3 - Seite))
+            return f'page{Seite}'
+
+        with mock.patch.object(uvr_fetch, 'read_html', side_effect=fake_read_html):
+            pages = uvr_fetch.read_pages('1.2.3.4', range(4), 'u', 'p', max_workers=4)
+        self.assertEqual(pages, ['page0', 'page1', 'page2', 'page3'])
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def fake_read_html(ip, Seite, username, password, timeout=10, fetcher=None):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return 'x'
+
+        with mock.patch.object(uvr_fetch, 'read_html', side_effect=fake_read_html):
+            uvr_fetch.read_pages('1.2.3.4', range(6), 'u', 'p', max_workers=2)
+        self.assertEqual(peak[0], 2)
+
+    def test_sequential_when_single_worker(self):
+        with mock.patch.object(uvr_fetch, 'read_html', side_effect=[None, 'b']) as m:
+            pages = uvr_fetch.read_pages('1.2.3.4', [0, 1], 'u', 'p', max_workers=1)
+        self.assertEqual(pages, [None, 'b'])
+        self.assertEqual(m.call_count, 2)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        expected = 'Basic ' + base64.b64encode(b'user:secret').decode()
+        if self.headers.get('Authorization') != expected:
+            self.send_response(401)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'<div id="pos0">AUS</div>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFetcher(unittest.TestCase):
+    def setUp(self):
+        isolate_fetchers(self)
+        self.server = HTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_session_reuses_connection(self):
+        fetcher = uvr_fetch.Fetcher('user', 'secret', pool_size=2)
+        try:
+            for n in range(3):
+                self.assertEqual(fetcher.fetch(f'{self.base}/schematic_files/{n + 1}.cgi'), '<div id="pos0">AUS</div>')
+            stats = fetcher.stats()
+        finally:
+            fetcher.close()
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['new_connections'], 1)
+        self.assertEqual(stats['reused_connections'], 2)
+
+    def test_get_fetcher_is_shared(self):
+        a = uvr_fetch.get_fetcher('10.0.0.9', 'user', 'secret', pool_size=2)
+        b = uvr_fetch.get_fetcher('10.0.0.9', 'user', 'secret', pool_size=1)
+        self.assertIs(a, b)
+        session = a.session
+        c = uvr_fetch.get_fetcher('10.0.0.9', 'user', 'secret', pool_size=4)
+        self.assertIs(a, c)
+        self.assertIs(c.session, session)
+        self.assertEqual(c.pool_size, 4)
+        self.assertEqual(list(uvr_fetch.fetcher_stats()), ['10.0.0.9'])
+
+    def test_resize_keeps_session_and_stats(self):
+        fetcher = uvr_fetch.Fetcher('user', 'secret', pool_size=1)
+        try:
+            fetcher.fetch(f'{self.base}/schematic_files/1.cgi')
+            session = fetcher.session
+            fetcher.resize(3)
+            self.assertEqual(fetcher.fetch(f'{self.base}/schematic_files/2.cgi'), '<div id="pos0">AUS</div>')
+            stats = fetcher.stats()
+        finally:
+            fetcher.close()
+        self.assertIs(fetcher.session, session)
+        self.assertEqual(stats['requests'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import math
+import unittest
+from unittest import mock
+
+import uvr_history
+from uvr_history import History
+
+
+def page(**values):
+    return {name: {'value': value, 'unit': '°C'} for name, value in values.items()}
+
+
+class TestHistory(unittest.TestCase):
+    def fill(self, history, rows, start=0):
+        for t in range(start, start + rows):
+            history.record([page(a=float(t)), page(b=None if t % 2 else float(-t))], timestamp=1000.0 + t)
+
+    def test_ring_keeps_newest_rows(self):
+        history = History(capacity=5)
+        self.fill(history, 8)
+        self.assertEqual(len(history), 5)
+        self.assertEqual([v for _t, v in history.window('a')], [3.0, 4.0, 5.0, 6.0, 7.0])
+        self.assertEqual(history.last('a', 2), [(1006.0, 6.0), (1007.0, 7.0)])
+        # NaN rows (missing or None values) are skipped
+        self.assertEqual(history.last('b', 2), [(1004.0, -4.0), (1006.0, -6.0)])
+        self.assertEqual(history.nbytes(), 5 * 8 + 2 * 5 * 4)
+
+    def test_window_bounds_across_wraparound(self):
+        history = History(capacity=6)
+        self.fill(history, 10)
+        self.assertEqual(history.window('a', since=1005, until=1008), [(1005.0, 5.0), (1006.0, 6.0), (1007.0, 7.0),
+                                                                         (1008.0, 8.0)])
+        self.assertEqual(history.window('a', since=2000), [])
+        self.assertEqual(history.window('missing'), [])
+
+    def test_entities_added_later_and_clock_steps(self):
+        history = History(capacity=4)
+        history.record(page(a=1.0), timestamp=10)
+        history.record(page(a=2.0, c=5.0), timestamp=5)
+        self.assertEqual(history.window('c'), [(10.0, 5.0)])
+        self.assertTrue(math.isnan(history.series['c'][0]))
+
+    def test_page_groups_keep_their_own_rows(self):
+        history = History(capacity=3)
+        for t in range(10):
+            history.record(page(fast=float(t)), timestamp=1000.0 + t, group=1)
+            if t % 5 == 0:
+                history.record(page(slow=float(t)), timestamp=1000.0 + t, group=2)
+        # the slow page's polls are not pushed out by the fast page's
+        self.assertEqual(history.window('slow'), [(1000.0, 0.0), (1005.0, 5.0)])
+        self.assertEqual(history.last('fast', 5), [(1007.0, 7.0), (1008.0, 8.0), (1009.0, 9.0)])
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history.nbytes(), 2 * 3 * 8 + 2 * 3 * 4)
+
+    def test_queries_with_and_without_numpy(self):
+        history = History(capacity=7)
+        self.fill(history, 11)
+        expected = [history.window('b', since=1005), history.last('b', 3), history.last('a', 20)]
+        self.assertEqual(expected[1], [(1006.0, -6.0), (1008.0, -8.0), (1010.0, -10.0)])
+        with mock.patch.object(uvr_history, 'np', None):
+            self.assertEqual([history.window('b', since=1005), history.last('b', 3), history.last('a', 20)],
+                             expected)
+
+    def test_stats_with_and_without_numpy(self):
+        history = History(capacity=50)
+        self.fill(history, 60)
+        expected = {'min': 50.0, 'max': 59.0, 'mean': 54.5, 'count': 10, 'last': 59.0}
+        self.assertEqual(history.stats('a', since=1050), expected)
+        with mock.patch.object(uvr_history, 'np', None):
+            self.assertEqual(history.stats('a', since=1050), expected)
+            self.assertIsNone(history.stats('b', since=1059))
+        self.assertIsNone(history.stats('b', since=1059))
+        self.assertIsNone(history.stats('missing'))
+
+
+if __name__ == '__main__':
+    unittest.main()
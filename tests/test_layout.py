@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+import uvr_layout
+from uvr_parse import read_xml
+
+XML = """<?xml version="1.0" encoding="utf-8"?>
+<TA>
+  <Seiten>
+    <Seite_0>
+      <Objekte>
+        <Objekt_1 Bezeichnung="Seite 1: Pumpe Status" Objekt_Typ="Text_Obj"/>
+        <Objekt_0 Bezeichnung="Seite 1: T.Kollektor Wert" Objekt_Typ="Text_Obj"/>
+        <Objekt_2 Bezeichnung="Bild" Objekt_Typ="Pic_Obj"/>
+        <Objekt_3 Bezeichnung="Seite 1: Ausgang 15 (analog)  Modus (Hand/Auto)" Objekt_Typ="Text_Obj"/>
+      </Objekte>
+    </Seite_0>
+    <Seite_1>
+      <Objekte>
+        <Objekt_0 Bezeichnung="Seite 2: T.Speicher 1 Wert" Objekt_Typ="Text_Obj"/>
+      </Objekte>
+    </Seite_1>
+  </Seiten>
+</TA>
+"""
+
+
+class TestLayout(unittest.TestCase):
+    def setUp(self):
+        uvr_layout.clear_cache()
+        self.tmpdir = tempfile.mkdtemp()
+        self.xml_path = os.path.join(self.tmpdir, 'Neu.xml')
+        with open(self.xml_path, 'w', encoding='utf-8') as f:
+            f.write(XML)
+
+    def tearDown(self):
+        uvr_layout.clear_cache()
+        shutil.rmtree(self.tmpdir)
+
+    def test_compile_matches_read_xml(self):
+        root = ET.fromstring(XML)
+        layout = uvr_layout.compile_layout(root)
+        self.assertEqual(len(layout), 2)
+        for Seite, page in enumerate(layout):
+            self.assertEqual((page.beschreibung, page.id_conf, page.xml_dict), read_xml(root, Seite))
+        self.assertEqual(layout[0].beschreibung,
+                         ['T.Kollektor Wert', 'Pumpe Status', 'Ausgang 15 (analog)  Modus (Hand/Auto)'])
+        self.assertEqual(layout[0].objects[2], ('Bild', 'Pic_Obj', True))
+
+    def test_memory_cache_skips_xml_work(self):
+        first = uvr_layout.load_layout(self.xml_path, cache_path='')
+        with mock.patch.object(uvr_layout.ET, 'parse') as parse, \
+                mock.patch.object(uvr_layout, '_file_hash') as file_hash:
+            second = uvr_layout.load_layout(self.xml_path, cache_path='')
+        parse.assert_not_called()
+        file_hash.assert_not_called()
+        self.assertIs(first, second)
+
+    def test_disk_cache_survives_restart(self):
+        cache_path = os.path.join(self.tmpdir, 'layout.json')
+        first = uvr_layout.load_layout(self.xml_path, cache_path=cache_path)
+        self.assertTrue(os.path.exists(cache_path))
+        uvr_layout.clear_cache()
+        with mock.patch.object(uvr_layout.ET, 'parse') as parse:
+            second = uvr_layout.load_layout(self.xml_path, cache_path=cache_path)
+        parse.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_touched_file_with_same_content_is_not_recompiled(self):
+        uvr_layout.load_layout(self.xml_path, cache_path='')
+        st = os.stat(self.xml_path)
+        os.utime(self.xml_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        with mock.patch.object(uvr_layout.ET, 'parse') as parse:
+            uvr_layout.load_layout(self.xml_path, cache_path='')
+        parse.assert_not_called()
+
+    def test_changed_file_is_recompiled(self):
+        uvr_layout.load_layout(self.xml_path, cache_path='')
+        st = os.stat(self.xml_path)
+        with open(self.xml_path, 'w', encoding='utf-8') as f:
+            f.write(XML.replace('T.Speicher 1 Wert', 'T.Speicher 2 Wert'))
+        os.utime(self.xml_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        layout = uvr_layout.load_layout(self.xml_path, cache_path='')
+        self.assertEqual(layout[1].beschreibung, ['T.Speicher 2 Wert'])
+
+
+if __name__ == '__main__':
+    unittest.main()
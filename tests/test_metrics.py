@@ -0,0 +1,78 @@
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+import uvr_fetch
+from uvr_fetch import get_fetcher
+from uvr_metrics import FETCH_BYTES, FETCH_RETRIES, MESSAGES, Counter, Histogram, MetricsServer, Registry
+from uvr_mqtt import StateDeltaFilter, send_values
+from uvr_simulator import RecordedPages, SimulatedCMI, Simulator
+
+HTML = '<div id="pos0" >\n 63,3 Â°C</div>\n'
+
+
+class FakeClient:
+    def publish(self, topic, payload, retain=False):
+        pass
+
+
+class TestMetrics(unittest.TestCase):
+    def test_text_format(self):
+        registry = Registry()
+        counter = registry.register(Counter('x_total', 'Things.', ('ip',)))
+        histogram = registry.register(Histogram('x_seconds', 'Latency.', buckets=(0.1, 1.0)))
+        counter.inc(ip='10.0.0."1"')
+        counter.inc(2, ip='10.0.0."1"')
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP x_total Things.',
+            '# TYPE x_total counter',
+            'x_total{ip="10.0.0.\\"1\\""} 3',
+            '# HELP x_seconds Latency.',
+            '# TYPE x_seconds histogram',
+            'x_seconds_bucket{le="0.1"} 1',
+            'x_seconds_bucket{le="1"} 2',
+            'x_seconds_bucket{le="+Inf"} 3',
+            'x_seconds_sum 5.55',
+            'x_seconds_count 3',
+        ])
+
+    def test_endpoint(self):
+        registry = Registry()
+        registry.register(Counter('x_total', 'Things.')).inc()
+        server = MetricsServer(0, registry=registry).start()
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics') as resp:
+                self.assertIn('x_total 1', resp.read().decode('utf-8'))
+                self.assertTrue(resp.headers['Content-Type'].startswith('text/plain'))
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f'http://127.0.0.1:{server.port}/')
+        finally:
+            server.stop()
+
+    def test_fetch_bytes_and_retries(self):
+        cmi = SimulatedCMI(RecordedPages([{'Seite': 0, 'html': HTML}]), error_rate=1.0)
+        with Simulator(cmi) as sim, mock.patch('time.sleep'), mock.patch.object(uvr_fetch, '_fetchers', {}):
+            fetcher = get_fetcher(sim.address, 'user', '')
+            self.addCleanup(fetcher.close)
+            fetcher.fetch(f'http://{sim.address}/schematic_files/1.cgi')
+            self.assertEqual(FETCH_RETRIES.value(ip=sim.address), 2)
+            cmi.error_rate = 0.0
+            fetcher.fetch(f'http://{sim.address}/schematic_files/1.cgi')
+            self.assertEqual(FETCH_BYTES.value(ip=sim.address), len(HTML.encode('latin-1')))
+
+    def test_published_and_suppressed_messages(self):
+        published, suppressed = MESSAGES.value(result='published'), MESSAGES.value(result='suppressed')
+        delta = StateDeltaFilter()
+        values = [{'T.Kollektor Wert': {'value': 63.3, 'unit': '°C'}}]
+        send_values(FakeClient(), 'UVR', values, delta=delta)
+        send_values(FakeClient(), 'UVR', values, delta=delta)
+        self.assertEqual(MESSAGES.value(result='published') - published, 1)
+        self.assertEqual(MESSAGES.value(result='suppressed') - suppressed, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
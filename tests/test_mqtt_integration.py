@@ -1,5 +1,15 @@
+import json
+import socket
+import threading
 import unittest
-from uvr_mqtt import send_config, send_values, sanitize_name
+from unittest import mock
+
+import uvr_mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.reasoncodes import ReasonCode
+from uvr_metrics import RECONNECT_SECONDS, RECONNECTS
+from uvr_mqtt import (ConnectionSupervisor, DeviceState, EntityRegistry, StateDeltaFilter, SupervisedClient,
+                      build_config, send_config, send_values, sanitize_name)
 
 
 class FakeClient:
@@ -38,5 +48,282 @@ class TestMQTTIntegration(unittest.TestCase):
         self.assertTrue(any('/t_speicher_1_wert/state' in t for t in topics))
 
 
+class TestEntityRegistry(unittest.TestCase):
+    def test_plan_compiled_once_per_name_and_unit(self):
+        registry = EntityRegistry('UVR')
+        values = [{
+            'T.Speicher 1 Wert': {'value': 61.9, 'unit': '°C'},
+            'Pumpe 1 Status': {'value': 1.0, 'unit': 'switch'},
+        }]
+        client = FakeClient()
+        with mock.patch.object(uvr_mqtt, 'sanitize_name', wraps=uvr_mqtt.sanitize_name) as sanitize:
+            for _ in range(3):
+                send_values(client, 'UVR', values, registry=registry)
+        self.assertEqual(sanitize.call_count, 2)
+        self.assertEqual(len(registry), 2)
+        self.assertEqual(len(client.published), 6)
+        # a new unit for a known name gets its own plan
+        plan = registry.plan('Pumpe 1 Status', None)
+        self.assertEqual(plan.entity_type, 'sensor')
+        self.assertEqual(len(registry), 3)
+
+    def test_plan_encoders(self):
+        registry = EntityRegistry('UVR')
+        mode = registry.plan('Ausgang 15 Modus_mode', 'OutputMode')
+        self.assertEqual(mode.state_topic, 'homeassistant/sensor/uvr/ausgang_15_modus_mode/state')
+        self.assertEqual(mode.encode(1, 'x'), 'AUTO')
+        self.assertEqual(mode.encode(0, 'x'), 'HAND')
+        self.assertEqual(registry.plan('Pumpe', 'switch').encode(0.0, 'Pumpe'), 'OFF')
+        self.assertEqual(registry.plan('Zaehler', None).encode('11', 'Zaehler'), 11.0)
+        self.assertEqual(registry.plan('Text', None).encode('abc', 'Text'), 'abc')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStateDeltaFilter(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        self.clock = FakeClock()
+        self.delta = StateDeltaFilter({'°C': 0.2}, heartbeat=300, clock=self.clock)
+
+    def publish(self, temp, pump):
+        self.client.published.clear()
+        values = [{
+            'T.Speicher 1 Wert': {'value': temp, 'unit': '°C'},
+            'Pumpe 1 Status': {'value': pump, 'unit': 'switch'},
+        }]
+        send_values(self.client, 'UVR', values, delta=self.delta)
+        return {t.rsplit('/', 2)[-2]: p for t, p, _ in self.client.published}
+
+    def test_only_changes_beyond_deadband_are_sent(self):
+        self.assertEqual(self.publish(61.9, 1.0), {'t_speicher_1_wert': '61.9', 'pumpe_1_status': 'ON'})
+        self.assertEqual(self.publish(62.0, 1.0), {})
+        # drift is measured against the last published value
+        self.assertEqual(self.publish(62.2, 0.0), {'t_speicher_1_wert': '62.2', 'pumpe_1_status': 'OFF'})
+        self.assertEqual(self.delta.stats(), {'sent': 4, 'suppressed': 2, 'heartbeats': 0})
+
+    def test_heartbeat_republishes_unchanged_values(self):
+        self.publish(61.9, 1.0)
+        self.clock.now = 299
+        self.assertEqual(self.publish(61.9, 1.0), {})
+        self.clock.now = 300
+        self.assertEqual(len(self.publish(61.9, 1.0)), 2)
+        self.assertEqual(self.delta.heartbeats, 2)
+
+    def test_heartbeat_due(self):
+        self.assertFalse(self.delta.heartbeat_due())
+        self.publish(61.9, 1.0)
+        self.clock.now = 299
+        self.assertFalse(self.delta.heartbeat_due())
+        self.clock.now = 300
+        self.assertTrue(self.delta.heartbeat_due())
+
+    def test_reset_republishes_everything(self):
+        self.publish(61.9, 1.0)
+        self.delta.reset()
+        self.assertEqual(len(self.publish(61.9, 1.0)), 2)
+
+
+class FakePahoClient:
+    """Client stand-in recording what the supervisor configures; tests fire paho's callbacks by hand."""
+
+    def __init__(self):
+        self.delays = None
+        self.connect_timeout = None
+        self.on_pre_connect = self.on_connect = self.on_connect_fail = self.on_disconnect = None
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120):
+        self.delays = (min_delay, max_delay)
+
+    def attempt(self, up):
+        self.on_pre_connect(self, None)
+        if up:
+            self.on_connect(self, None, {}, 0, None)
+        else:
+            self.on_connect_fail(self, None)
+
+
+class TestDeviceStateMode(unittest.TestCase):
+    VALUES = [{
+        'T.Speicher 1 Wert': {'value': 61.9, 'unit': '°C'},
+        'Pumpe 1 Status': {'value': 1.0, 'unit': 'switch'},
+    }]
+
+    def test_discovery_uses_shared_topic_and_value_template(self):
+        _topic, message = build_config('UVR', 't_speicher_1_wert', '°C', bulk=True)
+        config = json.loads(message)
+        self.assertEqual(config['state_topic'], 'homeassistant/uvr/state')
+        self.assertEqual(config['value_template'], "{{ value_json['t_speicher_1_wert'] }}")
+        self.assertNotIn('value_template', json.loads(build_config('UVR', 't_speicher_1_wert', '°C')[1]))
+
+    def test_one_document_per_call_with_all_known_values(self):
+        client = FakeClient()
+        document = DeviceState('UVR')
+        send_values(client, 'UVR', self.VALUES, document=document)
+        send_values(client, 'UVR', [{'Zaehler': {'value': '11', 'unit': None}}], document=document)
+        self.assertEqual([topic for topic, _p, _r in client.published], ['homeassistant/uvr/state'] * 2)
+        self.assertEqual(json.loads(client.published[-1][1]),
+                         {'t_speicher_1_wert': 61.9, 'pumpe_1_status': 'ON', 'zaehler': 11.0})
+
+    def test_document_only_published_when_an_entity_changed(self):
+        client = FakeClient()
+        document = DeviceState('UVR')
+        delta = StateDeltaFilter({'°C': 0.2}, clock=FakeClock())
+        send_values(client, 'UVR', self.VALUES, delta=delta, document=document)
+        values = [{**self.VALUES[0], 'T.Speicher 1 Wert': {'value': 62.0, 'unit': '°C'}}]
+        send_values(client, 'UVR', values, delta=delta, document=document)
+        self.assertEqual(len(client.published), 1)
+        values[0]['Pumpe 1 Status'] = {'value': 0.0, 'unit': 'switch'}
+        send_values(client, 'UVR', values, delta=delta, document=document)
+        self.assertEqual(json.loads(client.published[-1][1]), {'t_speicher_1_wert': 62.0, 'pumpe_1_status': 'OFF'})
+
+
+class SocketBroker:
+    """Accepts one MQTT connection, acknowledges CONNECT and records every PUBLISH (topic, payload)."""
+
+    def __init__(self):
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.port = self.server.getsockname()[1]
+        self.published = []
+        self.errors = []
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _read(self, conn, n):
+        data = b''
+        while len(data) < n:
+            chunk = conn.recv(n - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def _serve(self):
+        conn, _addr = self.server.accept()
+        try:
+            while True:
+                header = self._read(conn, 1)[0]
+                length, shift = 0, 0
+                while True:
+                    byte = self._read(conn, 1)[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = self._read(conn, length)
+                kind = header & 0xF0
+                if kind == 0x10:
+                    conn.sendall(b'\x20\x02\x00\x00')
+                elif kind == 0x30:
+                    topic_len = int.from_bytes(body[:2], 'big')
+                    self.published.append((body[2:2 + topic_len].decode(), body[2 + topic_len:].decode()))
+                elif kind == 0xE0:
+                    return
+                else:
+                    self.errors.append(header)
+        except (EOFError, OSError, UnicodeDecodeError) as exc:
+            self.errors.append(exc)
+        finally:
+            conn.close()
+            self.server.close()
+
+
+class TestSupervisedClientThreads(unittest.TestCase):
+    def test_publishes_from_several_threads_arrive_intact(self):
+        broker = SocketBroker()
+        client = SupervisedClient(callback_api_version=uvr_mqtt.mqtt.CallbackAPIVersion.VERSION2)
+        client.supervise('127.0.0.1', broker.port)
+        client.loop_start()
+        self.assertTrue(client.supervisor.connected.wait(5))
+        writers = set()
+        loop_write = client.loop_write
+
+        def recording_loop_write():
+            writers.add(threading.current_thread())
+            return loop_write()
+        client.loop_write = recording_loop_write
+
+        def publish(n):
+            for i in range(300):
+                client.publish(f'uvr/{n}/{i}/state', f'{n}-{i}-' + 'x' * 200)
+        threads = [threading.Thread(target=publish, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        deadline = threading.Event()
+        for _ in range(100):
+            if len(broker.published) == 1200:
+                break
+            deadline.wait(0.05)
+        publish_writers = set(writers)
+        client.disconnect()
+        broker.thread.join(5)
+        client.loop_stop()
+        # only paho's loop thread writes to the socket
+        self.assertEqual(len(publish_writers), 1)
+        self.assertTrue(publish_writers.pop().name.startswith('paho-mqtt-client-'))
+        self.assertEqual(broker.errors, [])
+        self.assertEqual(sorted(broker.published),
+                         sorted((f'uvr/{n}/{i}/state', f'{n}-{i}-' + 'x' * 200) for n in range(4) for i in range(300)))
+
+
+class TestConnectionSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = FakePahoClient()
+        self.supervisor = ConnectionSupervisor(self.client, min_backoff=1, max_backoff=8, connect_timeout=3,
+                                               clock=self.clock)
+
+    def test_backoff_is_configured_on_paho(self):
+        self.assertEqual(self.client.delays, (1, 8))
+        self.assertEqual(self.client.connect_timeout, 3)
+
+    def test_failed_attempts_back_off_and_reset_on_connect(self):
+        failed = RECONNECTS.value(result='failed')
+        backoffs = []
+        for _ in range(5):
+            self.client.attempt(up=False)
+            backoffs.append(self.supervisor.backoff())
+        self.assertEqual(backoffs, [1, 2, 4, 8, 8])
+        self.assertEqual(RECONNECTS.value(result='failed') - failed, 5)
+        self.assertFalse(self.supervisor.is_connected())
+        self.client.attempt(up=True)
+        self.assertTrue(self.supervisor.is_connected())
+        self.assertTrue(self.supervisor.connected.is_set())
+        self.assertEqual((self.supervisor.attempts, self.supervisor.failures, self.supervisor.backoff()), (6, 0, 1))
+
+    def test_lost_connection_records_duration(self):
+        self.client.attempt(up=True)
+        observed = RECONNECT_SECONDS.count()
+        self.client.on_disconnect(self.client, None, {}, ReasonCode(PacketTypes.DISCONNECT, identifier=0x80), None)
+        self.assertFalse(self.supervisor.is_connected())
+        self.clock.now = 5
+        self.client.attempt(up=False)
+        self.clock.now = 7
+        self.client.attempt(up=True)
+        self.assertTrue(self.supervisor.is_connected())
+        self.assertEqual(RECONNECT_SECONDS.count(), observed + 1)
+
+    def test_refused_connack_is_counted_once(self):
+        self.client.on_pre_connect(self.client, None)
+        self.client.on_connect(self.client, None, {}, ReasonCode(PacketTypes.CONNACK, identifier=0x87), None)
+        self.client.on_disconnect(self.client, None, {}, ReasonCode(PacketTypes.DISCONNECT, identifier=0x80), None)
+        self.assertEqual(self.supervisor.state, ConnectionSupervisor.DISCONNECTED)
+        self.assertEqual(self.supervisor.failures, 1)
+
+    def test_missing_connack_fails_the_attempt(self):
+        # paho's keepalive check closes a socket that never got its CONNACK
+        self.client.on_pre_connect(self.client, None)
+        self.client.on_disconnect(self.client, None, {}, ReasonCode(PacketTypes.DISCONNECT, identifier=0x80), None)
+        self.assertEqual(self.supervisor.failures, 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import xml.etree.ElementTree as ET
+
+import uvr
+from uvr_layout import compile_layout
+
+XML = """<?xml version="1.0" encoding="utf-8"?>
+<TA>
+  <Seiten>
+    <Seite_0>
+      <Objekte>
+        <Objekt_0 Bezeichnung="Seite 1: T.Kollektor Wert" Objekt_Typ="Text_Obj"/>
+        <Objekt_1 Bezeichnung="Seite 1: Pumpe Status" Objekt_Typ="Text_Obj"/>
+      </Objekte>
+    </Seite_0>
+  </Seiten>
+</TA>
+"""
+
+HTML = '<div id="pos0" >\n 63,3 Â°C</div>\n<div id="pos1" >\nEIN</div>\n'
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        uvr.page_cache.clear()
+        self.layout = compile_layout(ET.fromstring(XML))[0]
+        self.key = ('10.0.0.1', 0)
+
+    def tearDown(self):
+        uvr.page_cache.clear()
+
+    def test_identical_html_reuses_combined_dict(self):
+        first, unchanged = uvr.combine_page_cached(self.key, self.layout, HTML)
+        self.assertFalse(unchanged)
+        self.assertEqual(first['T.Kollektor Wert']['value'], 63.3)
+        second, unchanged = uvr.combine_page_cached(self.key, self.layout, HTML)
+        self.assertTrue(unchanged)
+        self.assertIs(second, first)
+        self.assertEqual(uvr.page_cache_stats(), {'10.0.0.1/0': {'parsed': 1, 'unchanged': 1}})
+
+    def test_changed_html_layout_or_backend_is_parsed_again(self):
+        uvr.combine_page_cached(self.key, self.layout, HTML)
+        page, unchanged = uvr.combine_page_cached(self.key, self.layout, HTML.replace('63,3', '64,0'))
+        self.assertFalse(unchanged)
+        self.assertEqual(page['T.Kollektor Wert']['value'], 64.0)
+        relayout = compile_layout(ET.fromstring(XML))[0]
+        self.assertFalse(uvr.combine_page_cached(self.key, relayout, HTML)[1])
+        self.assertFalse(uvr.combine_page_cached(self.key, relayout, HTML, backend='bs4')[1])
+        # pages of another CMI never share an entry
+        self.assertFalse(uvr.combine_page_cached(('10.0.0.2', 0), relayout, HTML, backend='bs4')[1])
+
+    def test_missing_page_is_not_cached(self):
+        self.assertEqual(uvr.combine_page_cached(self.key, self.layout, None), (None, False))
+        self.assertEqual(uvr.page_cache_stats(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from pathlib import Path
+
+from uvr_parse import combine_html_xml, MyHTMLParser, parse_html, parse_html_bs, parse_html_fast
+
+FIXTURES = sorted((Path(__file__).resolve().parent.parent / 'debug_html').glob('debug_fetched_html_seite*.html'))
+
+
+def _layout_for(html):
+    # one label per position; the Modus label triggers the mode/percent split
+    ids = parse_html_bs(html)[0]
+    xml_dict = {}
+    for pos in ids:
+        xml_dict[f'Modus (Hand/Auto) {pos}' if pos in (14, 41) else f'Wert {pos}'] = pos
+    return list(xml_dict), list(range(len(ids))), xml_dict
+
+
+class TestParseBackends(unittest.TestCase):
+    def test_fixtures_present(self):
+        self.assertTrue(FIXTURES)
+
+    def test_fast_matches_bs4_on_fixtures(self):
+        for path in FIXTURES:
+            html = path.read_text(encoding='utf-8')
+            with self.subTest(fixture=path.name):
+                ids_bs, content_bs, dict_bs, lines_bs = parse_html_bs(html)
+                ids_fast, content_fast, dict_fast, lines_fast = parse_html_fast(html)
+                self.assertEqual(ids_fast, ids_bs)
+                self.assertEqual(content_fast, content_bs)
+                self.assertEqual(dict_fast, dict_bs)
+                self.assertEqual(lines_fast, lines_bs)
+
+    def test_combined_results_identical(self):
+        for path in FIXTURES:
+            html = path.read_text(encoding='utf-8')
+            beschreibung, id_conf, xml_dict = _layout_for(html)
+            with self.subTest(fixture=path.name):
+                fast = combine_html_xml(MyHTMLParser, beschreibung, id_conf, xml_dict, html, backend='fast')
+                bs4 = combine_html_xml(MyHTMLParser, beschreibung, id_conf, xml_dict, html, backend='bs4')
+                self.assertEqual(fast, bs4)
+
+    def test_modus_lines(self):
+        html = '<div id="pos41" >\n<a href="x">\nAUTO<br>  0,0 %</a>\n</div>'
+        _ids, content, _dict, lines = parse_html_fast(html)
+        self.assertEqual(content[41], '\n<a href="x">\nAUTO<br/>  0,0 %</a>\n')
+        self.assertEqual(lines[41], ['AUTO', '  0,0 %'])
+
+    def test_entities_and_attribute_order(self):
+        html = '<div class="x" id=\'pos7\'>12,5&nbsp;&deg;C</div>'
+        _ids, _content, html_dict, _lines = parse_html_fast(html)
+        self.assertEqual(html_dict, parse_html_bs(html)[2])
+        self.assertEqual(html_dict[7], {'value': 12.5, 'unit': '°C'})
+
+    def test_nested_divs_fall_back_to_bs4(self):
+        html = '<div id="pos0"><div id="pos1">EIN</div></div>'
+        with self.assertRaises(ValueError):
+            parse_html_fast(html)
+        ids, _content, html_dict, lines = parse_html(html, 'fast')
+        self.assertEqual(ids, [0, 1])
+        self.assertEqual(lines, {0: ['EIN'], 1: ['EIN']})
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            parse_html('<div id="pos0">AUS</div>', 'lxml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import pstats
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import unittest
+
+from uvr_profile import CycleProfiler, profiler_from_config
+
+
+def busy(seconds=0.03):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+class TestCycleProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_idle_until_requested(self):
+        profiler = CycleProfiler(self.tmpdir)
+        with profiler.cycle(1):
+            busy(0)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_cprofile_next_cycles(self):
+        profiler = CycleProfiler(self.tmpdir, cycles=2)
+        profiler.request()
+        for number in (7, 8, 9):
+            with profiler.cycle(number):
+                busy()
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['cycle-000007.pstats', 'cycle-000008.pstats'])
+        stats = pstats.Stats(os.path.join(self.tmpdir, 'cycle-000007.pstats'))
+        self.assertTrue(any(func[2] == 'busy' for func in stats.stats))
+
+    def test_discarded_cycles_do_not_count(self):
+        profiler = CycleProfiler(self.tmpdir)
+        profiler.request(1)
+        with profiler.cycle(1) as profile:
+            profile.discard()
+        with profiler.cycle(2):
+            busy(0)
+        self.assertEqual(os.listdir(self.tmpdir), ['cycle-000002.pstats'])
+
+    def test_sampler_sees_worker_threads(self):
+        profiler = CycleProfiler(self.tmpdir, mode='sample')
+        profiler.request(1)
+        with profiler.cycle(3):
+            worker = threading.Thread(target=busy, args=(0.1,), name='uvr-fetch-test')
+            worker.start()
+            worker.join()
+        with open(os.path.join(self.tmpdir, 'cycle-000003.collapsed'), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any(line.startswith('uvr-fetch-test;') and 'busy (' in line for line in lines))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+
+    @unittest.skipUnless(hasattr(signal, 'SIGUSR1'), 'SIGUSR1 not available')
+    def test_signal_and_config(self):
+        profiler = profiler_from_config({'profile': {'directory': self.tmpdir, 'signal_cycles': 4}})
+        self.assertEqual(profiler.remaining, 0)
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            self.assertTrue(profiler.install_signal_handler())
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertEqual(profiler.remaining, 4)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        self.assertEqual(profiler_from_config({'profile': {'cycles': 2}}).remaining, 2)
+        with self.assertRaises(ValueError):
+            CycleProfiler(self.tmpdir, mode='perf')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+
+from uvr_mqtt import DeviceState, StateDeltaFilter, send_values
+from uvr_publisher import Publisher, message_kind
+
+
+class FakeInfo:
+    def __init__(self, mid, rc=0):
+        self.mid = mid
+        self.rc = rc
+        self.published = False
+
+    def is_published(self):
+        return self.published
+
+
+class FakeClient:
+    """Hands out mids; nothing is acknowledged until ack() is called."""
+
+    def __init__(self, rc=0):
+        self.published = []
+        self.infos = {}
+        self.rc = rc
+        self.on_publish = None
+        self.inflight_limit = None
+
+    def max_inflight_messages_set(self, n):
+        self.inflight_limit = n
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload, qos, retain))
+        info = self.infos[len(self.published)] = FakeInfo(len(self.published), self.rc)
+        return info
+
+    def ack(self, mid):
+        self.infos[mid].published = True
+        self.on_publish(self, None, mid, 0, None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPublisher(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        self.clock = FakeClock()
+        self.publisher = Publisher(self.client, qos={'state': 1}, max_inflight=2, max_queued=3, clock=self.clock)
+
+    def test_kinds_and_qos(self):
+        self.assertEqual(message_kind('homeassistant/sensor/uvr_sensor_t/config'), 'discovery')
+        self.assertEqual(message_kind('homeassistant/uvr/availability'), 'availability')
+        self.assertEqual(message_kind('homeassistant/sensor/uvr/t/state'), 'state')
+        self.publisher.publish('homeassistant/sensor/uvr_sensor_t/config', '{}', retain=True)
+        self.publisher.publish('homeassistant/uvr/availability', 'online', retain=True)
+        self.assertEqual([(qos, retain) for _t, _p, qos, retain in self.client.published], [(1, True), (1, True)])
+        self.assertEqual(self.client.inflight_limit, 2)
+
+    def test_window_supersede_and_overflow(self):
+        for topic in 'abcde':
+            self.publisher.publish(f'uvr/{topic}/state', '1')
+        # a and b are in flight, c d e queued
+        self.assertEqual([t for t, *_ in self.client.published], ['uvr/a/state', 'uvr/b/state'])
+        self.publisher.publish('uvr/c/state', '2')  # replaces the queued value in place
+        self.publisher.publish('uvr/f/state', '1')  # queue full: d (oldest) is dropped... after c
+        report = self.publisher.cycle_report()
+        self.assertEqual((report['superseded'], report['overflow']), (1, 1))
+        self.assertEqual((report['queued'], report['inflight']), (3, 2))
+        self.client.ack(1)
+        self.client.ack(2)
+        self.assertEqual(self.client.published[2:], [('uvr/d/state', '1', 1, False), ('uvr/e/state', '1', 1, False)])
+
+    def test_ack_latency_per_cycle(self):
+        self.publisher.publish('uvr/a/state', '1')
+        self.clock.now = 0.25
+        self.client.ack(1)
+        report = self.publisher.cycle_report()
+        self.assertEqual((report['sent'], report['acked'], report['ack_max_ms']), (1, 1, 250.0))
+        self.assertEqual(self.publisher.cycle_report()['ack_max_ms'], None)
+
+    def test_early_ack_and_flush(self):
+        client = self.client
+        original = client.publish
+
+        def publish_and_ack(*args, **kwargs):
+            info = original(*args, **kwargs)
+            info.published = False
+            client.on_publish(client, None, info.mid, 0, None)  # callback before publish() returns
+            return info
+        client.publish = publish_and_ack
+        self.publisher.publish('uvr/a/state', '1')
+        self.assertEqual(self.publisher.pending(), 0)
+        self.assertTrue(self.publisher.flush(0.1))
+
+    def test_stale_inflight_entries_expire(self):
+        self.publisher.publish('uvr/a/state', '1')
+        self.publisher.publish('uvr/b/state', '1')
+        self.publisher.publish('uvr/c/state', '1')
+        self.assertFalse(self.publisher.flush(0.01))
+        self.clock.now = 120
+        self.publisher.pump()
+        self.assertEqual(self.client.published[-1][0], 'uvr/c/state')
+        self.assertEqual(self.publisher.cycle_report()['expired'], 2)
+
+    def test_send_values_through_publisher(self):
+        send_values(self.publisher, 'UVR', [{'T': {'value': 1.0, 'unit': '°C'}}])
+        self.assertEqual(self.client.published, [('homeassistant/sensor/uvr/t/state', '1.0', 1, False)])
+
+
+class TestDroppedStatesAreRepublished(unittest.TestCase):
+    VALUES = [{name: {'value': 1.0, 'unit': '°C'}} for name in 'ABCDEF']
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.publisher = Publisher(self.client, max_inflight=2, max_queued=3)
+        self.delta = StateDeltaFilter(heartbeat=0)
+
+    def test_overflow_clears_the_delta_mark(self):
+        # two in flight, three queued: the oldest queued state overflows
+        send_values(self.publisher, 'UVR Drops', self.VALUES, delta=self.delta)
+        for mid in range(1, 6):
+            self.client.ack(mid)
+        sent = [topic for topic, *_rest in self.client.published]
+        self.assertEqual(len(sent), 5)
+        send_values(self.publisher, 'UVR Drops', self.VALUES, delta=self.delta)
+        self.assertEqual(len(self.client.published), 6)
+        self.assertNotIn(self.client.published[-1][0], sent)
+
+    def test_refused_document_clears_all_of_its_states(self):
+        client = FakeClient(rc=4)
+        publisher = Publisher(client)
+        document = DeviceState('UVR Drops')
+        send_values(publisher, 'UVR Drops', self.VALUES, delta=self.delta, document=document)
+        client.rc = 0
+        send_values(publisher, 'UVR Drops', self.VALUES, delta=self.delta, document=document)
+        self.assertEqual([topic for topic, *_rest in client.published], [document.topic] * 2)
+        self.assertEqual(self.delta.stats()['suppressed'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import uvr_capture
+from uvr_layout import compile_layout
+from uvr_replay import load_records, replay
+
+XML = """<?xml version="1.0" encoding="utf-8"?>
+<TA>
+  <Seiten>
+    <Seite_0>
+      <Objekte>
+        <Objekt_0 Bezeichnung="Seite 1: T.Kollektor Wert" Objekt_Typ="Text_Obj"/>
+        <Objekt_1 Bezeichnung="Seite 1: Pumpe Status" Objekt_Typ="Text_Obj"/>
+      </Objekte>
+    </Seite_0>
+  </Seiten>
+</TA>
+"""
+
+HTML = '<div id="pos0" >\n 63,3 Â°C</div>\n<div id="pos1" >\nEIN</div>\n'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.layout = compile_layout(ET.fromstring(XML))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_debug_html_directory(self):
+        for name in ('debug_fetched_html_seite0.html', 'debug_fetched_html_seite5.html', 'notes.html'):
+            with open(os.path.join(self.tmpdir, name), 'w', encoding='utf-8') as f:
+                f.write(HTML)
+        records = load_records(self.tmpdir)
+        self.assertEqual([r['Seite'] for r in records], [0, 5])
+        report = replay(records, self.layout, loops=3)
+        # page 5 is not in the layout
+        self.assertEqual((report['pages'], report['skipped']), (3, 3))
+        self.assertEqual(report['publishes'], 6)
+        self.assertEqual(set(report['stages']), {'combine', 'filter', 'publish'})
+        self.assertEqual(report['stages']['combine']['count'], 3)
+
+    def test_capture_archive_at_speed(self):
+        archive = uvr_capture.CaptureArchive(self.tmpdir)
+        archive.write([{'time': 1000.0 + t, 'ip': '10.0.0.1', 'Seite': 0, 'reason': 'fetch', 'html': HTML}
+                       for t in (0, 60, 120)])
+        archive.close()
+        records = load_records(self.tmpdir)
+        clock = FakeClock()
+        report = replay(records, self.layout, speed=60, sleep=clock.sleep, clock=clock)
+        # 60 s between recordings replayed at 60x = 1 s apart
+        self.assertEqual(clock.slept, [1.0, 1.0])
+        self.assertEqual(report['pages'], 3)
+
+    def test_nothing_to_replay(self):
+        with self.assertRaises(ValueError):
+            load_records(self.tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from uvr_mqtt import StateDeltaFilter
+from uvr_scheduler import PageScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def page(value):
+    return {'T.Kollektor Wert': {'value': value, 'unit': '°C'}}
+
+
+class TestPageScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_all_pages_due_at_start(self):
+        scheduler = PageScheduler(3, clock=self.clock)
+        self.assertEqual(scheduler.due(), [0, 1, 2])
+        self.assertEqual(scheduler.seconds_until_next(), 0.0)
+
+    def test_changing_page_tightens_static_page_backs_off(self):
+        scheduler = PageScheduler(2, interval=60, min_interval=15, max_interval=300, clock=self.clock)
+        for Seite in (0, 1):
+            scheduler.record(Seite, page(20.0))
+        self.assertEqual(scheduler.due(), [])
+        self.assertEqual(scheduler.seconds_until_next(), 60)
+
+        self.clock.now += 60
+        scheduler.record(0, page(21.0))
+        scheduler.record(1, page(20.0))
+        self.assertEqual(scheduler.intervals, {0: 30, 1: 90})
+        self.clock.now += 30
+        self.assertEqual(scheduler.due(), [0])
+
+        for i in range(10):
+            scheduler.record(0, page(22.0 + i))
+            scheduler.record(1, page(20.0))
+        self.assertEqual(scheduler.intervals, {0: 15, 1: 300})
+        self.assertEqual(scheduler.stats()[0]['changes'], 11)
+
+    def test_floor_defaults_to_start_interval(self):
+        scheduler = PageScheduler(1, interval=60, clock=self.clock)
+        for i in range(5):
+            scheduler.record(0, page(20.0 + i))
+        self.assertEqual(scheduler.intervals[0], 60)
+
+    def test_changes_within_deadband_count_as_static(self):
+        delta = StateDeltaFilter({'°C': 0.5})
+        scheduler = PageScheduler(1, interval=60, min_interval=15, delta=delta, clock=self.clock)
+        for value in (20.0, 20.1, 20.2, 20.3):
+            scheduler.record(0, page(value))
+        self.assertEqual((scheduler.intervals[0], scheduler.changes[0]), (202.5, 0))
+        # the drift is measured from the last change, so it eventually counts
+        scheduler.record(0, page(20.6))
+        self.assertEqual((scheduler.intervals[0], scheduler.changes[0]), (101.25, 1))
+
+    def test_fixed_intervals_and_failed_reads(self):
+        scheduler = PageScheduler(2, interval=60, fixed={'1': 10}, clock=self.clock)
+        scheduler.record(1, page(1.0))
+        scheduler.record(1, page(2.0))
+        self.assertEqual(scheduler.intervals[1], 10)
+        # an unreadable page keeps its interval and is retried one interval later
+        scheduler.record(0, None)
+        self.assertEqual(scheduler.intervals[0], 60)
+        self.assertEqual(scheduler.next_poll[0], self.clock.now + 60)
+        self.assertEqual(scheduler.stats()[0]['polls'], 0)
+
+    def test_from_config_without_adaptation(self):
+        cfg = {'poll_interval': 45, 'adaptive_polling': False, 'page_intervals': {}}
+        scheduler = PageScheduler.from_config(cfg, 1, clock=self.clock)
+        scheduler.record(0, page(1.0))
+        scheduler.record(0, page(2.0))
+        self.assertEqual(scheduler.intervals[0], 45)
+
+
+if __name__ == '__main__':
+    unittest.main()
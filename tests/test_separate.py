@@ -1,5 +1,7 @@
+import threading
 import unittest
 from uvr import separate
+from uvr_parse import _DecodeCache, decode_cache_clear, decode_cache_info, decode_fragments, decode_modes
 
 
 class TestSeparate(unittest.TestCase):
@@ -24,5 +26,81 @@ class TestSeparate(unittest.TestCase):
         self.assertEqual(u, 'OutputMode')
 
 
+class TestDecodeCache(unittest.TestCase):
+    def setUp(self):
+        decode_cache_clear()
+
+    def test_repeated_fragments_hit_cache(self):
+        for _ in range(3):
+            self.assertEqual(separate(' 10,2 Â°C'), (10.2, '°C'))
+            self.assertEqual(separate('AUS'), (0.0, 'switch'))
+        info = decode_cache_info()
+        self.assertEqual(info.misses, 2)
+        self.assertEqual(info.hits, 4)
+        self.assertEqual(info.currsize, 2)
+
+    def test_cache_is_bounded(self):
+        maxsize = decode_cache_info().maxsize
+        for n in range(maxsize + 10):
+            separate(f'{n} l/h')
+        self.assertEqual(decode_cache_info().currsize, maxsize)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = _DecodeCache(2)
+        cache.store('a', (1.0, None))
+        cache.store('b', (2.0, None))
+        cache.get_many(['a'])
+        cache.store('c', (3.0, None))
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), [(1.0, None), None, (3.0, None)])
+
+    def test_counts_are_exact_across_threads(self):
+        def work():
+            for _ in range(2000):
+                separate('AUS')
+                decode_fragments(['EIN', ' 10,2 Â°C'])
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = decode_cache_info()
+        self.assertEqual(info.hits + info.misses, 4 * 2000 * 3)
+        self.assertEqual(info.currsize, 3)
+
+    def test_non_string_input(self):
+        self.assertEqual(separate(12), (12.0, None))
+        self.assertEqual(separate(None), (None, None))
+
+
+class TestDecodeFragments(unittest.TestCase):
+    FRAGMENTS = ['61,9 °C', ' 10,2 Â°C', '0,0 %', 'EIN', 'AUS', 'AUTO', '', 'abc', '-3,5 kW', '12 l/h 40 %',
+                 '350 W/m²', 'Sec 4', 'on', '1.234,5 kWh']
+
+    def setUp(self):
+        decode_cache_clear()
+
+    def test_matches_separate(self):
+        values, units = decode_fragments(self.FRAGMENTS)
+        decode_cache_clear()
+        self.assertEqual(list(zip(values, units)), [separate(f) for f in self.FRAGMENTS])
+
+    def test_only_cache_misses_are_scanned(self):
+        separate('AUS')
+        decode_fragments(['AUS', '61,9 °C', '61,9 °C'])
+        info = decode_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 3, 2))
+        self.assertEqual(decode_fragments(['61,9 °C']), ([61.9], ['°C']))
+        self.assertEqual(decode_cache_info().hits, 2)
+
+
+class TestDecodeModes(unittest.TestCase):
+    def test_mode_and_percent(self):
+        modes, percents = decode_modes([['AUTO', '  0,0 %'], ['HAND', '40 %'], ['AUTO 35,5 %'], ['HAND'], ['7'],
+                                        ['x', 'y']])
+        self.assertEqual(modes, [1.0, 0.0, 1.0, 0.0, None, None])
+        self.assertEqual(percents, [0.0, 40.0, 35.5, None, 7.0, None])
+
+
 if __name__ == '__main__':
     unittest.main()
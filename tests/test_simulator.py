@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+import uvr
+from uvr_controllers import ControllerPool, controllers_from_config
+from uvr_fetch import get_fetcher, read_pages
+from uvr_simulator import RecordedPages, SimulatedCMI, Simulator, SyntheticPages
+from uvr_synthetic import SyntheticSchema
+
+HTML = '<div id="pos0" >\n 63,3 Â°C</div>\n'
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, retain=False):
+        self.published.append((topic, payload, retain))
+
+
+class TestSimulator(unittest.TestCase):
+    def test_recorded_pages_with_auth(self):
+        records = [{'Seite': 0, 'html': HTML}, {'Seite': 0, 'html': HTML.replace('63,3', '64,0')}]
+        with Simulator(SimulatedCMI(RecordedPages(records), user='u', password='p')) as sim:
+            self.assertEqual(read_pages(sim.address, [0, 0], 'u', 'p', max_workers=1), [records[0]['html'],
+                                                                                         records[1]['html']])
+            with mock.patch('time.sleep'):
+                self.assertEqual(read_pages(sim.address, [0, 1], 'u', 'wrong', max_workers=1), [None, None])
+        self.assertEqual(sim.cmi.counters['ok'], 2)
+        self.assertEqual(sim.cmi.counters['unauthorized'], 6)
+
+    def test_error_rate(self):
+        cmi = SimulatedCMI(RecordedPages([{'Seite': 0, 'html': HTML}]), error_rate=1.0)
+        with Simulator(cmi) as sim, mock.patch('time.sleep'):
+            self.assertIsNone(get_fetcher(sim.address, 'user', '').fetch(f'http://{sim.address}/schematic_files/1.cgi'))
+        self.assertEqual(cmi.counters['errors'], 3)
+
+    def test_controllers_against_synthetic_cmis(self):
+        schema = SyntheticSchema.generate([20, 10], seed=1)
+        fd, xml_path = tempfile.mkstemp(suffix='.xml')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(schema.xml())
+        sims = [Simulator(SimulatedCMI(SyntheticPages(schema, seed=i), latency=0.01, jitter=0.005)).start()
+                for i in range(2)]
+        uvr_cfg = {'xml_filename': xml_path, 'layout_cache': '', 'user': 'user', 'password': '', 'max_workers': 2,
+                   'controllers': [{'name': f'Sim {i}', 'ip': sim.address} for i, sim in enumerate(sims)]}
+        client = FakeClient()
+        pool = ControllerPool(controllers_from_config(uvr_cfg, 'UVR', {'discovery_manifest': ''}))
+        try:
+            pool.start(client)
+            self.assertEqual(pool.poll(client), {'sim_0': [0, 1], 'sim_1': [0, 1]})
+        finally:
+            pool.close()
+            for sim in sims:
+                sim.stop()
+            os.unlink(xml_path)
+            uvr.page_cache.clear()
+        states = [t for t, _p, _r in client.published if t.endswith('/state')]
+        self.assertTrue(any('/sim_0/' in t for t in states) and any('/sim_1/' in t for t in states))
+        self.assertEqual([sim.cmi.counters['requests'] for sim in sims], [4, 4])
+
+    def test_schema_from_xml_matches_generated_kinds(self):
+        schema = SyntheticSchema.generate([40, 15], seed=2)
+        self.assertEqual(SyntheticSchema.from_xml(ET.fromstring(schema.xml())).pages, schema.pages)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from uvr_publisher import Publisher
+from uvr_spool import Spool, SpoolClient, spool_from_config
+
+
+class FakeClient:
+    def __init__(self, fail_after=None):
+        self.published = []
+        self.fail_after = fail_after
+
+    def publish(self, topic, payload, retain=False):
+        if self.fail_after is not None and len(self.published) >= self.fail_after:
+            return type('Info', (), {'rc': 4})()  # MQTT_ERR_NO_CONN
+        self.published.append((topic, payload, retain))
+
+
+class FakeInfo:
+    def __init__(self, published, rc=0):
+        self.published = published
+        self.rc = rc
+        self.mid = None
+
+    def wait_for_publish(self, timeout=None):
+        pass
+
+    def is_published(self):
+        return self.published
+
+
+class AckingClient:
+    """Accepts everything, but only the first ``acked`` messages are written before the timeout."""
+
+    def __init__(self, acked):
+        self.acked = acked
+        self.published = []
+        self.infos = []
+        self.on_publish = None
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload))
+        self.infos.append(FakeInfo(len(self.published) <= self.acked))
+        return self.infos[-1]
+
+
+class FakeWait:
+    def __init__(self, stop_after=None):
+        self.waits = []
+        self.stop_after = stop_after
+
+    def __call__(self, seconds):
+        self.waits.append(seconds)
+        return self.stop_after is not None and len(self.waits) >= self.stop_after
+
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def fill(self, spool, rounds, topics=3):
+        client = SpoolClient(spool)
+        for r in range(rounds):
+            for t in range(topics):
+                client.publish(f'homeassistant/sensor/uvr/t{t}/state', str(r), retain=t == 0)
+
+    def test_drain_in_order_with_rate_limit(self):
+        spool = Spool(self.tmpdir)
+        self.fill(spool, 4)
+        self.assertEqual(len(spool), 12)
+        client, wait = FakeClient(), FakeWait()
+        self.assertEqual(spool.drain(client.publish, batch_size=5, rate=10, wait=wait), 12)
+        self.assertEqual([p for _t, p, _r in client.published], [str(r) for r in range(4) for _ in range(3)])
+        self.assertEqual(client.published[0][2], True)
+        self.assertEqual(wait.waits, [0.5, 0.5])
+        self.assertEqual((len(spool), spool.segments()), (0, []))
+
+    def test_aggregate_sends_newest_payload_per_topic(self):
+        spool = Spool(self.tmpdir, segments=4, max_bytes=2000)
+        self.fill(spool, 10)
+        self.assertGreater(len(spool.segments()), 1)
+        client = FakeClient()
+        self.assertEqual(spool.drain(client.publish, aggregate=True, wait=FakeWait()), 3)
+        self.assertEqual(sorted(client.published), [(f'homeassistant/sensor/uvr/t{t}/state', '9', t == 0)
+                                                    for t in range(3)])
+        self.assertEqual(len(spool), 0)
+
+    def test_interrupted_drain_keeps_the_rest(self):
+        spool = Spool(self.tmpdir)
+        self.fill(spool, 4)
+        self.assertEqual(spool.drain(FakeClient(fail_after=5).publish, batch_size=100, wait=FakeWait()), 5)
+        self.assertEqual(len(spool), 7)
+        self.assertEqual(spool.drain(FakeClient().publish, batch_size=2, wait=FakeWait(stop_after=1)), 2)
+        self.assertEqual(len(spool), 5)
+        # the backlog survives a restart
+        client = FakeClient()
+        self.assertEqual(Spool(self.tmpdir).drain(client.publish, wait=FakeWait()), 5)
+        self.assertEqual(client.published[0][1], '2')
+
+    def test_batch_removes_only_what_was_written(self):
+        spool = Spool(self.tmpdir)
+        self.fill(spool, 2)
+        client = AckingClient(acked=4)
+        self.assertEqual(spool.drain_batch(client.publish, batch_size=5), 4)
+        self.assertEqual(len(spool), 2)
+        # the fifth message is still in flight: nothing is sent again or ahead of it
+        self.assertEqual(spool.drain_batch(client.publish, batch_size=5), 0)
+        self.assertEqual(len(client.published), 5)
+        client.infos[4].published = True
+        client.acked = 10
+        self.assertEqual(spool.drain_batch(client.publish, batch_size=5), 2)
+        self.assertEqual([p for _t, p in client.published], ['0', '0', '0', '1', '1', '1'])
+        self.assertEqual((len(spool), spool.segments()), (0, []))
+
+    def test_lost_messages_are_sent_again(self):
+        spool = Spool(self.tmpdir)
+        self.fill(spool, 1)
+        client = AckingClient(acked=1)
+        self.assertEqual(spool.drain_batch(client.publish), 1)
+        # a QoS 0 message dropped on a disconnect
+        client.infos[1].published, client.infos[1].rc = True, 7
+        client.acked = 10
+        self.assertEqual(spool.drain_batch(client.publish), 2)
+        self.assertEqual([p[0][-7:] for p in client.published],
+                         ['0/state', '1/state', '2/state', '1/state', '2/state'])
+        self.assertEqual(len(spool), 0)
+
+    def test_batch_bypasses_publisher_queue(self):
+        spool = Spool(self.tmpdir)
+        self.fill(spool, 3, topics=1)
+        client = AckingClient(acked=10)
+        publisher = Publisher(client, max_inflight=1, max_queued=1)
+        # the same topic three times: queued publishes would supersede each other
+        self.assertEqual(spool.drain_batch(publisher.send), 3)
+        self.assertEqual([p for _t, p in client.published], ['0', '1', '2'])
+
+    def test_polling_during_drain_appends_behind_the_backlog(self):
+        spool = Spool(self.tmpdir)
+        self.fill(spool, 2, topics=1)
+        client = FakeClient()
+        spool.drain_batch(client.publish, batch_size=1)
+        SpoolClient(spool).publish('homeassistant/sensor/uvr/t0/state', 'live')
+        spool.drain(client.publish, wait=FakeWait())
+        self.assertEqual([p for _t, p, _r in client.published], ['0', '1', 'live'])
+
+    def test_bounded_on_disk(self):
+        spool = Spool(self.tmpdir, max_bytes=4000, segments=4)
+        self.fill(spool, 200)
+        self.assertLessEqual(spool.stats()['bytes'], 4000)
+        self.assertGreater(spool.dropped, 0)
+        self.assertEqual(len(spool) + spool.dropped, 600)
+        client = FakeClient()
+        spool.drain(client.publish, rate=0, wait=FakeWait())
+        self.assertEqual(client.published[-1][1], '199')
+
+    def test_append_tracks_sizes_without_scanning_the_directory(self):
+        spool = Spool(self.tmpdir, max_bytes=4000, segments=4)
+        with mock.patch.object(Path, 'iterdir', side_effect=AssertionError('directory scanned')):
+            self.fill(spool, 200)
+        spool.close()
+        self.assertEqual(spool.stats()['bytes'], sum(p.stat().st_size for p in spool.segments()))
+        self.assertLessEqual(spool.stats()['bytes'], 4000)
+        self.assertGreater(spool.dropped, 0)
+        # a restart measures the same backlog
+        self.assertEqual(Spool(self.tmpdir, max_bytes=4000).stats()['bytes'], spool.stats()['bytes'])
+
+    def test_from_config(self):
+        self.assertIsNone(spool_from_config({'spool': {'directory': ''}}))
+        self.assertIsInstance(spool_from_config({'spool': {'directory': self.tmpdir, 'max_mb': 1}}), Spool)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+from uvr_mqtt import wait_for_acks
+from uvr_startup import StartupReport, process_started
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeInfo:
+    def __init__(self, published=True, rc=0):
+        self.published = published
+        self.rc = rc
+        self.timeouts = []
+
+    def wait_for_publish(self, timeout=None):
+        self.timeouts.append(timeout)
+        if self.rc:
+            raise RuntimeError('Message publish failed')
+
+    def is_published(self):
+        return self.published
+
+
+class TestStartupReport(unittest.TestCase):
+    def test_phases_are_consecutive(self):
+        now = [100.0]
+        report = StartupReport(started=99.5, clock=lambda: now[0])
+        self.assertEqual(report.mark('imports'), 0.5)
+        now[0] = 100.25
+        report.mark('connect')
+        self.assertEqual(report.phases, [('imports', 0.5), ('connect', 0.25)])
+        self.assertEqual(report.total, 0.75)
+        text = report.format()
+        self.assertIn('connect', text)
+        self.assertIn('750.0 ms', text)
+
+    def test_process_start_is_in_the_past(self):
+        started = process_started()
+        if started is None:
+            self.skipTest('/proc not available')
+        self.assertLess(started, time.time())
+        self.assertGreater(started, time.time() - 24 * 3600)
+
+    def test_wait_for_acks(self):
+        self.assertTrue(wait_for_acks([FakeInfo(), FakeInfo()], timeout=1))
+        self.assertFalse(wait_for_acks([FakeInfo(published=False)], timeout=1))
+        self.assertFalse(wait_for_acks([FakeInfo(rc=4)], timeout=1))
+
+    def test_import_is_lazy(self):
+        code = ('import sys, send_uvr_mqtt; '
+                'print(sorted(m for m in ("requests", "bs4", "http.server") if m in sys.modules))')
+        env = dict(os.environ, MQTT_BROKER='')  # load_configs() would raise if it ran at import
+        out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                             check=True).stdout
+        self.assertEqual(out.strip(), '[]')
+
+
+if __name__ == '__main__':
+    unittest.main()
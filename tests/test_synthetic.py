@@ -0,0 +1,40 @@
+import contextlib
+import io
+import random
+import unittest
+import xml.etree.ElementTree as ET
+
+from uvr_layout import compile_layout
+from uvr_parse import MyHTMLParser, combine_html_xml
+from uvr_synthetic import SyntheticSchema
+
+
+class TestSyntheticSchema(unittest.TestCase):
+    def test_pages_round_trip_through_parser(self):
+        schema = SyntheticSchema.generate([50, 20], seed=3)
+        layout = compile_layout(ET.fromstring(schema.xml()))
+        self.assertEqual([len(page.id_conf) for page in layout], [50, 20])
+        for Seite, page in enumerate(layout):
+            html = schema.html(Seite, random.Random(Seite))
+            with contextlib.redirect_stdout(io.StringIO()):
+                fast = combine_html_xml(MyHTMLParser, page.beschreibung, page.id_conf, page.xml_dict, html)
+                bs4 = combine_html_xml(MyHTMLParser, page.beschreibung, page.id_conf, page.xml_dict, html,
+                                       backend='bs4')
+            self.assertEqual(fast, bs4)
+            # every non-Modus label is present, Modus labels are split into mode/percent
+            for label in page.beschreibung:
+                if 'Modus' in label:
+                    self.assertIn(label + '_mode', fast)
+                    self.assertIn(label + '_percent', fast)
+                else:
+                    self.assertIsNotNone(fast[label]['value'], label)
+
+    def test_generation_is_deterministic(self):
+        a = SyntheticSchema.generate([30], seed=1)
+        b = SyntheticSchema.generate([30], seed=1)
+        self.assertEqual(a.xml(), b.xml())
+        self.assertEqual(a.html(0, random.Random(5)), b.html(0, random.Random(5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+"""Asyncio runtime for the UVR -> MQTT sender.
+
+Alternative to the blocking main loop in `send_uvr_mqtt.py`: every page is
+fetched, parsed and published by its own task on one event loop, so a slow
+page or a broker reconnect never holds up the other pages. Blocking work
+(HTTP requests, XML/HTML parsing) runs in a thread pool; the MQTT client
+reconnects in paho's network thread (see `uvr_mqtt.ConnectionSupervisor`).
+Pages are polled on their own intervals (`uvr_scheduler.PageScheduler`).
+Topics and discovery payloads are identical to the blocking sender. With
+``mqtt.spool`` configured, readings taken while the broker is unreachable
+(and, after reconnecting, until the backlog is sent) go to the same
+on-disk spool as in the blocking sender, drained one batch at a time.
+"""
+import asyncio
+import logging
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+from uvr import combine_page_cached, page_cache
+from uvr_fetch import DEFAULT_MAX_WORKERS, get_fetcher, read_html
+from uvr_layout import PageLayout, load_layout
+from uvr_metrics import CYCLE_OVERRUNS
+from uvr_parse import DEFAULT_PARSER_BACKEND, filter_empty_values
+from uvr_publisher import Publisher, publisher_from_config
+from uvr_scheduler import PageScheduler
+from uvr_spool import SpoolClient, drain_options, spool_from_config
+from uvr_mqtt import (
+    build_mqtt_client,
+    create_config,
+    delta_filter_from_config,
+    device_state_from_config,
+    discovery_manifest_from_config,
+    sanitize_name,
+    send_values,
+)
+
+logger = logging.getLogger("UVR2MQTT")
+
+POLL_INTERVAL = 60
+CONNECTION_CHECK_INTERVAL = 5
+
+
+class AsyncDaemon:
+    """Poll all pages of one CMI and publish them from a single event loop."""
+
+    def __init__(self, mqtt_cfg: Dict[str, Any], uvr_cfg: Dict[str, Any], device_name: str,
+                 interval: float = POLL_INTERVAL, cycles: int = 0):
+        self.mqtt_cfg = mqtt_cfg
+        self.uvr_cfg = uvr_cfg
+        self.device_name = device_name
+        self.interval = interval
+        self.cycles = cycles
+        self.device_id = sanitize_name(device_name)
+        self.availability_topic = f"homeassistant/{self.device_id}/availability"
+        self.client = None
+        self.publisher: Optional[Publisher] = None
+        self.layout: List[PageLayout] = []
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.stop_event: Optional[asyncio.Event] = None
+        self.discovered: Set[str] = set()
+        self.in_flight: Dict[int, asyncio.Task] = {}
+        self.scheduler: Optional[PageScheduler] = None
+        self.delta = delta_filter_from_config(mqtt_cfg)
+        self.document = device_state_from_config(mqtt_cfg, device_name)
+        self.manifest = discovery_manifest_from_config(mqtt_cfg)
+        self.spool = spool_from_config(mqtt_cfg)
+        self.spool_client = SpoolClient(self.spool) if self.spool is not None else None
+        self.spool_options = drain_options(mqtt_cfg)
+
+    async def _run_blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def _install_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._on_signal, sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                logger.debug("Signal handler for %s not available", sig)
+
+    def _on_signal(self, signum) -> None:
+        logger.info("Received signal %s, scheduling shutdown", signum)
+        self.stop_event.set()
+
+    async def _sleep(self, seconds: float) -> None:
+        """Sleep that ends early on shutdown."""
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _spool_backlog(self) -> bool:
+        return self.spool is not None and len(self.spool) > 0
+
+    def _spool_pacing(self) -> float:
+        rate = self.spool_options['rate']
+        return self.spool_options['batch_size'] / rate if rate > 0 else 0.0
+
+    def _drain_spool(self, reconnected: bool) -> None:
+        """Send one batch of the spool backlog (runs in the thread pool)."""
+        dropped = self.spool.dropped
+        if reconnected and self.spool_options['aggregate']:
+            self.spool.compact()
+        self.spool.drain_batch(self.publisher.send, self.spool_options['batch_size'])
+        if self.spool.dropped != dropped and self.delta is not None:
+            # the last state of some entities may have been dropped; republish everything
+            self.delta.reset()
+
+    async def _watch_connection(self) -> None:
+        """Republish availability and all states after the client reconnected in the background.
+
+        While connected, also sends the spool backlog one batch every
+        ``batch_size / rate`` seconds, and the discovery configs the client
+        did not accept while offline once the backlog is gone.
+        """
+        connected = True
+        # the backlog of an earlier run is compacted like that of an outage
+        reconnected = True
+        while not self.stop_event.is_set():
+            backlog = connected and self._spool_backlog()
+            await self._sleep(min(self._spool_pacing(), CONNECTION_CHECK_INTERVAL) if backlog
+                              else CONNECTION_CHECK_INTERVAL)
+            if self.client.is_connected() != connected:
+                connected = not connected
+                if connected:
+                    if self.delta is not None:
+                        self.delta.reset()
+                        page_cache.clear()
+                    self.publisher.publish(self.availability_topic, "online", retain=True)
+                else:
+                    reconnected = True
+            if not connected:
+                continue
+            if self._spool_backlog():
+                await self._run_blocking(self._drain_spool, reconnected)
+            elif self.manifest is not None:
+                self.manifest.resend_pending(self.publisher)
+            reconnected = False
+
+    async def _poll_page(self, Seite: int) -> None:
+        ip, user, password = self.uvr_cfg['ip'], self.uvr_cfg['user'], self.uvr_cfg['password']
+        fetcher = get_fetcher(ip, user, password, pool_size=self._workers())
+        backend = self.uvr_cfg.get('parser_backend') or DEFAULT_PARSER_BACKEND
+        try:
+            html = await self._run_blocking(read_html, ip, Seite, user, password, 10, fetcher)
+            page, unchanged = await self._run_blocking(combine_page_cached, (ip, Seite), self.layout[Seite], html,
+                                                       backend)
+        except Exception:
+            self.scheduler.record(Seite, None)
+            raise
+        self.scheduler.record(Seite, page)
+        if page is None:
+            return
+        if unchanged and self.delta is not None and not self.delta.heartbeat_due():
+            logger.debug("Page %s unchanged; nothing to publish", Seite)
+            return
+        values = filter_empty_values([page])
+        target = self.publisher
+        if not self.client.is_connected() or self._spool_backlog():
+            if self.spool_client is None:
+                logger.warning("MQTT not connected; dropping values of page %s", Seite)
+                return
+            # behind the backlog, so no older reading overwrites a newer one
+            target = self.spool_client
+        new = {name: data for name, data in values[0].items() if name not in self.discovered}
+        if new:
+            # pages arrive one at a time, so never prune from a partial view
+            create_config(target, self.device_name, [new], manifest=self.manifest, prune=False,
+                          bulk=self.document is not None)
+            self.discovered.update(new)
+        send_values(target, self.device_name, values, delta=self.delta, document=self.document)
+        logger.debug("Published page %s (%d values)", Seite, len(values[0]))
+
+    def _workers(self) -> int:
+        return max(int(self.uvr_cfg.get('max_workers', DEFAULT_MAX_WORKERS) or 1), 1)
+
+    def _start_cycle(self, pages: List[int]) -> None:
+        for Seite in pages:
+            task = self.in_flight.get(Seite)
+            if task is not None and not task.done():
+                logger.warning("Page %s still in flight; skipping it this cycle", Seite)
+                CYCLE_OVERRUNS.inc(device=self.device_id)
+                continue
+            task = asyncio.create_task(self._poll_page(Seite), name=f"uvr-page-{Seite}")
+            task.add_done_callback(self._log_page_result)
+            self.in_flight[Seite] = task
+
+    @staticmethod
+    def _log_page_result(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Error in %s: %s", task.get_name(), task.exception())
+
+    async def _drain(self) -> None:
+        pending = [t for t in self.in_flight.values() if not t.done()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run(self) -> None:
+        self.stop_event = asyncio.Event()
+        self._install_signal_handlers()
+        # one thread per concurrent page fetch plus one for parsing/reconnects
+        self.executor = ThreadPoolExecutor(max_workers=self._workers() + 1, thread_name_prefix='uvr-async')
+        try:
+            self.client = await self._run_blocking(build_mqtt_client, self.mqtt_cfg)
+            self.publisher = publisher_from_config(self.client, self.mqtt_cfg)
+            self.layout = await self._run_blocking(load_layout, self.uvr_cfg['xml_filename'],
+                                                   self.uvr_cfg.get('layout_cache'))
+            # the daemon's interval is the start interval unless the config sets one
+            self.scheduler = PageScheduler.from_config({'poll_interval': self.interval, **self.uvr_cfg},
+                                                       len(self.layout), delta=self.delta)
+            self.publisher.publish(self.availability_topic, "online", retain=True)
+            watcher = asyncio.create_task(self._watch_connection(), name="uvr-mqtt-watch")
+            cycle_count = 0
+            while not self.stop_event.is_set():
+                due = self.scheduler.due()
+                if due:
+                    self._start_cycle(due)
+                    cycle_count += 1
+                    logger.info("Started cycle %s (pages %s).", cycle_count, due)
+                    # always taken: it also updates the pending gauge and warns on backpressure
+                    mqtt_report = self.publisher.cycle_report()
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("MQTT publishing: %s", mqtt_report)
+                    if self.cycles > 0 and cycle_count >= self.cycles:
+                        await self._drain()
+                        logger.info("Reached UVR_CYCLES=%s, exiting loop.", self.cycles)
+                        break
+                # pages still in flight stay due, so never spin faster than once a second
+                await self._sleep(max(self.scheduler.seconds_until_next(), 1.0))
+            self.stop_event.set()
+            await self._drain()
+            await watcher
+        finally:
+            if self.client is not None:
+                await self._run_blocking(self._shutdown_client)
+            self.executor.shutdown(wait=False)
+
+    def _shutdown_client(self) -> None:
+        logger.info("Shutting down: publishing offline and disconnecting MQTT")
+        # no publisher if wrapping the client failed or the daemon was cancelled before
+        if self.publisher is not None:
+            if not self.publisher.flush(5):
+                logger.warning("%d MQTT messages were not sent before shutdown", self.publisher.pending())
+            try:
+                self.publisher.publish(self.availability_topic, "offline", retain=True)
+            except Exception:
+                logger.debug("Failed to publish offline availability")
+        try:
+            self.client.loop_stop()
+            self.client.disconnect()
+        except Exception:
+            pass
+        if self.spool is not None:
+            self.spool.close()
+
+
+def run(mqtt_cfg: Dict[str, Any], uvr_cfg: Dict[str, Any], device_name: str,
+        interval: float = POLL_INTERVAL, cycles: int = 0) -> None:
+    """Run the asyncio daemon until a shutdown signal (or ``cycles`` polls)."""
+    asyncio.run(AsyncDaemon(mqtt_cfg, uvr_cfg, device_name, interval=interval, cycles=cycles).run())
@@ -0,0 +1,200 @@
+"""Opt-in capture of fetched CMI pages into a bounded, compressed ring archive.
+
+Replaces the old habit of rewriting ``debug_fetched_html_seite<N>.html`` on
+every fetch. Capturing is off by default, so normal operation does no disk
+writes at all. When enabled, pages are handed to a background thread which
+appends them as JSON lines (``time``, ``ip``, ``Seite``, ``reason``,
+``html``) to gzip segments ``capture-<seq>.jsonl.gz`` in the capture
+directory; the oldest segments are deleted once the archive exceeds
+``max_bytes``.
+
+Modes:
+
+* ``off`` — nothing is captured (default).
+* ``anomaly`` — only pages that did not parse cleanly (an exception, or XML
+  labels missing from the combined values) are captured.
+* ``all`` — every fetched page is captured, anomalies additionally.
+"""
+import gzip
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'anomaly', 'all')
+DEFAULT_DIRECTORY = 'captures'
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_SEGMENTS = 8
+DEFAULT_QUEUE_SIZE = 64
+
+_SEGMENT_RE = re.compile(r'^capture-(\d+)\.jsonl\.gz$')
+_STOP = object()
+
+
+class CaptureArchive:
+    """Directory of gzip segments holding at most ``max_bytes`` (compressed)."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, segments: int = DEFAULT_SEGMENTS):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_bytes)
+        self.segment_bytes = max(self.max_bytes // max(int(segments), 1), 1)
+        self._raw = None
+        self._gz: Optional[gzip.GzipFile] = None
+
+    def segments(self) -> List[Path]:
+        """Segment files, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        found = [(int(m.group(1)), p) for p in self.directory.iterdir() if (m := _SEGMENT_RE.match(p.name))]
+        return [p for _seq, p in sorted(found)]
+
+    def _open_segment(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = self.segments()
+        # never append to a segment of an earlier run: it may lack its gzip trailer
+        seq = int(_SEGMENT_RE.match(existing[-1].name).group(1)) + 1 if existing else 0
+        self._raw = open(self.directory / f'capture-{seq:06d}.jsonl.gz', 'wb')
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode='wb')
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        if self._gz is None:
+            self._open_segment()
+        for record in records:
+            self._gz.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        # sync flush: everything written so far stays readable if the process dies
+        self._gz.flush()
+        if self._raw.tell() >= self.segment_bytes:
+            self.close()
+        self._prune()
+
+    def _prune(self) -> None:
+        segments = self.segments()
+        sizes = [p.stat().st_size for p in segments]
+        current = Path(self._raw.name) if self._raw is not None else None
+        while len(segments) > 1 and sum(sizes) > self.max_bytes and segments[0] != current:
+            logger.debug('Dropping capture segment %s', segments[0])
+            segments.pop(0).unlink()
+            sizes.pop(0)
+
+    def close(self) -> None:
+        if self._gz is not None:
+            self._gz.close()
+            self._raw.close()
+            self._gz = self._raw = None
+
+
+def read_archive(directory: str) -> Iterator[Dict[str, Any]]:
+    """Yield the captured records of ``directory``, oldest first."""
+    for path in CaptureArchive(directory).segments():
+        with gzip.open(path, 'rb') as f:
+            try:
+                for line in f:
+                    yield json.loads(line)
+            except (EOFError, gzip.BadGzipFile):
+                # segment of a run that did not shut down cleanly; keep what was flushed
+                logger.debug('Capture segment %s is truncated', path)
+
+
+class Capture:
+    """Write captured pages from a background thread; the hot path only enqueues."""
+
+    def __init__(self, archive: CaptureArchive, mode: str = 'anomaly', queue_size: int = DEFAULT_QUEUE_SIZE):
+        if mode not in MODES:
+            raise ValueError(f'Unknown capture mode {mode!r}; expected one of {MODES}')
+        self.archive = archive
+        self.mode = mode
+        self.written = 0
+        self.dropped = 0
+        # (ip, Seite, reason) of anomalies already captured; a page that stays broken is captured once
+        self.reported = set()
+        self._queue: 'queue.Queue[Any]' = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name='uvr-capture', daemon=True)
+        self._thread.start()
+
+    def submit(self, ip: str, Seite: int, html: str, reason: str) -> None:
+        record = {'time': time.time(), 'ip': ip, 'Seite': Seite, 'reason': reason, 'html': html}
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # never let a slow disk hold up polling
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = []
+            while item is not _STOP:
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self.archive.write(batch)
+                    self.written += len(batch)
+                except Exception:
+                    logger.warning('Could not write %d captured pages', len(batch), exc_info=True)
+            if item is _STOP:
+                return
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self.archive.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {'written': self.written, 'dropped': self.dropped, 'queued': self._queue.qsize()}
+
+
+_capture: Optional[Capture] = None
+
+
+def configure(mode: str = 'off', directory: str = DEFAULT_DIRECTORY,
+              max_bytes: int = DEFAULT_MAX_BYTES) -> Optional[Capture]:
+    """Install the process-wide capture (replacing a previous one); ``off`` removes it."""
+    global _capture
+    close()
+    if mode != 'off':
+        _capture = Capture(CaptureArchive(directory, max_bytes), mode)
+        logger.info('Capturing %s pages to %s (max %d bytes)', mode, directory, max_bytes)
+    return _capture
+
+
+def capture_from_config(uvr_cfg: Dict[str, Any]) -> Optional[Capture]:
+    """`configure` from ``uvr.capture`` (see `load_configs`)."""
+    cfg = uvr_cfg.get('capture') or {}
+    return configure(cfg.get('mode', 'off'), cfg.get('directory', DEFAULT_DIRECTORY),
+                     int(float(cfg.get('max_mb', DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024))
+
+
+def close() -> None:
+    global _capture
+    if _capture is not None:
+        _capture.close()
+        _capture = None
+
+
+def on_fetch(ip: str, Seite: int, html: Optional[str]) -> None:
+    capture = _capture
+    if capture is not None and capture.mode == 'all' and html:
+        capture.submit(ip, Seite, html, 'fetch')
+
+
+def on_anomaly(ip: str, Seite: int, html: Optional[str], reason: str) -> None:
+    capture = _capture
+    if capture is not None and html and (ip, Seite, reason) not in capture.reported:
+        capture.reported.add((ip, Seite, reason))
+        logger.info('Capturing page %s of %s: %s', Seite, ip, reason)
+        capture.submit(ip, Seite, html, reason)
+
+
+def capture_stats() -> Optional[Dict[str, int]]:
+    capture = _capture
+    return capture.stats() if capture is not None else None
@@ -0,0 +1,229 @@
+"""Poll several CMIs from one process over one shared MQTT client.
+
+The ``uvr`` section of ``config.json`` may list controllers::
+
+    "uvr": {
+        "max_workers": 4,
+        "controllers": [
+            {"name": "UVR Haus", "ip": "192.168.177.5", "user": "...", "password": "...", "xml_filename": "Haus.xml"},
+            {"name": "UVR Halle", "ip": "192.168.177.6", "user": "...", "password": "...", "xml_filename": "Halle.xml"}
+        ]
+    }
+
+Every entry inherits the other ``uvr`` settings and may override any of
+them. Its ``name`` is the Home Assistant device name, so each controller
+publishes below its own ``homeassistant/<entity_type>/<device_id>/``
+namespace and has its own availability topic. Without ``controllers`` the
+``uvr`` section itself is the only controller, named after ``device.name``.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from uvr import filter_empty_values, load_layout, read_page_data
+from uvr_fetch import DEFAULT_MAX_WORKERS, get_fetcher
+from uvr_mqtt import (
+    DiscoveryManifest,
+    create_config,
+    delta_filter_from_config,
+    device_state_from_config,
+    discovery_manifest_from_config,
+    sanitize_name,
+    send_values,
+)
+from uvr_history import History
+from uvr_metrics import CYCLE_OVERRUNS, POLL_SECONDS
+from uvr_scheduler import PageScheduler
+
+logger = logging.getLogger("UVR2MQTT")
+
+
+class Controller:
+    """One CMI with its own page schedule and state filter."""
+
+    def __init__(self, device_name: str, uvr_cfg: Dict[str, Any], mqtt_cfg: Dict[str, Any],
+                 manifest: Optional[DiscoveryManifest] = None):
+        self.device_name = device_name
+        self.uvr_cfg = uvr_cfg
+        self.device_id = sanitize_name(device_name)
+        self.availability_topic = f"homeassistant/{self.device_id}/availability"
+        self.delta = delta_filter_from_config(mqtt_cfg)
+        # one JSON state document per device instead of a topic per entity (mqtt.state_mode)
+        self.document = device_state_from_config(mqtt_cfg, device_name)
+        self.manifest = manifest
+        self.scheduler: Optional[PageScheduler] = None
+        # pages whose states were sent since the last reset; only those may be skipped when unchanged
+        self.published: Set[int] = set()
+        history_size = int(uvr_cfg.get("history_size") or 0)
+        self.history: Optional[History] = History(history_size) if history_size > 0 else None
+        # discovery configs added or changed by the last start(), and their publish results
+        self.new_entities = 0
+        self.discovery_infos: List[Any] = []
+
+    def prepare(self) -> int:
+        """Load the page layout and open the HTTP session; needs no broker. Returns the page count."""
+        page_count = len(load_layout(self.uvr_cfg["xml_filename"], cache_path=self.uvr_cfg.get("layout_cache")))
+        get_fetcher(self.uvr_cfg["ip"], self.uvr_cfg["user"], self.uvr_cfg["password"],
+                    pool_size=int(self.uvr_cfg.get("max_workers") or DEFAULT_MAX_WORKERS))
+        return page_count
+
+    def start(self, client) -> None:
+        """Read every page once and publish the discovery configs."""
+        page_count = self.prepare()
+        pages = read_page_data(self.uvr_cfg)
+        # every page stays due, so the first poll publishes the states
+        self.scheduler = PageScheduler.from_config(self.uvr_cfg, page_count, delta=self.delta)
+        # only drop entities when every page was read
+        self.discovery_infos = []
+        counts = create_config(client, self.device_name, filter_empty_values(list(pages.values())),
+                               manifest=self.manifest, prune=len(pages) == page_count, bulk=self.document is not None,
+                               sent=self.discovery_infos)
+        self.new_entities = counts["added"] + counts["changed"]
+
+    def poll(self, client) -> List[int]:
+        """Read and publish the pages that are due; returns their numbers."""
+        if self.scheduler is None:
+            # the first read failed (e.g. CMI unreachable at startup); retry it
+            self.start(client)
+        due = self.scheduler.due()
+        if not due:
+            return due
+        started = time.monotonic()
+        unchanged = set()
+        try:
+            pages = read_page_data(self.uvr_cfg, due, unchanged=unchanged)
+        except Exception as e:
+            # e.g. an unreadable layout; retry one interval later instead of on every loop iteration
+            logger.error("Reading pages %s of %s failed: %r", due, self.device_name, e)
+            logger.debug("Read error details", exc_info=True)
+            for Seite in due:
+                self.scheduler.record(Seite, None)
+            return []
+        for Seite in due:
+            self.scheduler.record(Seite, pages.get(Seite))
+        if self.history is not None:
+            for Seite, page in pages.items():
+                self.history.record(page, group=Seite)
+        if self.delta is not None and not self.delta.heartbeat_due():
+            # byte-identical pages have nothing new to publish
+            pages = {Seite: page for Seite, page in pages.items() if Seite not in unchanged & self.published}
+        send_values(client, self.device_name, filter_empty_values(list(pages.values())), delta=self.delta,
+                    document=self.document)
+        self.published.update(pages)
+        elapsed = time.monotonic() - started
+        POLL_SECONDS.observe(elapsed, device=self.device_id)
+        if elapsed > min(self.scheduler.intervals[Seite] for Seite in due):
+            logger.warning("Polling %s took %.1f s, longer than its shortest page interval", self.device_name, elapsed)
+            CYCLE_OVERRUNS.inc(device=self.device_id)
+        return due
+
+    def reset(self) -> None:
+        """Republish every state on the next poll, e.g. after the broker connection was lost."""
+        self.published.clear()
+        if self.delta is not None:
+            self.delta.reset()
+
+    def seconds_until_next(self) -> float:
+        if self.scheduler is None:
+            return float(self.uvr_cfg.get("poll_interval", 60))
+        return self.scheduler.seconds_until_next()
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        if self.scheduler is not None:
+            stats["pages"] = self.scheduler.stats()
+        if self.delta is not None:
+            stats["states"] = self.delta.stats()
+        if self.history is not None:
+            stats["history"] = {"rows": len(self.history), "entities": len(self.history.series),
+                                "bytes": self.history.nbytes()}
+        return stats
+
+
+def controllers_from_config(uvr_cfg: Dict[str, Any], device_name: str, mqtt_cfg: Dict[str, Any]) -> List[Controller]:
+    """Build the controllers described by the ``uvr`` config section (see module docstring)."""
+    manifest = discovery_manifest_from_config(mqtt_cfg)
+    entries = uvr_cfg.get("controllers") or []
+    shared = {key: value for key, value in uvr_cfg.items() if key != "controllers"}
+    if not entries:
+        return [Controller(device_name, shared, mqtt_cfg, manifest)]
+    controllers: List[Controller] = []
+    for i, entry in enumerate(entries):
+        name = entry.get("name")
+        if not name:
+            raise ValueError(f"uvr.controllers[{i}] has no name")
+        cfg = dict(shared)
+        cfg.update({key: value for key, value in entry.items() if key != "name"})
+        controller = Controller(name, cfg, mqtt_cfg, manifest)
+        if any(c.device_id == controller.device_id for c in controllers):
+            raise ValueError(f"uvr.controllers[{i}]: device id {controller.device_id!r} is used twice")
+        controllers.append(controller)
+    return controllers
+
+
+class ControllerPool:
+    """Run the controllers concurrently on a worker pool, one task per controller."""
+
+    def __init__(self, controllers: List[Controller], max_workers: Optional[int] = None):
+        self.controllers = controllers
+        self.executor: Optional[ThreadPoolExecutor] = None
+        if len(controllers) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers or len(controllers),
+                                               thread_name_prefix="uvr-controller")
+
+    def _each(self, func: Callable[[Controller], Any]) -> Dict[str, Any]:
+        """Call ``func`` for every controller; a failing controller does not stop the others."""
+        results: Dict[str, Any] = {}
+        if self.executor is None:
+            futures = None
+        else:
+            futures = [self.executor.submit(func, c) for c in self.controllers]
+        for i, controller in enumerate(self.controllers):
+            try:
+                results[controller.device_id] = futures[i].result() if futures else func(controller)
+            except Exception:
+                logger.exception("Controller %s failed", controller.device_name)
+        return results
+
+    def prepare(self) -> None:
+        self._each(lambda c: c.prepare())
+
+    def start(self, client) -> None:
+        self._each(lambda c: c.start(client))
+
+    def poll(self, client) -> Dict[str, List[int]]:
+        """Poll every controller; returns the pages read per device id (empty if none were due)."""
+        return {device_id: due for device_id, due in self._each(lambda c: c.poll(client)).items() if due}
+
+    def reset(self) -> None:
+        for controller in self.controllers:
+            controller.reset()
+
+    def publish_availability(self, client, payload: str) -> List[Any]:
+        """Publish ``payload`` to every availability topic; returns the publish results (see `wait_for_acks`)."""
+        return [client.publish(controller.availability_topic, payload, retain=True) for controller in self.controllers]
+
+    def discovery_infos(self) -> List[Any]:
+        """Publish results of the discovery configs sent by `start` (see `wait_for_acks`)."""
+        return [info for controller in self.controllers for info in controller.discovery_infos]
+
+    def resend_discovery(self, client) -> None:
+        """Publish the discovery configs the client did not accept earlier (see `DiscoveryManifest.resend_pending`)."""
+        manifests = {id(c.manifest): c.manifest for c in self.controllers if c.manifest is not None}
+        for manifest in manifests.values():
+            manifest.resend_pending(client)
+
+    @property
+    def availability_topics(self) -> List[str]:
+        return [c.availability_topic for c in self.controllers]
+
+    def seconds_until_next(self) -> float:
+        return min(c.seconds_until_next() for c in self.controllers)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {c.device_id: c.stats() for c in self.controllers}
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
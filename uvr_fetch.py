@@ -1,17 +1,49 @@
 import logging
-from typing import Optional
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import requests
+
+import uvr_capture
+from uvr_metrics import FETCH_BYTES, FETCH_FAILURES, FETCH_RETRIES, FETCH_SECONDS
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_WORKERS = 4
+
+
+def fetch(url: str, username: str, password: str, timeout: int = 10, attempts: int = 3,
+          session: Optional["requests.Session"] = None) -> Optional[str]:
+    """Fetch URL with retries and return text or None on failure.
 
-def fetch(url: str, username: str, password: str, timeout: int = 10, attempts: int = 3) -> Optional[str]:
-    """Fetch URL with retries and return text or None on failure."""
+    When ``session`` is given its pooled keep-alive connections are used
+    instead of opening a new connection per request.
+    """
+    # imported on first use; requests takes ~100 ms to import and startup does not need it yet
+    import requests
+    http = session if session is not None else requests
+    host = urlsplit(url).netloc
+    with FETCH_SECONDS.time(ip=host):
+        text = _fetch_attempts(http, url, host, username, password, timeout, attempts)
+    if text is None:
+        FETCH_FAILURES.inc(ip=host)
+    return text
+
+
+def _fetch_attempts(http, url: str, host: str, username: str, password: str, timeout: int,
+                    attempts: int) -> Optional[str]:
+    import requests
     last_exc = None
     for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            FETCH_RETRIES.inc(ip=host)
         try:
-            resp = requests.get(url, auth=(username, password), timeout=timeout)
+            resp = http.get(url, auth=(username, password), timeout=timeout)
             resp.raise_for_status()
+            FETCH_BYTES.inc(len(resp.content), ip=host)
             logger.debug("Fetched %s (len=%d)", url, len(resp.text))
             return resp.text
         except requests.Timeout as e:
@@ -27,14 +59,130 @@ def fetch(url: str, username: str, password: str, timeout: int = 10, attempts: i
     return None
 
 
-def read_html(ip: str, Seite: int, username: str, password: str, timeout: int = 10) -> Optional[str]:
+class Fetcher:
+    """Long-lived HTTP session for one CMI.
+
+    Keeps a bounded keep-alive connection pool with basic auth preset so
+    every page of every cycle reuses the same TCP connections.
+    """
+
+    def __init__(self, username: str, password: str, pool_size: int = DEFAULT_MAX_WORKERS):
+        self.username = username
+        self.password = password
+        self.pool_size = max(1, int(pool_size))
+        import requests
+        self.session = requests.Session()
+        self.session.auth = (username, password)
+        self.session.headers['Connection'] = 'keep-alive'
+        # counters of pools replaced by `resize`
+        self._retired = {'requests': 0, 'new_connections': 0}
+        self._mount(self.pool_size)
+
+    def _mount(self, pool_size: int) -> None:
+        from requests.adapters import HTTPAdapter
+        # one host per fetcher; pool_block caps the connections opened to it
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    def resize(self, pool_size: int) -> None:
+        """Allow up to ``pool_size`` connections from now on.
+
+        The session stays the same and only its adapter is swapped. Closing
+        the old adapter drops its idle connections; connections that running
+        requests have checked out are closed when they are returned.
+        """
+        pool_size = max(1, int(pool_size))
+        if pool_size == self.pool_size:
+            return
+        old = self.adapter
+        self._mount(pool_size)
+        self.pool_size = pool_size
+        for name, count in self._pool_counts(old).items():
+            self._retired[name] += count
+        old.close()
+
+    def fetch(self, url: str, timeout: int = 10, attempts: int = 3) -> Optional[str]:
+        return fetch(url, self.username, self.password, timeout=timeout, attempts=attempts, session=self.session)
+
+    def stats(self) -> Dict[str, int]:
+        """Return request/connection counters of the underlying pool."""
+        counts = self._pool_counts(self.adapter)
+        requests_made = counts['requests'] + self._retired['requests']
+        new_connections = counts['new_connections'] + self._retired['new_connections']
+        return {
+            'requests': requests_made,
+            'new_connections': new_connections,
+            'reused_connections': max(0, requests_made - new_connections),
+        }
+
+    @staticmethod
+    def _pool_counts(adapter: Any) -> Dict[str, int]:
+        requests_made = 0
+        new_connections = 0
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_made += pool.num_requests
+            new_connections += pool.num_connections
+        return {'requests': requests_made, 'new_connections': new_connections}
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_fetchers: Dict[Tuple[str, str, str], Fetcher] = {}
+_fetchers_lock = threading.Lock()
+
+
+def get_fetcher(ip: str, username: str, password: str, pool_size: int = DEFAULT_MAX_WORKERS) -> Fetcher:
+    """Return the shared Fetcher for a CMI, creating or enlarging it as needed.
+
+    Other threads may be fetching through it, so an existing Fetcher is
+    resized in place rather than closed and rebuilt.
+    """
+    key = (ip, username, password)
+    with _fetchers_lock:
+        fetcher = _fetchers.get(key)
+        if fetcher is None:
+            fetcher = _fetchers[key] = Fetcher(username, password, pool_size=pool_size)
+        elif fetcher.pool_size < pool_size:
+            fetcher.resize(pool_size)
+        return fetcher
+
+
+def fetcher_stats() -> Dict[str, Dict[str, Any]]:
+    """Connection counters of all shared fetchers, keyed by CMI address."""
+    with _fetchers_lock:
+        return {ip: fetcher.stats() for (ip, _user, _password), fetcher in _fetchers.items()}
+
+
+def read_html(ip: str, Seite: int, username: str, password: str, timeout: int = 10,
+              fetcher: Optional[Fetcher] = None) -> Optional[str]:
     url = f'http://{ip}/schematic_files/{Seite+1}.cgi'
     logger.debug('Handling url %s', url)
-    html = fetch(url, username, password, timeout=timeout)
-    # Save debug copy to workspace for offline inspection
-    try:
-        with open(f"debug_fetched_html_seite{Seite}.html", "w", encoding="utf-8") as f:
-            f.write(html or "")
-    except Exception:
-        logger.debug("Could not write debug html file for Seite %s", Seite)
+    if fetcher is None:
+        fetcher = get_fetcher(ip, username, password)
+    html = fetcher.fetch(url, timeout=timeout)
+    # keep a copy for offline inspection when capturing is enabled (see uvr_capture)
+    uvr_capture.on_fetch(ip, Seite, html)
     return html
+
+
+def read_pages(ip: str, Seiten: Iterable[int], username: str, password: str, timeout: int = 10,
+               max_workers: Optional[int] = DEFAULT_MAX_WORKERS) -> List[Optional[str]]:
+    """Fetch several schematic pages, concurrently when ``max_workers`` > 1.
+
+    Results are returned in the order of ``Seiten`` regardless of completion
+    order; failed pages are ``None`` just like ``read_html``.
+    """
+    Seiten = list(Seiten)
+    workers = min(max_workers or 1, len(Seiten))
+    fetcher = get_fetcher(ip, username, password, pool_size=max(workers, 1))
+    if workers <= 1:
+        return [read_html(ip, Seite, username, password, timeout=timeout, fetcher=fetcher) for Seite in Seiten]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='uvr-fetch') as pool:
+        futures = [pool.submit(read_html, ip, Seite, username, password, timeout, fetcher) for Seite in Seiten]
+        return [f.result() for f in futures]
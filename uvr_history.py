@@ -0,0 +1,206 @@
+"""Fixed-size in-memory history of all readings.
+
+Entities are recorded in groups, one per schematic page: each group has its
+own ring of ``capacity`` timestamps, and each entity one ``array('f')`` of
+``capacity`` values next to its group's timestamps. Every `History.record`
+call writes one row of one group (entities of that group missing from it
+get NaN in that row), so a page polled every 15 s and one polled every
+300 s each keep their newest ``capacity`` polls. Memory is ``capacity *
+(8 * groups + 4 * entities)`` bytes, e.g. 5760 rows of 300 entities on 10
+pages is about 7 MB, and never grows.
+
+Window queries find their rows by binary search over the group's
+timestamps and then only touch the rows inside the window. NumPy is used
+for the slicing and aggregates when it is installed; without it the same
+results are computed in pure Python.
+"""
+import math
+import threading
+import time
+from array import array
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # optional; pure-Python fallback below
+    np = None
+
+DEFAULT_CAPACITY = 5760  # 24 h of a page polled every 15 s
+NAN = float('nan')
+
+Values = Union[Mapping[str, Any], Iterable[Mapping[str, Any]]]
+
+
+def _as_float(data: Any) -> float:
+    value = data.get('value') if isinstance(data, dict) else data
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+class _Group:
+    """Timestamp ring of the entities recorded together (one page)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array('d', [NAN]) * capacity
+        self.names: List[str] = []
+        self.rows = 0  # rows written so far, including overwritten ones
+
+    def __len__(self) -> int:
+        return min(self.rows, self.capacity)
+
+    def physical(self, lo: int, hi: int) -> List[Tuple[int, int]]:
+        """Physical slices of the logical rows [lo, hi) (0 = oldest row kept)."""
+        if lo >= hi:
+            return []
+        oldest = self.rows % self.capacity if self.rows > self.capacity else 0
+        start, stop = (oldest + lo) % self.capacity, (oldest + hi) % self.capacity or self.capacity
+        if start < stop:
+            return [(start, stop)]
+        return [(start, self.capacity), (0, stop)]
+
+    def bisect(self, t: float, right: bool) -> int:
+        oldest = self.rows % self.capacity if self.rows > self.capacity else 0
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            ts = self.timestamps[(oldest + mid) % self.capacity]
+            if ts < t or (right and ts == t):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def slices(self, since: Optional[float], until: Optional[float]) -> List[Tuple[int, int]]:
+        lo = self.bisect(since, right=False) if since is not None else 0
+        hi = self.bisect(until, right=True) if until is not None else len(self)
+        return self.physical(lo, hi)
+
+
+class History:
+    """Ring buffers of readings per entity name, grouped by page (see module docstring)."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, typecode: str = 'f'):
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        self.capacity = int(capacity)
+        self.typecode = typecode
+        self.groups: Dict[Hashable, _Group] = {}
+        self.series: Dict[str, array] = {}
+        self._group_of: Dict[str, _Group] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Rows kept by the longest group."""
+        return max((len(group) for group in self.groups.values()), default=0)
+
+    def names(self) -> List[str]:
+        return list(self.series)
+
+    def nbytes(self) -> int:
+        return (sum(g.timestamps.itemsize * self.capacity for g in self.groups.values())
+                + sum(a.itemsize * self.capacity for a in self.series.values()))
+
+    def record(self, values: Values, timestamp: Optional[float] = None, group: Hashable = None) -> None:
+        """Store one row of ``group``: ``{name: {'value': ...}}`` or a list of such page dicts."""
+        pages = [values] if isinstance(values, Mapping) else list(values)
+        with self._lock:
+            ring = self.groups.get(group)
+            if ring is None:
+                ring = self.groups[group] = _Group(self.capacity)
+            row = ring.rows % self.capacity
+            now = time.time() if timestamp is None else float(timestamp)
+            if ring.rows:
+                # keep timestamps sorted for the binary search, even if the clock steps back
+                now = max(now, ring.timestamps[(ring.rows - 1) % self.capacity])
+            ring.timestamps[row] = now
+            for name in ring.names:
+                self.series[name][row] = NAN
+            for page in pages:
+                for name, data in page.items():
+                    if self._group_of.get(name) is not ring:
+                        self._add(name, ring)
+                    self.series[name][row] = _as_float(data)
+            ring.rows += 1
+
+    def _add(self, name: str, ring: _Group) -> None:
+        previous = self._group_of.get(name)
+        if previous is not None:
+            # moved to another page; its readings are only comparable to that page's timestamps
+            previous.names.remove(name)
+        self.series[name] = array(self.typecode, [NAN]) * self.capacity
+        self._group_of[name] = ring
+        ring.names.append(name)
+
+    def _view(self, series: array) -> Any:
+        return np.frombuffer(series, dtype=np.float32 if self.typecode == 'f' else np.float64)
+
+    def window(self, name: str, since: Optional[float] = None,
+               until: Optional[float] = None) -> List[Tuple[float, float]]:
+        """(timestamp, value) pairs of ``name`` with since <= timestamp <= until, oldest first."""
+        with self._lock:
+            series = self.series.get(name)
+            if series is None:
+                return []
+            ring = self._group_of[name]
+            slices = ring.slices(since, until)
+            if np is not None:
+                if not slices:
+                    return []
+                view, times = self._view(series), np.frombuffer(ring.timestamps, dtype=np.float64)
+                chunk = np.concatenate([view[start:stop] for start, stop in slices])
+                stamps = np.concatenate([times[start:stop] for start, stop in slices])
+                keep = ~np.isnan(chunk)
+                return list(zip(stamps[keep].tolist(), chunk[keep].tolist()))
+            return [(ring.timestamps[i], series[i]) for start, stop in slices
+                    for i in range(start, stop) if series[i] == series[i]]
+
+    def last(self, name: str, n: int = 1) -> List[Tuple[float, float]]:
+        """The newest ``n`` readings of ``name`` (oldest first)."""
+        with self._lock:
+            series = self.series.get(name)
+            out: List[Tuple[float, float]] = []
+            if series is None or n <= 0:
+                return out
+            ring = self._group_of[name]
+            if np is not None:
+                view, times = self._view(series), np.frombuffer(ring.timestamps, dtype=np.float64)
+                for start, stop in reversed(ring.physical(0, len(ring))):
+                    rows = np.flatnonzero(~np.isnan(view[start:stop]))[-(n - len(out)):] + start
+                    out[:0] = zip(times[rows].tolist(), view[rows].tolist())
+                    if len(out) == n:
+                        break
+                return out
+            for k in range(len(ring)):
+                i = (ring.rows - 1 - k) % self.capacity
+                if series[i] == series[i]:
+                    out.append((ring.timestamps[i], series[i]))
+                    if len(out) == n:
+                        break
+            out.reverse()
+            return out
+
+    def stats(self, name: str, since: Optional[float] = None,
+              until: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """min/max/mean/count/last of ``name`` in the window, or None without readings."""
+        with self._lock:
+            series = self.series.get(name)
+            if series is None:
+                return None
+            slices = self._group_of[name].slices(since, until)
+            if np is not None:
+                view = self._view(series)
+                chunk = np.concatenate([view[start:stop] for start, stop in slices]) if slices else view[:0]
+                chunk = chunk[~np.isnan(chunk)]
+                if not chunk.size:
+                    return None
+                return {'min': float(chunk.min()), 'max': float(chunk.max()),
+                        'mean': float(chunk.mean(dtype=np.float64)), 'count': int(chunk.size),
+                        'last': float(chunk[-1])}
+            values = [v for start, stop in slices for v in series[start:stop] if not math.isnan(v)]
+            if not values:
+                return None
+            return {'min': min(values), 'max': max(values), 'mean': math.fsum(values) / len(values),
+                    'count': len(values), 'last': values[-1]}
@@ -0,0 +1,130 @@
+"""Compiled page layouts from the TA-Designer XML.
+
+The XML only changes when the schematic is re-exported, so it is compiled
+once into a per-page index (position -> label, object type, skip flag) and
+cached in memory and on disk. The cache is keyed by the XML file's mtime and
+SHA-256, so steady-state cycles do no XML work at all.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from uvr_metrics import STAGE_SECONDS
+from uvr_parse import layout_from_objects, read_page_objects
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+
+class PageLayout(NamedTuple):
+    beschreibung: List[str]
+    id_conf: List[int]
+    xml_dict: Dict[str, int]
+    objects: List[Tuple[str, str, bool]]
+
+
+def _page_layout(objects: List[Tuple[str, str, bool]]) -> PageLayout:
+    beschreibung, id_conf, xml_dict = layout_from_objects(objects)
+    return PageLayout(beschreibung, id_conf, xml_dict, objects)
+
+
+def compile_layout(root: ET.Element) -> List[PageLayout]:
+    """Compile every `Seite_N` of a parsed TA-Designer XML into a PageLayout."""
+    Seiten = range(0, len(root.findall('./Seiten/')))
+    return [_page_layout(read_page_objects(root, Seite)) for Seite in Seiten]
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def default_cache_path(xml_filename: str) -> str:
+    return f"{xml_filename}.layout.json"
+
+
+# abspath -> (mtime_ns, sha256, layout)
+_memory_cache: Dict[str, Tuple[int, str, List[PageLayout]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _read_disk_cache(cache_path: str) -> Optional[dict]:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning('Ignoring unreadable layout cache %s', cache_path)
+        return None
+    if data.get('version') != CACHE_VERSION:
+        return None
+    return data
+
+
+def _write_disk_cache(cache_path: str, mtime_ns: int, digest: str, layout: List[PageLayout]) -> None:
+    data = {
+        'version': CACHE_VERSION,
+        'mtime_ns': mtime_ns,
+        'sha256': digest,
+        'pages': [[list(obj) for obj in page.objects] for page in layout],
+    }
+    tmp = f"{cache_path}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, cache_path)
+    except Exception:
+        logger.warning('Could not write layout cache %s', cache_path, exc_info=True)
+
+
+def load_layout(xml_filename: str, cache_path: Optional[str] = None) -> List[PageLayout]:
+    """Return the compiled layout for ``xml_filename``.
+
+    ``cache_path`` defaults to ``<xml_filename>.layout.json``; pass an empty
+    string to keep the cache in memory only.
+    """
+    key = os.path.abspath(xml_filename)
+    mtime_ns = os.stat(xml_filename).st_mtime_ns
+    with _cache_lock:
+        cached = _memory_cache.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[2]
+
+        if cache_path is None:
+            cache_path = default_cache_path(xml_filename)
+        disk = _read_disk_cache(cache_path) if cache_path else None
+        if disk is not None and disk.get('mtime_ns') == mtime_ns:
+            layout = [_page_layout([tuple(obj) for obj in page]) for page in disk['pages']]
+            _memory_cache[key] = (mtime_ns, disk['sha256'], layout)
+            logger.debug('Loaded layout of %s from %s', xml_filename, cache_path)
+            return layout
+
+        # mtime moved (or no cache): only recompile if the content changed too
+        digest = _file_hash(xml_filename)
+        if cached is not None and cached[1] == digest:
+            layout = cached[2]
+        elif disk is not None and disk.get('sha256') == digest:
+            layout = [_page_layout([tuple(obj) for obj in page]) for page in disk['pages']]
+        else:
+            logger.info('Compiling page layout from %s', xml_filename)
+            with STAGE_SECONDS.time(stage='read_xml'):
+                layout = compile_layout(ET.parse(xml_filename).getroot())
+        _memory_cache[key] = (mtime_ns, digest, layout)
+        if cache_path:
+            _write_disk_cache(cache_path, mtime_ns, digest, layout)
+        return layout
+
+
+def clear_cache() -> None:
+    """Drop the in-memory layout cache (the disk cache is left alone)."""
+    with _cache_lock:
+        _memory_cache.clear()
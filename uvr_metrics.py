@@ -0,0 +1,220 @@
+"""Counters and latency histograms of the polling daemon in Prometheus text format.
+
+A tiny stand-in for ``prometheus_client`` (not a dependency of this
+project): the metrics below are updated by the fetch, layout, parse and MQTT
+code, and `MetricsServer` serves them as ``/metrics`` when
+``uvr.metrics_port`` (``UVR_METRICS_PORT``) is set.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# seconds; a CMI page fetch takes ~50-500 ms, parsing and publishing well below that
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][i] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(tuple(str(labels[n]) for n in self.labelnames))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+FETCH_SECONDS = REGISTRY.register(Histogram(
+    'uvr_fetch_seconds', 'Time to fetch one schematic page, including retries.', ('ip',)))
+FETCH_BYTES = REGISTRY.register(Counter('uvr_fetch_bytes_total', 'Bytes of schematic pages fetched.', ('ip',)))
+FETCH_RETRIES = REGISTRY.register(Counter('uvr_fetch_retries_total', 'Failed fetch attempts that were retried.',
+                                          ('ip',)))
+FETCH_FAILURES = REGISTRY.register(Counter('uvr_fetch_failures_total', 'Pages that could not be fetched.', ('ip',)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'uvr_stage_seconds', 'Latency of the read_xml, combine, filter and send_values stages.', ('stage',)))
+ENTITIES_PARSED = REGISTRY.register(Counter('uvr_entities_parsed_total', 'Values combined from fetched pages.'))
+MESSAGES = REGISTRY.register(Counter(
+    'uvr_mqtt_messages_total', 'State messages by result (published, suppressed, failed).', ('result',)))
+RECONNECTS = REGISTRY.register(Counter('uvr_mqtt_reconnects_total', 'MQTT connect attempts by result.',
+                                       ('result',)))
+RECONNECT_SECONDS = REGISTRY.register(Histogram(
+    'uvr_mqtt_reconnect_seconds', 'Time from losing the broker connection to the next CONNACK.',
+    buckets=(1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)))
+PUBLISH_ACK_SECONDS = REGISTRY.register(Histogram(
+    'uvr_mqtt_ack_seconds', 'Time from handing a message to the client until it was sent (QoS 0) or acknowledged.',
+    ('kind',)))
+PUBLISH_DROPS = REGISTRY.register(Counter(
+    'uvr_mqtt_dropped_total', 'State messages dropped before sending (superseded, overflow, failed).', ('reason',)))
+PUBLISH_PENDING = REGISTRY.register(Gauge(
+    'uvr_mqtt_pending_messages', 'Messages queued or in flight in the publisher after the last cycle.'))
+POLL_SECONDS = REGISTRY.register(Histogram('uvr_poll_seconds', 'Time to poll the due pages of a controller.',
+                                           ('device',)))
+CYCLE_OVERRUNS = REGISTRY.register(Counter(
+    'uvr_cycle_overruns_total', 'Polls that took longer than the shortest interval of their pages.', ('device',)))
+
+
+def _handler_class():
+    # http.server (and the email package behind it) is only imported when the endpoint is enabled
+    from http.server import BaseHTTPRequestHandler
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = self.server.registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug('%s %s', self.address_string(), format % args)
+
+    return _Handler
+
+
+class MetricsServer:
+    """Serve ``registry`` on ``http://host:port/metrics`` from a background thread."""
+
+    def __init__(self, port: int, host: str = '127.0.0.1', registry: Registry = REGISTRY):
+        from http.server import ThreadingHTTPServer
+        self.server = ThreadingHTTPServer((host, port), _handler_class())
+        self.server.daemon_threads = True
+        self.server.registry = registry
+        self._thread = threading.Thread(target=self.server.serve_forever, name='uvr-metrics', daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> 'MetricsServer':
+        self._thread.start()
+        logger.info('Serving metrics on http://%s:%s/metrics', *self.server.server_address[:2])
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_from_config(uvr_cfg: Dict) -> Optional[MetricsServer]:
+    """Start the endpoint if ``uvr.metrics_port`` is set (see `load_configs`)."""
+    port = int(uvr_cfg.get('metrics_port') or 0)
+    if not port:
+        return None
+    return MetricsServer(port, uvr_cfg.get('metrics_host') or '127.0.0.1').start()
@@ -1,13 +1,17 @@
+import hashlib
 import json
 import logging
+import os
 import pprint
 import re
-import random
+import threading
 import time
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
 import paho.mqtt.client as mqtt
 
+from uvr_metrics import MESSAGES, RECONNECT_SECONDS, RECONNECTS, STAGE_SECONDS
+
 logger = logging.getLogger("UVR2MQTT")
 
 
@@ -61,51 +65,184 @@ def get_device_class(unit: Optional[str], t: str) -> Tuple[Optional[str], str, O
     return None, "sensor", unit
 
 
-def build_mqtt_client(mqtt_cfg: Dict[str, Any]) -> mqtt.Client:
-    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
-    client.on_connect = lambda *a, **k: logger.debug("mqtt on_connect %s %s", a, k)
-    client.on_disconnect = lambda *a, **k: logger.warning("mqtt on_disconnect %s %s", a, k)
+class ConnectionSupervisor:
+    """Follow the connection state of a client whose network loop runs in paho's own thread.
+
+    ``loop_start()`` connects and, after a failed attempt or a lost
+    connection, waits ``min_backoff`` doubling up to ``max_backoff`` seconds
+    (``reconnect_delay_set``) before the next attempt. This class only
+    listens to paho's public callbacks and keeps a small state machine for
+    logs, metrics and `is_connected`::
+
+        disconnected --(on_pre_connect)--> connecting --(CONNACK)--> connected
+             ^                                  |                        |
+             +--(on_connect_fail, refused, timeout)--+--(on_disconnect)--+
+
+    A CONNACK that never arrives is caught by paho's keepalive check, which
+    closes the socket and reports ``on_disconnect``. Other threads only read
+    `is_connected`; nothing outside paho's thread ever waits for the broker.
+    """
+
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+
+    def __init__(self, client: Any, min_backoff: float = 1.0, max_backoff: float = 60.0,
+                 connect_timeout: float = 10.0, clock: Callable[[], float] = time.monotonic):
+        self.client = client
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.state = self.DISCONNECTED
+        self.connected = threading.Event()
+        self.attempts = 0
+        self.failures = 0
+        self.connects = 0
+        self._down_since: Optional[float] = None
+        client.reconnect_delay_set(min_delay=max(int(min_backoff), 1), max_delay=max(int(max_backoff), 1))
+        client.connect_timeout = connect_timeout
+        client.on_pre_connect = self._on_pre_connect
+        client.on_connect = self._on_connect
+        client.on_connect_fail = self._on_connect_fail
+        client.on_disconnect = self._on_disconnect
+
+    def is_connected(self) -> bool:
+        return self.state == self.CONNECTED
+
+    def backoff(self) -> float:
+        """paho's wait before the next attempt after ``failures`` failed attempts in a row."""
+        return min(self.max_backoff, self.min_backoff * 2 ** max(self.failures - 1, 0))
+
+    def _on_pre_connect(self, client, userdata) -> None:
+        self.attempts += 1
+        self.state = self.CONNECTING
+        if self._down_since is None:
+            self._down_since = self.clock()
+
+    def _failed(self, reason: Any) -> None:
+        RECONNECTS.inc(result="failed")
+        self.failures += 1
+        self.state = self.DISCONNECTED
+        self.connected.clear()
+        logger.warning("MQTT connect attempt %s failed (%s); next attempt in %.0f s", self.attempts, reason,
+                       self.backoff())
+
+    def _on_connect_fail(self, client, userdata) -> None:
+        # socket errors, DNS failures, TLS errors
+        self._failed("broker unreachable")
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None) -> None:
+        if getattr(reason_code, "is_failure", bool(reason_code)):
+            self._failed(reason_code)
+            return
+        now = self.clock()
+        RECONNECTS.inc(result="success")
+        if self.connects and self._down_since is not None:
+            RECONNECT_SECONDS.observe(now - self._down_since)
+            logger.info("MQTT reconnected after %.1f s (%s attempts)", now - self._down_since, self.failures + 1)
+        else:
+            logger.debug("MQTT CONNACK received")
+        self.connects += 1
+        self.failures = 0
+        self._down_since = None
+        self.state = self.CONNECTED
+        self.connected.set()
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties=None) -> None:
+        if self.state == self.DISCONNECTED:
+            # already handled, e.g. a refused CONNACK followed by the socket closing
+            return
+        if self.state == self.CONNECTING:
+            self._failed(reason_code)
+            return
+        self.state = self.DISCONNECTED
+        self.connected.clear()
+        if not getattr(reason_code, "is_failure", bool(reason_code)):
+            logger.debug("MQTT disconnected")
+            return
+        self._down_since = self.clock()
+        logger.warning("MQTT connection lost (%s); reconnecting in the background", reason_code)
+
+
+class SupervisedClient(mqtt.Client):
+    """paho client whose connection state is tracked by a `ConnectionSupervisor`.
+
+    Network I/O and reconnects stay with paho's ``loop_start()`` thread, so
+    ``publish()`` from any thread only queues the packet for that thread.
+    """
+
+    def supervise(self, host: str, port: int = 1883, keepalive: int = 60, **options: Any) -> ConnectionSupervisor:
+        self.supervisor = ConnectionSupervisor(self, **options)
+        self.connect_async(host, port, keepalive)
+        return self.supervisor
+
+    def is_connected(self) -> bool:
+        return self.supervisor.is_connected()
+
+
+def build_mqtt_client(mqtt_cfg: Dict[str, Any], wait: bool = True) -> SupervisedClient:
+    """Connect to the broker; waits up to ``mqtt.connect_timeout`` seconds for the first CONNACK.
+
+    With ``wait=False`` the connection is only started; call `wait_connected`
+    before publishing, and do other startup work in between.
+    """
+    client = SupervisedClient(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
     if mqtt_cfg.get("user") and mqtt_cfg.get("password"):
         client.username_pw_set(mqtt_cfg.get("user"), mqtt_cfg.get("password"))
+    supervisor = client.supervise(mqtt_cfg["broker"], int(mqtt_cfg.get("port", 1883)), keepalive=300,
+                                  min_backoff=float(mqtt_cfg.get("reconnect_min_delay", 1)),
+                                  max_backoff=float(mqtt_cfg.get("reconnect_max_delay", 60)))
+    client.loop_start()
+    if wait:
+        wait_connected(client, mqtt_cfg)
+    return client
 
-    max_attempts = 5
-    for attempt in range(1, max_attempts + 1):
-        try:
-            client.connect(mqtt_cfg["broker"], int(mqtt_cfg.get("port", 1883)), keepalive=300)
-            client.loop_start()
-            time.sleep(1)
-            if client.is_connected():
-                logger.info("Connected to MQTT broker %s", mqtt_cfg["broker"])
-                return client
-        except Exception:
-            wait = min(2 ** attempt + random.uniform(0, 1), 30)
-            logger.warning("MQTT connect attempt %s failed; retrying in %.1f seconds...", attempt, wait)
-            time.sleep(wait)
+
+def wait_connected(client: SupervisedClient, mqtt_cfg: Dict[str, Any]) -> None:
+    """Block until the first CONNACK; raises ConnectionError after ``mqtt.connect_timeout`` seconds."""
+    if client.supervisor.connected.wait(float(mqtt_cfg.get("connect_timeout", 60))):
+        logger.info("Connected to MQTT broker %s", mqtt_cfg["broker"])
+        return
+    client.loop_stop()
     raise ConnectionError(f"Failed to connect to MQTT broker {mqtt_cfg.get('broker')}")
 
 
+def wait_for_acks(infos: Iterable[Any], timeout: float) -> bool:
+    """Wait until the broker acknowledged the given QoS>0 publishes; False on timeout or error."""
+    deadline = time.monotonic() + timeout
+    for info in infos:
+        try:
+            info.wait_for_publish(max(deadline - time.monotonic(), 0.0))
+        except (RuntimeError, ValueError):
+            return False
+        if not info.is_published():
+            return False
+    return True
+
+
 def check_mqtt_connection(client: mqtt.Client) -> bool:
+    """Cheap connection-state check; a `SupervisedClient` reconnects in the background."""
     if client.is_connected():
-        logger.debug("MQTT Connection active")
         return True
-    logger.warning("MQTT Connection lost; attempting reconnect")
-    max_retries = 6
-    for attempt in range(1, max_retries + 1):
-        try:
-            client.reconnect()
-            wait = min(2 ** attempt + random.uniform(0, 1), 30)
-            time.sleep(wait)
-            if client.is_connected():
-                logger.info("MQTT reconnected on attempt %s", attempt)
-                return True
-        except Exception:
-            logger.debug("Reconnect attempt %s failed", attempt)
-            time.sleep(min(2 ** attempt, 30))
-    logger.error("MQTT reconnection exhausted")
+    logger.debug("MQTT not connected")
     return False
 
 
-def send_config(mqtt_client: mqtt.Client, mqtt_device_name: str, entity_name: str, unit: Optional[str], friendly_name: Optional[str] = None) -> None:
+STATE_MODES = ("entity", "device")
+
+
+def device_state_topic(device_id: str) -> str:
+    """Topic of the JSON document holding all states of a device in ``device`` state mode."""
+    return f"homeassistant/{device_id}/state"
+
+
+def build_config(mqtt_device_name: str, entity_name: str, unit: Optional[str], friendly_name: Optional[str] = None,
+                 bulk: bool = False) -> Tuple[str, str]:
+    """Return (discovery topic, JSON payload) for one entity.
+
+    With ``bulk`` the entity reads its value from the device's shared JSON
+    state topic through a ``value_template``.
+    """
     device_class, entity_type, unit_of_measurement = get_device_class(unit, entity_name)
     device_id = sanitize_name(mqtt_device_name)
     object_id = entity_name
@@ -123,6 +260,9 @@ def send_config(mqtt_client: mqtt.Client, mqtt_device_name: str, entity_name: st
             "model": "UVR-TADesigner",
         },
     }
+    if bulk:
+        config_payload[topic_str] = device_state_topic(device_id)
+        config_payload["value_template"] = f"{{{{ value_json['{object_id}'] }}}}"
     if device_class:
         config_payload["device_class"] = device_class
     availability_topic = f"homeassistant/{device_id}/availability"
@@ -136,8 +276,14 @@ def send_config(mqtt_client: mqtt.Client, mqtt_device_name: str, entity_name: st
             config_payload["state_class"] = "measurement"
     mqtt_message = json.dumps(config_payload)
     mqtt_topic = f"homeassistant/{entity_type}/{config_topic}/config"
+    return mqtt_topic, mqtt_message
+
+
+def send_config(mqtt_client: mqtt.Client, mqtt_device_name: str, entity_name: str, unit: Optional[str], friendly_name: Optional[str] = None,
+                bulk: bool = False) -> Any:
+    mqtt_topic, mqtt_message = build_config(mqtt_device_name, entity_name, unit, friendly_name=friendly_name, bulk=bulk)
     logger.debug("send_config -> topic: %s payload: %s", mqtt_topic, mqtt_message)
-    mqtt_client.publish(mqtt_topic, mqtt_message, retain=True)
+    return mqtt_client.publish(mqtt_topic, mqtt_message, retain=True)
 
 
 def bool_to_on_off(v: Any, n: str) -> str:
@@ -151,39 +297,412 @@ def bool_to_on_off(v: Any, n: str) -> str:
     return "OFF"
 
 
-def send_values(client: mqtt.Client, device_name: str, values: Any) -> None:
-    logger.debug("send_values for device %s", device_name)
-    device_id = sanitize_name(device_name)
+DEFAULT_HEARTBEAT = 300.0
+
+
+class StateDeltaFilter:
+    """Suppress state publishes that did not change since the last one sent.
+
+    Numeric payloads are compared against the last *published* value using a
+    per-unit deadband (e.g. ``{"°C": 0.2, "kW": 0.05}``); everything else must
+    match exactly. A topic is republished anyway once ``heartbeat`` seconds
+    have passed so Home Assistant never goes stale. The publisher reports
+    messages it could not deliver to `forget`, so their value is sent again.
+    """
+
+    def __init__(self, deadbands: Optional[Dict[str, float]] = None, heartbeat: float = DEFAULT_HEARTBEAT,
+                 clock=time.monotonic):
+        self.deadbands = {unit: float(band) for unit, band in (deadbands or {}).items()}
+        self.heartbeat = float(heartbeat)
+        self.clock = clock
+        self._last: Dict[str, Tuple[Any, float]] = {}
+        # message topic -> state topics marked as sent inside it (state document mode)
+        self._via: Dict[str, Set[str]] = {}
+        # forget() is called from the MQTT network thread
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.suppressed = 0
+        self.heartbeats = 0
+
+    def should_publish(self, topic: str, payload: Any, unit: Optional[str]) -> bool:
+        last = self._last.get(topic)
+        if last is None:
+            return True
+        last_payload, last_time = last
+        if self.heartbeat > 0 and self.clock() - last_time >= self.heartbeat:
+            self.heartbeats += 1
+            return True
+        if self.differs(payload, last_payload, unit):
+            return True
+        self.suppressed += 1
+        return False
+
+    def differs(self, payload: Any, last_payload: Any, unit: Optional[str]) -> bool:
+        """True if ``payload`` moved past the deadband of ``unit`` (or, if not numeric, is not equal)."""
+        if isinstance(payload, float) and isinstance(last_payload, float):
+            return abs(payload - last_payload) > self.deadbands.get(unit, 0.0)
+        return payload != last_payload
+
+    def mark_sent(self, topic: str, payload: Any, via: Optional[str] = None) -> None:
+        """Record ``payload`` as published; ``via`` is the message topic if it went out inside another message."""
+        with self._lock:
+            self._last[topic] = (payload, self.clock())
+            if via is not None:
+                self._via.setdefault(via, set()).add(topic)
+            self.sent += 1
+
+    def forget(self, topic: str) -> None:
+        """The message on ``topic`` was not delivered; publish its states again on the next poll."""
+        with self._lock:
+            self._last.pop(topic, None)
+            for state_topic in self._via.pop(topic, ()):
+                self._last.pop(state_topic, None)
+
+    def heartbeat_due(self) -> bool:
+        """True once any published topic is older than ``heartbeat``."""
+        with self._lock:
+            if self.heartbeat <= 0 or not self._last:
+                return False
+            return self.clock() - min(sent_at for _payload, sent_at in self._last.values()) >= self.heartbeat
+
+    def reset(self) -> None:
+        """Forget all published states, e.g. after the broker connection was lost."""
+        with self._lock:
+            self._last.clear()
+            self._via.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'sent': self.sent, 'suppressed': self.suppressed, 'heartbeats': self.heartbeats}
+
+
+def delta_filter_from_config(mqtt_cfg: Dict[str, Any]) -> Optional[StateDeltaFilter]:
+    """Build the StateDeltaFilter described by the ``mqtt`` config section (None if disabled)."""
+    if not mqtt_cfg.get("change_only", True):
+        return None
+    return StateDeltaFilter(mqtt_cfg.get("deadbands"), heartbeat=mqtt_cfg.get("heartbeat", DEFAULT_HEARTBEAT))
+
+
+def _encode_mode(value: Any, name: str) -> str:
+    if value == 1 or str(value).lower() == '1':
+        return 'AUTO'
+    if value == 0 or str(value).lower() == '0':
+        return 'HAND'
+    return str(value)
+
+
+def _encode_percent(value: Any, name: str) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _encode_binary(value: Any, name: str) -> str:
+    return bool_to_on_off(float(value) if value is not None else 0, name)
+
+
+def _encode_float(value: Any, name: str) -> Any:
+    try:
+        return float(value) if value is not None else None
+    except Exception:
+        return str(value)
+
+
+class EntityPlan(NamedTuple):
+    object_id: str
+    entity_type: str
+    state_topic: str
+    encode: Callable[[Any, str], Any]
+
+
+class EntityRegistry:
+    """Per-device cache of how each entity is published.
+
+    Sanitizing names and resolving device classes is done once per
+    (name, unit) pair; a plan is only compiled when a new name or unit shows up.
+    """
+
+    def __init__(self, device_name: str):
+        self.device_name = device_name
+        self.device_id = sanitize_name(device_name)
+        self._plans: Dict[Tuple[str, Optional[str]], EntityPlan] = {}
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def plan(self, sensor_name: str, unit: Optional[str]) -> EntityPlan:
+        key = (sensor_name, unit)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._compile(sensor_name, unit)
+            self._plans[key] = plan
+        return plan
+
+    def _compile(self, sensor_name: str, unit: Optional[str]) -> EntityPlan:
+        _device_class, entity_type, _unit_of_measurement = get_device_class(unit, sensor_name)
+        object_id = sanitize_name(sensor_name)
+        if sensor_name.endswith("_mode"):
+            encode = _encode_mode
+        elif sensor_name.endswith("_percent"):
+            encode = _encode_percent
+        elif entity_type == "binary_sensor":
+            encode = _encode_binary
+        else:
+            encode = _encode_float
+        state_topic = f"homeassistant/{entity_type}/{self.device_id}/{object_id}/state"
+        return EntityPlan(object_id, entity_type, state_topic, encode)
+
+
+_registries: Dict[str, EntityRegistry] = {}
+
+
+def get_registry(device_name: str) -> EntityRegistry:
+    registry = _registries.get(device_name)
+    if registry is None:
+        registry = _registries[device_name] = EntityRegistry(device_name)
+    return registry
+
+
+class DeviceState:
+    """The JSON state document of one device in ``device`` state mode.
+
+    Holds the latest encoded value of every entity seen so far, keyed by
+    object id, so a poll of some pages still publishes a complete document
+    and no ``value_template`` ever misses its key.
+    """
+
+    def __init__(self, device_name: str):
+        self.device_id = sanitize_name(device_name)
+        self.topic = device_state_topic(self.device_id)
+        self.values: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def payload(self) -> str:
+        return json.dumps(self.values, separators=(",", ":"), ensure_ascii=False)
+
+
+def device_state_from_config(mqtt_cfg: Dict[str, Any], device_name: str) -> Optional[DeviceState]:
+    """The device's state document when ``mqtt.state_mode`` is ``device``; None for one topic per entity."""
+    mode = mqtt_cfg.get("state_mode", "entity")
+    if mode not in STATE_MODES:
+        raise ValueError(f"Unknown mqtt.state_mode {mode!r}; expected one of {STATE_MODES}")
+    return DeviceState(device_name) if mode == "device" else None
+
+
+def _publish_state(client: mqtt.Client, topic: str, message: Any, delta: Optional[StateDeltaFilter],
+                   states: List[Tuple[str, Any]]) -> bool:
+    """Publish one state message carrying ``states`` (state topic, payload); False if it failed.
+
+    The states are marked as sent before publishing, as a `Publisher` may
+    drop the message (and call `StateDeltaFilter.forget`) before
+    ``publish`` returns; a refused or failed publish unmarks them again.
+    """
+    if delta is not None:
+        for state_topic, payload in states:
+            delta.mark_sent(state_topic, payload, via=None if state_topic == topic else topic)
+    try:
+        info = client.publish(topic, message)
+    except Exception:
+        logger.exception("Failed to publish %s", topic)
+    else:
+        if not getattr(info, 'rc', 0):
+            return True
+        logger.warning("Publishing %s was refused (rc=%s)", topic, info.rc)
+    if delta is not None:
+        delta.forget(topic)
+    return False
+
+
+def _send_document(client: mqtt.Client, document: DeviceState, values: Any, delta: Optional[StateDeltaFilter],
+                   registry: EntityRegistry, counts: Dict[str, int]) -> None:
+    changed = []
     for entry in values:
         for sensor_name, data in entry.items():
-            device_class, entity_type, unit_of_measurement = get_device_class(data.get("unit"), sensor_name)
-            object_id = sanitize_name(sensor_name)
-            state_topic = f"homeassistant/{entity_type}/{device_id}/{object_id}/state"
-            if sensor_name.endswith("_mode"):
-                mode_val = data.get('value')
-                payload = 'AUTO' if mode_val == 1 or str(mode_val).lower() == '1' else ('HAND' if mode_val == 0 or str(mode_val).lower() == '0' else str(mode_val))
-            elif sensor_name.endswith("_percent"):
-                payload = float(data.get('value')) if data.get('value') is not None else None
-            else:
-                if entity_type == "binary_sensor":
-                    payload = bool_to_on_off(float(data.get('value')) if data.get('value') is not None else 0, sensor_name)
-                else:
-                    try:
-                        payload = float(data.get('value')) if data.get('value') is not None else None
-                    except Exception:
-                        payload = str(data.get('value'))
-            try:
-                if isinstance(payload, str):
-                    client.publish(state_topic, payload)
-                else:
-                    client.publish(state_topic, json.dumps(payload))
-                logger.debug("Published %s -> %s", state_topic, payload)
-            except Exception:
-                logger.exception("Failed to publish %s", state_topic)
-
-
-def create_config(mqtt_client: mqtt.Client, mqtt_device_name: str, values: Any) -> None:
+            unit = data.get("unit")
+            plan = registry.plan(sensor_name, unit)
+            payload = plan.encode(data.get('value'), sensor_name)
+            document.values[plan.object_id] = payload
+            if delta is not None and not delta.should_publish(plan.state_topic, payload, unit):
+                counts["suppressed"] += 1
+                continue
+            changed.append((plan.state_topic, payload))
+    if not changed:
+        return
+    if _publish_state(client, document.topic, document.payload(), delta, changed):
+        logger.debug("Published %s (%d values, %d changed)", document.topic, len(document), len(changed))
+        counts["published"] += 1
+    else:
+        counts["failed"] += 1
+
+
+def send_values(client: mqtt.Client, device_name: str, values: Any, delta: Optional[StateDeltaFilter] = None,
+                registry: Optional[EntityRegistry] = None, document: Optional[DeviceState] = None) -> None:
+    """Publish the states of ``values``: one message per entity, or one ``document`` for the device."""
+    logger.debug("send_values for device %s", device_name)
+    if registry is None:
+        registry = get_registry(device_name)
+    counts = {"published": 0, "suppressed": 0, "failed": 0}
+    if delta is not None and hasattr(client, "watch_drops"):
+        # states the publisher queues now and drops later must not stay marked as sent
+        client.watch_drops(delta.forget)
+    with STAGE_SECONDS.time(stage="send_values"):
+        if document is not None:
+            _send_document(client, document, values, delta, registry, counts)
+        else:
+            for entry in values:
+                for sensor_name, data in entry.items():
+                    unit = data.get("unit")
+                    plan = registry.plan(sensor_name, unit)
+                    state_topic = plan.state_topic
+                    payload = plan.encode(data.get('value'), sensor_name)
+                    if delta is not None and not delta.should_publish(state_topic, payload, unit):
+                        counts["suppressed"] += 1
+                        continue
+                    message = payload if isinstance(payload, str) else json.dumps(payload)
+                    if _publish_state(client, state_topic, message, delta, [(state_topic, payload)]):
+                        logger.debug("Published %s -> %s", state_topic, payload)
+                        counts["published"] += 1
+                    else:
+                        counts["failed"] += 1
+    for result, count in counts.items():
+        if count:
+            MESSAGES.inc(count, result=result)
+
+
+class DiscoveryManifest:
+    """On-disk record of the discovery payloads already published.
+
+    Stores a SHA-256 of every retained config payload per device so a
+    restart only republishes entities that were added or changed, and clears
+    (empty retained message) the ones that disappeared. Delete the file to
+    force a full republish, e.g. after the broker lost its retained messages.
+
+    A config is only recorded once the MQTT client accepted it. One that
+    went to the spool during an outage, or was refused, stays pending and is
+    sent again by `resend_pending` once the broker is back, so pruned spool
+    segments cannot hide an entity from Home Assistant.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.devices: Dict[str, Dict[str, str]] = {}
+        # device id -> topic -> config (or "" for a removal) not yet accepted by the client
+        self.pending: Dict[str, Dict[str, str]] = {}
+        # several controllers may sync their devices concurrently
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.devices = json.load(f).get("devices", {})
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.warning("Ignoring unreadable discovery manifest %s", path)
+
+    def save(self) -> None:
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"devices": self.devices}, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except Exception:
+            logger.warning("Could not write discovery manifest %s", self.path, exc_info=True)
+
+    def sync(self, mqtt_client: mqtt.Client, device_id: str, configs: Dict[str, str], prune: bool = True,
+             sent: Optional[List[Any]] = None) -> Dict[str, int]:
+        """Publish added/changed configs and, if ``prune``, clear the ones not in ``configs``.
+
+        The publish results are appended to ``sent`` if given (see `wait_for_acks`).
+        """
+        with self._lock:
+            return self._sync(mqtt_client, device_id, configs, prune, sent)
+
+    def _sync(self, mqtt_client: mqtt.Client, device_id: str, configs: Dict[str, str], prune: bool,
+              sent: Optional[List[Any]]) -> Dict[str, int]:
+        known = self.devices.setdefault(device_id, {})
+        pending = self.pending.setdefault(device_id, {})
+        counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        recorded = False
+        for topic, message in configs.items():
+            previous = known.get(topic)
+            if previous == _digest(message) and topic not in pending:
+                counts["unchanged"] += 1
+                continue
+            logger.debug("send_config -> topic: %s payload: %s", topic, message)
+            recorded |= self._publish(mqtt_client, known, pending, topic, message, sent)
+            counts["added" if previous is None else "changed"] += 1
+        if prune:
+            for topic in [t for t in known if t not in configs]:
+                logger.info("Removing discovery config %s", topic)
+                recorded |= self._publish(mqtt_client, known, pending, topic, "", sent)
+                counts["removed"] += 1
+        if recorded:
+            self.save()
+        logger.info("Discovery for %s: %s", device_id, counts)
+        if pending:
+            logger.info("Discovery for %s: %d configs not accepted by the client yet", device_id, len(pending))
+        return counts
+
+    @staticmethod
+    def _publish(mqtt_client: mqtt.Client, known: Dict[str, str], pending: Dict[str, str], topic: str,
+                 message: str, sent: Optional[List[Any]] = None) -> bool:
+        """Publish one retained config; record it if the client accepted it, else keep it pending."""
+        info = mqtt_client.publish(topic, message, retain=True)
+        if sent is not None and info is not None:
+            sent.append(info)
+        # SpoolClient returns None: spooled configs may be pruned before they reach the broker
+        if info is None or getattr(info, "rc", 0):
+            pending[topic] = message
+            return False
+        pending.pop(topic, None)
+        if message:
+            known[topic] = _digest(message)
+        else:
+            known.pop(topic, None)
+        return True
+
+    def resend_pending(self, mqtt_client: mqtt.Client) -> int:
+        """Publish the configs the client did not accept before; returns how many are still pending."""
+        with self._lock:
+            recorded = False
+            for device_id, pending in self.pending.items():
+                known = self.devices.setdefault(device_id, {})
+                for topic, message in list(pending.items()):
+                    recorded |= self._publish(mqtt_client, known, pending, topic, message)
+            if recorded:
+                self.save()
+            return sum(len(pending) for pending in self.pending.values())
+
+
+def _digest(message: str) -> str:
+    return hashlib.sha256(message.encode("utf-8")).hexdigest()
+
+
+def discovery_manifest_from_config(mqtt_cfg: Dict[str, Any]) -> Optional[DiscoveryManifest]:
+    path = mqtt_cfg.get("discovery_manifest")
+    return DiscoveryManifest(path) if path else None
+
+
+def create_config(mqtt_client: mqtt.Client, mqtt_device_name: str, values: Any,
+                  manifest: Optional[DiscoveryManifest] = None, prune: bool = True,
+                  bulk: bool = False, sent: Optional[List[Any]] = None) -> Dict[str, int]:
+    """Publish the discovery configs of ``values``; returns the added/changed/removed/unchanged counts.
+
+    The publish results are appended to ``sent`` if given, e.g. to wait for their PUBACKs.
+    """
+    if manifest is None:
+        added = 0
+        for entry in values:
+            for name, data in entry.items():
+                entity_name = sanitize_name(name)
+                info = send_config(mqtt_client, mqtt_device_name, entity_name, data.get("unit"), friendly_name=name,
+                                   bulk=bulk)
+                if sent is not None and info is not None:
+                    sent.append(info)
+                added += 1
+        return {"added": added, "changed": 0, "removed": 0, "unchanged": 0}
+    configs: Dict[str, str] = {}
     for entry in values:
         for name, data in entry.items():
-            entity_name = sanitize_name(name)
-            send_config(mqtt_client, mqtt_device_name, entity_name, data.get("unit"), friendly_name=name)
+            topic, message = build_config(mqtt_device_name, sanitize_name(name), data.get("unit"), friendly_name=name,
+                                          bulk=bulk)
+            configs[topic] = message
+    return manifest.sync(mqtt_client, sanitize_name(mqtt_device_name), configs, prune=prune, sent=sent)
@@ -0,0 +1,55 @@
+"""Reuse the combined values of CMI pages whose HTML did not change.
+
+A schematic page often comes back byte-identical to the previous poll (the
+CMI only refreshes its values every few seconds and many objects are
+static). Every page's raw response is fingerprinted; when the fingerprint,
+the compiled layout and the parser backend all match the previous read of
+that page, the previously combined dict is returned instead of parsing the
+page again.
+"""
+import hashlib
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# key -> (fingerprint, page layout, parser backend, combined dict)
+_Entry = Tuple[bytes, Any, str, Dict[str, Any]]
+
+
+def fingerprint(html: str) -> bytes:
+    return hashlib.blake2b(html.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class PageCache:
+    """Last fingerprint and combined dict per page, keyed by e.g. ``(ip, Seite)``."""
+
+    def __init__(self):
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._lock = threading.Lock()
+        self.unchanged: Dict[Hashable, int] = {}
+        self.parsed: Dict[Hashable, int] = {}
+
+    def get(self, key: Hashable, html: str, page_layout: Any, backend: str) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+        """Return ``(fingerprint, combined)``; ``combined`` is None unless the page is unchanged."""
+        digest = fingerprint(html)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == digest and entry[1] is page_layout and entry[2] == backend:
+                self.unchanged[key] = self.unchanged.get(key, 0) + 1
+                return digest, entry[3]
+        return digest, None
+
+    def put(self, key: Hashable, digest: bytes, page_layout: Any, backend: str, combined: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (digest, page_layout, backend, combined)
+            self.parsed[key] = self.parsed.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.unchanged.clear()
+            self.parsed.clear()
+
+    def stats(self) -> Dict[Hashable, Dict[str, int]]:
+        with self._lock:
+            keys = set(self.parsed) | set(self.unchanged)
+            return {key: {'parsed': self.parsed.get(key, 0), 'unchanged': self.unchanged.get(key, 0)} for key in keys}
@@ -1,10 +1,15 @@
 import logging
+import os
 import pprint
 import re
+import threading
+from collections import OrderedDict
+from html import unescape
 from html.parser import HTMLParser
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
+
+from uvr_metrics import STAGE_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -33,34 +38,216 @@ def normalize_unit(raw_unit: Optional[str]) -> Optional[str]:
     return u
 
 
-def separate(s: Any) -> Tuple[Optional[float], Optional[str]]:
-    if s is None:
-        return None, None
-    if not isinstance(s, str):
-        s = str(s)
-    s = s.strip()
-    s = s.replace('\xa0', ' ').replace('Â', '°')
-    s = s.replace(',', '.')
-    numeric_parts = re.findall(r'-?\d+(?:\.\d+)?', s)
-    value = None
-    for part in numeric_parts:
-        try:
-            value = float(part)
-            break
-        except ValueError:
-            continue
-    unit_pattern = r'(°C|Â°C|l/h|W/m²|W/m°²|%|kWh|kW|min|AUS|AN|ON|OFF|AUTO|EIN|C)'
-    unit_match = re.search(unit_pattern, s, flags=re.IGNORECASE)
+DECODE_CACHE_SIZE = int(os.environ.get('UVR_DECODE_CACHE_SIZE', 4096))
+
+_NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?')
+_UNIT_RE = re.compile(r'(°C|Â°C|l/h|W/m²|W/m°²|%|kWh|kW|min|AUS|AN|ON|OFF|AUTO|EIN|C)', re.IGNORECASE)
+_SWITCH_ON_RE = re.compile(r'\b(AN|ON|EIN)\b', re.IGNORECASE)
+_SWITCH_OFF_RE = re.compile(r'\b(AUS|OFF)\b', re.IGNORECASE)
+# NBSP -> space, mis-decoded 'Â' -> '°', decimal comma -> point
+_NORMALIZE = str.maketrans({'\xa0': ' ', 'Â': '°', ',': '.'})
+
+
+def _decode(s: str) -> Tuple[Optional[float], Optional[str]]:
+    s = s.strip().translate(_NORMALIZE)
+    number = _NUMBER_RE.search(s)
+    value = float(number.group()) if number else None
+    unit_match = _UNIT_RE.search(s)
     raw_unit = unit_match.group().strip() if unit_match else None
     unit = normalize_unit(raw_unit)
     if unit == 'switch' and value is None:
-        if re.search(r'\b(AN|ON|EIN)\b', s, flags=re.IGNORECASE):
+        if _SWITCH_ON_RE.search(s):
             value = 1.0
-        elif re.search(r'\b(AUS|OFF)\b', s, flags=re.IGNORECASE):
+        elif _SWITCH_OFF_RE.search(s):
             value = 0.0
     return value, unit
 
 
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class _DecodeCache:
+    """Bounded LRU memo of raw fragment -> (value, unit), shared by `separate` and `decode_fragments`.
+
+    Fragments such as 'AUS' or ' 10,2 Â°C' repeat every cycle. Lookups,
+    stores and the hit/miss counters are guarded by one lock, as fetch
+    threads decode pages concurrently; when full, the least recently used
+    entry is dropped.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data: 'OrderedDict[str, Tuple[Optional[float], Optional[str]]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[Tuple[Optional[float], Optional[str]]]]:
+        """Cached results for ``texts`` (None for misses), counting hits and misses."""
+        data = self.data
+        with self._lock:
+            results = []
+            for text in texts:
+                result = data.get(text)
+                if result is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    data.move_to_end(text)
+                results.append(result)
+            return results
+
+    def store(self, s: str, result: Tuple[Optional[float], Optional[str]]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if s in self.data:
+                self.data.move_to_end(s)
+            elif len(self.data) >= self.maxsize:
+                self.data.popitem(last=False)
+            self.data[s] = result
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self.data))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.data.clear()
+            self.hits = self.misses = 0
+
+
+_decode_cache = _DecodeCache(DECODE_CACHE_SIZE)
+
+
+def separate(s: Any) -> Tuple[Optional[float], Optional[str]]:
+    if s is None:
+        return None, None
+    if not isinstance(s, str):
+        s = str(s)
+    result = _decode_cache.get_many((s,))[0]
+    if result is None:
+        result = _decode(s)
+        _decode_cache.store(s, result)
+    return result
+
+
+# `_NUMBER_RE` and `_UNIT_RE` in one pattern; units contain no digits, so neither alternative hides the other
+_TOKEN_RE = re.compile(r'(?P<number>-?\d+(?:\.\d+)?)|(?P<unit>' + _UNIT_RE.pattern[1:-1] + ')', re.IGNORECASE)
+_unit_codes: Dict[str, Optional[str]] = {}
+
+
+def _scan_fragments(texts: Sequence[str]) -> Tuple[List[Optional[float]], List[Optional[str]]]:
+    """Decode ``texts`` like `_decode`, but with one ``translate`` and one ``finditer`` over all of them."""
+    count = len(texts)
+    values: List[Optional[float]] = [None] * count
+    units: List[Optional[str]] = [None] * count
+    if not count:
+        return values, units
+    # translate maps one char to one char, so offsets into the joined text stay valid
+    joined = '\n'.join(texts).translate(_NORMALIZE)
+    ends = []
+    end = -1
+    for text in texts:
+        end += len(text) + 1
+        ends.append(end)
+    i = 0
+    for m in _TOKEN_RE.finditer(joined):
+        start = m.start()
+        # no token matches the separator, so ``start`` never equals a fragment end
+        while start > ends[i]:
+            i += 1
+        if m.lastgroup == 'number':
+            if values[i] is None:
+                values[i] = float(m.group())
+        elif units[i] is None:
+            raw = m.group()
+            unit = _unit_codes.get(raw)
+            if unit is None:
+                unit = _unit_codes[raw] = normalize_unit(raw)
+            units[i] = unit
+    for i, unit in enumerate(units):
+        if unit == 'switch' and values[i] is None:
+            text = joined[ends[i] - len(texts[i]):ends[i]]
+            if _SWITCH_ON_RE.search(text):
+                values[i] = 1.0
+            elif _SWITCH_OFF_RE.search(text):
+                values[i] = 0.0
+    return values, units
+
+
+def decode_fragments(texts: Sequence[str]) -> Tuple[List[Optional[float]], List[Optional[str]]]:
+    """Batch `separate`: parallel lists of values and normalized units for all fragments of a page.
+
+    Fragments already in the decode cache are looked up; the rest are joined,
+    normalized with one translation table and scanned by one combined
+    pattern, each token being assigned to its fragment by offset.
+    """
+    results = _decode_cache.get_many(texts)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        texts_missing = [texts[i] for i in missing]
+        values, units = _scan_fragments(texts_missing)
+        for i, text, value, unit in zip(missing, texts_missing, values, units):
+            results[i] = (value, unit)
+            _decode_cache.store(text, results[i])
+    return [result[0] for result in results], [result[1] for result in results]
+
+
+_PERCENT_RE = re.compile(r'\d+(?:[.,]\d+)?')
+_PERCENT_TOKEN_RE = re.compile(r'(\d+(?:[.,]\d+)?\s*%?)')
+
+
+def _mode_token(token: str) -> Optional[float]:
+    if token == 'AUTO':
+        return 1.0
+    if token == 'HAND':
+        return 0.0
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def decode_modes(parts: Sequence[List[str]]) -> Tuple[List[Optional[float]], List[Optional[float]]]:
+    """Parallel lists of (mode, percent) for the text lines of each Modus fragment.
+
+    Two lines are ``AUTO``/``HAND`` (or a number) and a percentage; a single
+    line holds both, e.g. ``AUTO 40 %``. Missing parts are None.
+    """
+    modes: List[Optional[float]] = []
+    percents: List[Optional[float]] = []
+    for lines in parts:
+        first = lines[0].strip() if lines else ''
+        mode = _mode_token(first) if lines else None
+        percent = None
+        if len(lines) >= 2:
+            m = _PERCENT_RE.search(lines[1])
+            if m:
+                percent = float(m.group().replace(',', '.'))
+        elif lines:
+            m = _PERCENT_RE.search(first)
+            if m:
+                percent = float(m.group().replace(',', '.'))
+                mode = _mode_token(_PERCENT_TOKEN_RE.sub('', first).strip())
+        modes.append(mode)
+        percents.append(percent)
+    return modes, percents
+
+
+def decode_cache_info() -> CacheInfo:
+    """Hit/miss statistics of the decode cache, like functools' ``CacheInfo``."""
+    return _decode_cache.info()
+
+
+def decode_cache_clear() -> None:
+    _decode_cache.clear()
+
+
 class MyHTMLParser(HTMLParser):
     def __init__(self, log: logging.Logger):
         super().__init__()
@@ -98,138 +285,200 @@ class MyHTMLParser(HTMLParser):
                 self.dict[self.curr_id] = {'value': value_part, 'unit': unit}
 
 
-def read_xml(root: ET.Element, Seite: int) -> Tuple[List[str], List[int], Dict[str, int]]:
-    beschreibung: List[str] = []
-    id_conf: List[int] = []
-    xml_dict: Dict[str, int] = {}
-    idx = 0
+def read_page_objects(root: ET.Element, Seite: int) -> List[Tuple[str, str, bool]]:
+    """Return (label, object type, skip) for every object of a page, in position order."""
     objs = root.findall(f'./Seiten/Seite_{Seite}/Objekte/*')
+    # index once instead of one XPath query per object; the last duplicate wins
+    by_tag = {node.tag: node for node in objs}
+    objects: List[Tuple[str, str, bool]] = []
     for i in range(len(objs)):
-        node = root.findall(f'./Seiten/Seite_{Seite}/Objekte/Objekt_{i}')[-1]
+        node = by_tag[f'Objekt_{i}']
         b = node.get('Bezeichnung').split(': ')[-1]
         typ = node.get('Objekt_Typ')
-        if 'Pic_Obj' not in typ:
+        objects.append((b, typ, 'Pic_Obj' in typ))
+    return objects
+
+
+def layout_from_objects(objects: List[Tuple[str, str, bool]]) -> Tuple[List[str], List[int], Dict[str, int]]:
+    """Build (beschreibung, id_conf, xml_dict) from the objects of one page."""
+    beschreibung: List[str] = []
+    id_conf: List[int] = []
+    xml_dict: Dict[str, int] = {}
+    idx = 0
+    for b, _typ, skip in objects:
+        if not skip:
             beschreibung.append(b)
             id_conf.append(idx)
             xml_dict[b] = idx
             idx += 1
+    return beschreibung, id_conf, xml_dict
+
+
+def read_xml(root: ET.Element, Seite: int) -> Tuple[List[str], List[int], Dict[str, int]]:
+    beschreibung, id_conf, xml_dict = layout_from_objects(read_page_objects(root, Seite))
     logger.debug('[UVR] Available Strings in xml auf Seite %s: %s', Seite, beschreibung)
     return beschreibung, id_conf, xml_dict
 
 
-def combine_html_xml(MyHTMLParserClass, beschreibung, id_conf, xml_dict, html: str) -> Dict[str, Any]:
-    def parse_html_bs(html_text: str):
-        soup = BeautifulSoup(html_text, 'html.parser')
-        ids = []
-        content = {}
-        html_dict = {}
-        for div in soup.find_all('div'):
-            pos = None
-            for attr_val in div.attrs.values():
-                if isinstance(attr_val, str) and 'pos' in attr_val:
-                    m = re.search(r'pos\s*(\d+)|pos(\d+)', attr_val)
-                    if m:
-                        pos = int(m.group(1) or m.group(2))
-                        break
-                elif isinstance(attr_val, (list, tuple)):
-                    for v in attr_val:
-                        if 'pos' in v:
-                            m = re.search(r'pos\s*(\d+)|pos(\d+)', v)
-                            if m:
-                                pos = int(m.group(1) or m.group(2))
-                                break
-                    if pos is not None:
-                        break
-            if pos is None:
-                id_attr = div.get('id')
-                if id_attr and 'pos' in id_attr:
-                    m = re.search(r'pos\s*(\d+)|pos(\d+)', id_attr)
-                    if m:
-                        pos = int(m.group(1) or m.group(2))
-            if pos is None:
-                continue
-            ids.append(pos)
-            raw = ''.join(str(c) for c in div.contents)
-            content[pos] = raw
-            text = div.get_text(separator=' ').strip()
-            value_part, unit = separate(text)
-            html_dict[pos] = {'value': value_part, 'unit': unit}
-        return ids, content, html_dict
-
-    id_res, content, html_dict = parse_html_bs(html)
-    logger.debug('[UVR] HTML-dict %s', pprint.pformat(html_dict))
-    logger.debug('[UVR] XML-dict %s', pprint.pformat(xml_dict))
+PARSER_BACKENDS = ('fast', 'bs4')
+DEFAULT_PARSER_BACKEND = 'fast'
+
+_DIV_RE = re.compile(r'<div\b([^>]*)>(.*?)</div\s*>', re.S | re.I)
+_NESTED_DIV_RE = re.compile(r'<div\b', re.I)
+_ATTR_VALUE_RE = re.compile(r"""[^\s=/>]+\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_POS_RE = re.compile(r'pos\s*(\d+)|pos(\d+)')
+_TAG_RE = re.compile(r'<[^>]*>')
+_BR_RE = re.compile(r'<br\s*/?>', re.I)
+
+
+def iter_pos_fragments(html_text: str) -> Iterator[Tuple[int, str, str, List[str]]]:
+    """Yield (pos, raw inner html, text, lines) for every ``<div>`` with a posN attribute.
+
+    One linear regex scan over the flat ``<div id="posN">`` list the CMI
+    serves. ``text`` and ``lines`` equal BeautifulSoup's ``get_text`` with a
+    space resp. newline separator. Raises ValueError on nested divs, which
+    this scanner cannot attribute; use the bs4 backend for such pages.
+    """
+    for m in _DIV_RE.finditer(html_text):
+        attrs, inner = m.group(1), m.group(2)
+        if _NESTED_DIV_RE.search(inner):
+            raise ValueError('nested <div> elements are not supported by the fast parser')
+        pos = None
+        for a in _ATTR_VALUE_RE.finditer(attrs):
+            attr_val = a.group(1) if a.group(1) is not None else (a.group(2) if a.group(2) is not None else a.group(3))
+            if 'pos' in attr_val:
+                pm = _POS_RE.search(attr_val)
+                if pm:
+                    pos = int(pm.group(1) or pm.group(2))
+                    break
+        if pos is None:
+            continue
+        if '<br' in inner:
+            # match BeautifulSoup's serialisation of void elements
+            inner = _BR_RE.sub('<br/>', inner)
+        segments = [unescape(t) if '&' in t else t for t in _TAG_RE.split(inner) if t]
+        text = ' '.join(segments).strip()
+        lines = '\n'.join(segments).replace('\r', '').strip().split('\n')
+        yield pos, inner, text, lines
+
+
+def parse_html_fast(html_text: str):
+    """Single-pass replacement for `parse_html_bs`; also returns the Modus lines per pos."""
+    ids = []
+    texts = []
+    content = {}
+    lines_by_pos = {}
+    for pos, raw, text, lines in iter_pos_fragments(html_text):
+        ids.append(pos)
+        texts.append(text)
+        content[pos] = raw
+        lines_by_pos[pos] = lines
+    values, units = decode_fragments(texts)
+    html_dict = {pos: {'value': value, 'unit': unit} for pos, value, unit in zip(ids, values, units)}
+    return ids, content, html_dict, lines_by_pos
+
+
+def parse_html_bs(html_text: str):
+    # only needed for the bs4 backend and its fallbacks; keeps bs4 out of startup
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_text, 'html.parser')
+    ids = []
+    texts = []
+    content = {}
+    lines_by_pos = {}
+    for div in soup.find_all('div'):
+        pos = None
+        for attr_val in div.attrs.values():
+            if isinstance(attr_val, str) and 'pos' in attr_val:
+                m = re.search(r'pos\s*(\d+)|pos(\d+)', attr_val)
+                if m:
+                    pos = int(m.group(1) or m.group(2))
+                    break
+            elif isinstance(attr_val, (list, tuple)):
+                for v in attr_val:
+                    if 'pos' in v:
+                        m = re.search(r'pos\s*(\d+)|pos(\d+)', v)
+                        if m:
+                            pos = int(m.group(1) or m.group(2))
+                            break
+                if pos is not None:
+                    break
+        if pos is None:
+            id_attr = div.get('id')
+            if id_attr and 'pos' in id_attr:
+                m = re.search(r'pos\s*(\d+)|pos(\d+)', id_attr)
+                if m:
+                    pos = int(m.group(1) or m.group(2))
+        if pos is None:
+            continue
+        ids.append(pos)
+        raw = ''.join(str(c) for c in div.contents)
+        content[pos] = raw
+        texts.append(div.get_text(separator=' ').strip())
+        lines_by_pos[pos] = div.get_text(separator='\n').replace('\r', '').strip().split('\n')
+    values, units = decode_fragments(texts)
+    html_dict = {pos: {'value': value, 'unit': unit} for pos, value, unit in zip(ids, values, units)}
+    return ids, content, html_dict, lines_by_pos
+
+
+def parse_html(html_text: str, backend: str = DEFAULT_PARSER_BACKEND):
+    """Return (ids, content, html_dict, lines_by_pos) using the selected backend.
+
+    ``lines_by_pos`` holds the text lines of every fragment, which Modus
+    entries are split into.
+    """
+    if backend == 'fast':
+        try:
+            return parse_html_fast(html_text)
+        except ValueError as e:
+            logger.debug('Fast HTML parser not applicable (%s); falling back to BeautifulSoup', e)
+    elif backend != 'bs4':
+        raise ValueError(f'Unknown parser backend {backend!r}; expected one of {PARSER_BACKENDS}')
+    return parse_html_bs(html_text)
+
+
+def _as_int(mode: float) -> Optional[int]:
+    try:
+        return int(mode)
+    except (ValueError, OverflowError):
+        return None
+
+
+def combine_html_xml(MyHTMLParserClass, beschreibung, id_conf, xml_dict, html: str,
+                     backend: str = DEFAULT_PARSER_BACKEND) -> Dict[str, Any]:
+    id_res, content, html_dict, lines_by_pos = parse_html(html, backend)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug('[UVR] HTML-dict %s', pprint.pformat(html_dict))
+        logger.debug('[UVR] XML-dict %s', pprint.pformat(xml_dict))
     if len(content) != len(id_conf):
         logger.error('[UVR] ERROR. Länge XML %d und HTML %d sind ungleich', len(id_conf), len(content))
 
+    # all Modus entries of the page are decoded in one batch, in xml_dict order
+    modus = [value for key, value in xml_dict.items() if 'Modus' in key and value in lines_by_pos]
+    modes, percents = decode_modes([lines_by_pos[value] for value in modus])
+    decoded = iter(zip(modes, percents))
+
     combined_dict: Dict[str, Any] = {}
     for key, value in xml_dict.items():
-        try:
-            html_entry = html_dict[value]
-            if 'Modus' in key:
-                entry_str = content[value]
-                entry_text = BeautifulSoup(entry_str, 'html.parser').get_text(separator='\n').replace('\r', '').strip()
-                parts = entry_text.split('\n')
-                mode = None
-                percent = None
-                if len(parts) >= 1:
-                    mode_part = parts[0].strip()
-                    if mode_part == 'AUTO':
-                        mode = 1.0
-                    elif mode_part == 'HAND':
-                        mode = 0.0
-                    else:
-                        try:
-                            mode = float(mode_part)
-                        except Exception:
-                            mode = None
-                if len(parts) >= 2:
-                    percent_part = parts[1].strip()
-                    percent_match = re.search(r'(\d+(?:[.,]\d+)?)', percent_part)
-                    if percent_match:
-                        percent_str = percent_match.group(1).replace(',', '.')
-                        percent = float(percent_str)
-                if len(parts) == 1:
-                    combined_part = parts[0].strip()
-                    combined_percent_match = re.search(r'(\d+(?:[.,]\d+)?)', combined_part)
-                    if combined_percent_match:
-                        pct = combined_percent_match.group(1).replace(',', '.')
-                        try:
-                            percent = float(pct)
-                        except Exception:
-                            percent = None
-                        mode_token = re.sub(r'(\d+(?:[.,]\d+)?\s*%?)', '', combined_part).strip()
-                        if mode_token == 'AUTO':
-                            mode = 1.0
-                        elif mode_token == 'HAND':
-                            mode = 0.0
-                        else:
-                            try:
-                                mode = float(mode_token)
-                            except Exception:
-                                mode = None
-                if mode is not None:
-                    try:
-                        mode_val = int(mode)
-                    except Exception:
-                        mode_val = None
-                    combined_dict[key + '_mode'] = {'value': mode_val, 'unit': 'OutputMode'}
-                if percent is not None:
-                    try:
-                        percent_val = float(percent)
-                    except Exception:
-                        percent_val = None
-                    combined_dict[key + '_percent'] = {'value': percent_val, 'unit': '%'}
-                if mode is None and percent is None:
-                    combined_dict[key] = html_entry
-            else:
-                combined_dict[key] = html_entry
-        except Exception:
-            logger.exception('[UVR] Error matching HTML and Item: %s, %s', key, value)
-
-    print('[DEBUG] Combined-dict:', pprint.pformat(combined_dict))
-    logger.debug('[UVR] Combined-dict %s', pprint.pformat(combined_dict))
-    return combined_dict.copy()
+        html_entry = html_dict.get(value)
+        if html_entry is None:
+            logger.error('[UVR] Error matching HTML and Item: %s, %s', key, value)
+            continue
+        if 'Modus' not in key:
+            combined_dict[key] = html_entry
+            continue
+        mode, percent = next(decoded)
+        if mode is not None:
+            combined_dict[key + '_mode'] = {'value': _as_int(mode), 'unit': 'OutputMode'}
+        if percent is not None:
+            combined_dict[key + '_percent'] = {'value': percent, 'unit': '%'}
+        if mode is None and percent is None:
+            combined_dict[key] = html_entry
+
+    if debug:
+        logger.debug('[UVR] Combined-dict %s', pprint.pformat(combined_dict))
+    return combined_dict
 
 
 def extract_entity_data(results: Dict[str, Dict[str, Any]], unit: Optional[str] = None) -> Dict[str, Any]:
@@ -239,4 +488,5 @@ def extract_entity_data(results: Dict[str, Dict[str, Any]], unit: Optional[str]
 
 
 def filter_empty_values(data: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, Dict[str, Any]]]:
-    return [{key: value for key, value in entry.items() if value['value'] is not None} for entry in data]
+    with STAGE_SECONDS.time(stage='filter'):
+        return [{key: value for key, value in entry.items() if value['value'] is not None} for entry in data]
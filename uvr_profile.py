@@ -0,0 +1,178 @@
+"""Profile the next N polling cycles of the running daemon on demand.
+
+Arm it with ``UVR_PROFILE=<N>`` at startup or by sending ``SIGUSR1`` to
+the process (profiles ``UVR_PROFILE_CYCLES`` cycles, default 3). Each
+profiled cycle is written to ``UVR_PROFILE_DIR`` (default ``profiles/``):
+
+* ``cprofile`` (default) — ``cycle-<N>.pstats`` of the main thread, load
+  with ``python -m pstats`` or snakeviz.
+* ``sample`` — ``cycle-<N>.collapsed``: stacks of *all* threads (fetch
+  and controller workers included) sampled every few milliseconds, one
+  ``frame;frame;... count`` line per stack, ready for flamegraph.pl or
+  speedscope.
+
+While not armed, `CycleProfiler.cycle` is a counter check and nothing else.
+"""
+import cProfile
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("UVR2MQTT")
+
+MODES = ('cprofile', 'sample')
+DEFAULT_DIRECTORY = 'profiles'
+DEFAULT_CYCLES = 3
+SAMPLE_INTERVAL = 0.005
+
+
+class _NoProfile:
+    def __enter__(self) -> '_NoProfile':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def discard(self) -> None:
+        pass
+
+
+_NO_PROFILE = _NoProfile()
+
+
+class _StackSampler:
+    """Count the stacks of all other threads every ``interval`` seconds."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='uvr-profile-sampler', daemon=True)
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class _ProfileSession:
+    def __init__(self, profiler: 'CycleProfiler', cycle: int):
+        self.profiler = profiler
+        self.cycle = cycle
+        self.discarded = False
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._started = 0.0
+
+    def __enter__(self) -> '_ProfileSession':
+        self._started = time.perf_counter()
+        if self.profiler.mode == 'sample':
+            self._sampler = _StackSampler()
+            self._sampler.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def discard(self) -> None:
+        """Drop this profile, e.g. because no page was due in this loop iteration."""
+        self.discarded = True
+
+    def __exit__(self, *exc) -> None:
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if not self.discarded:
+            self.profiler.done(self, time.perf_counter() - self._started)
+
+    def dump(self, directory: Path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        if self._profile is not None:
+            path = directory / f'cycle-{self.cycle:06d}.pstats'
+            self._profile.dump_stats(str(path))
+        else:
+            path = directory / f'cycle-{self.cycle:06d}.collapsed'
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in sorted(self._sampler.stacks.items()):
+                    f.write(f'{stack} {count}\n')
+        return path
+
+
+class CycleProfiler:
+    """Profiles the next ``remaining`` cycles; `request` arms it (thread- and signal-safe)."""
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, mode: str = 'cprofile', cycles: int = DEFAULT_CYCLES):
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiler mode {mode!r}; expected one of {MODES}')
+        self.directory = Path(directory)
+        self.mode = mode
+        self.cycles = cycles
+        self.remaining = 0
+        self.written = []
+
+    def request(self, cycles: Optional[int] = None) -> None:
+        self.remaining = self.cycles if cycles is None else int(cycles)
+
+    def cycle(self, number: int):
+        """Context manager around one cycle; profiles it if armed."""
+        if self.remaining <= 0:
+            return _NO_PROFILE
+        return _ProfileSession(self, number)
+
+    def done(self, session: _ProfileSession, seconds: float) -> None:
+        self.remaining -= 1
+        try:
+            path = session.dump(self.directory)
+        except OSError:
+            logger.warning('Could not write profile of cycle %s', session.cycle, exc_info=True)
+            return
+        self.written.append(path)
+        logger.info('Profiled cycle %s (%.3f s) -> %s; %d more to go', session.cycle, seconds, path,
+                    max(self.remaining, 0))
+
+    def install_signal_handler(self, signum: Optional[int] = getattr(signal, 'SIGUSR1', None)) -> bool:
+        """Arm on ``signum`` (SIGUSR1; not available on Windows)."""
+        if signum is None:
+            return False
+        try:
+            signal.signal(signum, lambda *_: self.request())
+        except (ValueError, OSError):
+            logger.debug('Could not install profiling signal handler')
+            return False
+        return True
+
+
+def profiler_from_config(uvr_cfg: Dict[str, Any]) -> CycleProfiler:
+    """Build the profiler from ``uvr.profile`` (see `load_configs`) and arm it if requested."""
+    cfg = uvr_cfg.get('profile') or {}
+    profiler = CycleProfiler(cfg.get('directory', DEFAULT_DIRECTORY), cfg.get('mode', 'cprofile'),
+                             int(cfg.get('signal_cycles', DEFAULT_CYCLES)))
+    if int(cfg.get('cycles', 0)):
+        profiler.request(int(cfg['cycles']))
+    return profiler
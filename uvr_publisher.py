@@ -0,0 +1,215 @@
+"""Flow-controlled MQTT publishing with acknowledgement tracking.
+
+`Publisher` wraps the paho client and is passed wherever a client is
+expected (`send_values`, `create_config`, availability, spool drain).
+Messages are classified by topic: ``.../config`` is ``discovery``,
+``.../availability`` is ``availability``, everything else is ``state``.
+Each class has its own QoS (``mqtt.qos``).
+
+Discovery and availability messages go to the client at once; they are
+bounded by the number of entities and must never be dropped. State
+messages wait in a queue and are handed to the client only while fewer
+than ``max_inflight`` messages are unsent or unacknowledged. A newer state
+for a queued topic replaces the older one in place (``superseded``), and
+beyond ``max_queued`` queued states the oldest is dropped (``overflow``),
+so a slow broker shows up as drops and pending messages instead of memory
+growth. Callables registered with `Publisher.watch_drops` are told about
+every state that was lost (overflow, refused by the client, or never
+acknowledged), so a delta filter can forget it was sent. The queue is pumped from paho's ``on_publish`` callback, which
+fires when a QoS 0 message was written to the socket or a QoS 1/2 message
+was acknowledged; that moment is also the end of the acknowledgement
+latency reported per cycle by `Publisher.cycle_report`.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from uvr_metrics import PUBLISH_ACK_SECONDS, PUBLISH_DROPS, PUBLISH_PENDING
+
+logger = logging.getLogger("UVR2MQTT")
+
+KINDS = ('discovery', 'state', 'availability')
+DEFAULT_QOS = {'discovery': 1, 'state': 0, 'availability': 1}
+DEFAULT_MAX_INFLIGHT = 20
+DEFAULT_MAX_QUEUED = 1000
+# in-flight messages older than this are given up (e.g. QoS 0 messages paho discarded on a disconnect)
+DEFAULT_ACK_TIMEOUT = 60.0
+
+
+def message_kind(topic: str) -> str:
+    if topic.endswith('/config'):
+        return 'discovery'
+    if topic.endswith('/availability'):
+        return 'availability'
+    return 'state'
+
+
+class Publisher:
+    """Client wrapper with per-class QoS, an in-flight window and a bounded state queue."""
+
+    def __init__(self, client: Any, qos: Optional[Dict[str, int]] = None, max_inflight: int = DEFAULT_MAX_INFLIGHT,
+                 max_queued: int = DEFAULT_MAX_QUEUED, ack_timeout: float = DEFAULT_ACK_TIMEOUT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.client = client
+        self.qos = {**DEFAULT_QOS, **{kind: int(level) for kind, level in (qos or {}).items()}}
+        self.max_inflight = max(int(max_inflight), 1)
+        self.max_queued = max(int(max_queued), 1)
+        self.ack_timeout = ack_timeout
+        self.clock = clock
+        # topic -> (payload, qos, retain), oldest first
+        self._queue: 'OrderedDict[str, Tuple[Any, int, bool]]' = OrderedDict()
+        # mid -> (handed over at, kind, topic)
+        self._inflight: Dict[int, Tuple[float, str, str]] = {}
+        # mids whose on_publish fired before client.publish() returned
+        self._early: Set[int] = set()
+        self._drop_watchers: List[Callable[[str], None]] = []
+        self._lock = threading.RLock()
+        self._idle = threading.Condition(self._lock)
+        self._cycle = self._new_cycle()
+        if hasattr(client, 'max_inflight_messages_set'):
+            client.max_inflight_messages_set(self.max_inflight)
+        client.on_publish = self._on_publish
+
+    @staticmethod
+    def _new_cycle() -> Dict[str, Any]:
+        return {'sent': 0, 'acked': 0, 'failed': 0, 'superseded': 0, 'overflow': 0, 'expired': 0,
+                'ack_total': 0.0, 'ack_max': 0.0}
+
+    def publish(self, topic: str, payload: Any = None, qos: Optional[int] = None, retain: bool = False) -> Any:
+        """Send or queue one message; returns paho's MQTTMessageInfo, or None for a queued state."""
+        kind = message_kind(topic)
+        if qos is None:
+            qos = self.qos[kind]
+        if kind != 'state':
+            return self._send(topic, payload, qos, retain, kind)
+        with self._lock:
+            if topic in self._queue:
+                self._drop('superseded')
+            self._queue[topic] = (payload, qos, retain)
+            if len(self._queue) > self.max_queued:
+                dropped, _message = self._queue.popitem(last=False)
+                self._drop('overflow', dropped)
+        self.pump()
+        return None
+
+    def send(self, topic: str, payload: Any = None, qos: Optional[int] = None, retain: bool = False) -> Any:
+        """Hand one message to the client now, past the state queue; returns paho's MQTTMessageInfo.
+
+        For messages that must be neither superseded nor dropped, e.g.
+        readings replayed from the spool.
+        """
+        kind = message_kind(topic)
+        return self._send(topic, payload, self.qos[kind] if qos is None else qos, retain, kind)
+
+    def watch_drops(self, watcher: Callable[[str], None]) -> None:
+        """Call ``watcher(topic)`` for every state message that will not be delivered."""
+        with self._lock:
+            if watcher not in self._drop_watchers:
+                self._drop_watchers.append(watcher)
+
+    def pump(self) -> None:
+        """Hand queued states to the client while the in-flight window has room."""
+        while True:
+            with self._lock:
+                if not self._queue:
+                    return
+                if len(self._inflight) >= self.max_inflight:
+                    self._expire()
+                    if len(self._inflight) >= self.max_inflight:
+                        return
+                topic, (payload, qos, retain) = self._queue.popitem(last=False)
+            self._send(topic, payload, qos, retain, 'state')
+
+    def _send(self, topic: str, payload: Any, qos: int, retain: bool, kind: str) -> Any:
+        started = self.clock()
+        info = self.client.publish(topic, payload, qos=qos, retain=retain)
+        mid = getattr(info, 'mid', None)
+        with self._lock:
+            self._cycle['sent'] += 1
+            if getattr(info, 'rc', 0):
+                if kind == 'state':
+                    self._drop('failed', topic)
+                else:
+                    self._cycle['failed'] += 1
+            elif mid is None or mid in self._early or info.is_published():
+                self._early.discard(mid)
+                self._acked(started, kind)
+            else:
+                self._inflight[mid] = (started, kind, topic)
+        return info
+
+    def _on_publish(self, client, userdata, mid, reason_code=None, properties=None) -> None:
+        with self._lock:
+            entry = self._inflight.pop(mid, None)
+            if entry is None:
+                if len(self._early) > self.max_inflight * 10:
+                    # mids of messages published around the publisher
+                    self._early.clear()
+                self._early.add(mid)
+                return
+            self._acked(entry[0], entry[1])
+        self.pump()
+
+    def _acked(self, started: float, kind: str) -> None:
+        seconds = max(self.clock() - started, 0.0)
+        PUBLISH_ACK_SECONDS.observe(seconds, kind=kind)
+        self._cycle['acked'] += 1
+        self._cycle['ack_total'] += seconds
+        self._cycle['ack_max'] = max(self._cycle['ack_max'], seconds)
+        if not self._queue and not self._inflight:
+            self._idle.notify_all()
+
+    def _expire(self) -> None:
+        cutoff = self.clock() - self.ack_timeout
+        for mid in [mid for mid, (started, _kind, _topic) in self._inflight.items() if started < cutoff]:
+            _started, kind, topic = self._inflight.pop(mid)
+            self._cycle['expired'] += 1
+            if kind == 'state':
+                self._lost(topic)
+
+    def _drop(self, reason: str, topic: Optional[str] = None) -> None:
+        self._cycle[reason] += 1
+        PUBLISH_DROPS.inc(reason=reason)
+        if topic is not None:
+            self._lost(topic)
+
+    def _lost(self, topic: str) -> None:
+        for watcher in self._drop_watchers:
+            try:
+                watcher(topic)
+            except Exception:
+                logger.exception("Drop watcher failed for %s", topic)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue) + len(self._inflight)
+
+    def flush(self, timeout: float) -> bool:
+        """Wait until nothing is queued or in flight; False on timeout."""
+        self.pump()
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._queue and not self._inflight, timeout)
+
+    def cycle_report(self) -> Dict[str, Any]:
+        """Counters since the last call, plus what is still queued and in flight."""
+        with self._lock:
+            cycle, self._cycle = self._cycle, self._new_cycle()
+            queued, inflight = len(self._queue), len(self._inflight)
+        PUBLISH_PENDING.set(queued + inflight)
+        ack_total, ack_max = cycle.pop('ack_total'), cycle.pop('ack_max')
+        cycle.update(queued=queued, inflight=inflight,
+                     ack_mean_ms=round(ack_total / cycle['acked'] * 1000, 1) if cycle['acked'] else None,
+                     ack_max_ms=round(ack_max * 1000, 1) if cycle['acked'] else None)
+        if cycle['overflow'] or queued > self.max_queued // 2:
+            logger.warning("MQTT backpressure: %d states queued, %d in flight, %d dropped this cycle",
+                           queued, inflight, cycle['overflow'])
+        return cycle
+
+
+def publisher_from_config(client: Any, mqtt_cfg: Dict[str, Any]) -> Publisher:
+    """Wrap ``client`` with the ``mqtt.qos``/``max_inflight``/``max_queued`` settings (see `load_configs`)."""
+    return Publisher(client, qos=mqtt_cfg.get('qos'),
+                     max_inflight=int(mqtt_cfg.get('max_inflight', DEFAULT_MAX_INFLIGHT)),
+                     max_queued=int(mqtt_cfg.get('max_queued', DEFAULT_MAX_QUEUED)))
@@ -0,0 +1,174 @@
+"""Replay recorded CMI pages through parse, combine and publish without a CMI.
+
+Records come from a capture archive (`uvr_capture`, ``capture-*.jsonl.gz``)
+or from ``debug_fetched_html_seite<N>.html`` files such as the ones in
+`debug_html/`. Each page is combined with the compiled layout of the
+configured TA-Designer XML, filtered and published with `send_values`, and
+the time spent in every stage is recorded.
+
+By default pages are replayed as fast as possible; ``speed`` N replays them
+N times faster than they were recorded (pages without a timestamp count as
+one poll interval apart). Publishing goes to a counting null client unless
+a real MQTT client is passed in.
+
+Usage:
+    python send_uvr_mqtt.py --replay debug_html --loops 100
+    python send_uvr_mqtt.py --replay captures --speed 60
+"""
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from uvr import combine_page, filter_empty_values, load_layout
+from uvr_capture import read_archive
+from uvr_layout import PageLayout
+from uvr_mqtt import DeviceState, StateDeltaFilter, delta_filter_from_config, device_state_from_config, send_values
+from uvr_parse import DEFAULT_PARSER_BACKEND
+
+logger = logging.getLogger("UVR2MQTT")
+
+STAGES = ('combine', 'filter', 'publish')
+_DEBUG_HTML_RE = re.compile(r'seite(\d+)\.html$')
+
+
+class NullClient:
+    """MQTT client stand-in that only counts publishes."""
+
+    def __init__(self):
+        self.count = 0
+
+    def publish(self, topic, payload, retain=False):
+        self.count += 1
+
+
+def load_records(path: str, interval: float = 60.0) -> List[Dict[str, Any]]:
+    """Records (``time``, ``ip``, ``Seite``, ``html``) from a capture archive or debug_html files.
+
+    debug_html pages carry no timestamp; the ones of one directory are treated
+    as a single poll at time 0 (``interval`` is used between replay loops).
+    """
+    path = Path(path)
+    if path.is_dir() and any(path.glob('capture-*.jsonl.gz')):
+        records = [r for r in read_archive(str(path)) if r.get('html')]
+    else:
+        files = sorted(path.glob('*.html')) if path.is_dir() else [path]
+        records = []
+        for file in files:
+            m = _DEBUG_HTML_RE.search(file.name)
+            if m is None:
+                logger.warning("Skipping %s: no page number in the file name", file)
+                continue
+            records.append({'time': None, 'ip': 'replay', 'Seite': int(m.group(1)), 'reason': 'debug_html',
+                            'html': file.read_text(encoding='utf-8')})
+    if not records:
+        raise ValueError(f"No recorded pages found in {path}")
+    return records
+
+
+class StageTimer:
+    """Per-stage latencies in seconds."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.samples[stage].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            out[stage] = {
+                'count': len(ordered),
+                'mean_ms': sum(ordered) / len(ordered) * 1000,
+                'p50_ms': ordered[len(ordered) // 2] * 1000,
+                'p95_ms': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+                'max_ms': ordered[-1] * 1000,
+            }
+        return out
+
+
+def _schedule(records: List[Dict[str, Any]], loops: int, interval: float):
+    """Yield (offset seconds, record) for ``loops`` passes over ``records``."""
+    times = [r.get('time') for r in records]
+    t0 = min((t for t in times if t is not None), default=0.0)
+    offsets = [(t - t0) if t is not None else 0.0 for t in times]
+    span = max(offsets) + interval
+    for loop in range(loops):
+        for offset, record in zip(offsets, records):
+            yield loop * span + offset, record
+
+
+def replay(records: List[Dict[str, Any]], layout: List[PageLayout], device_name: str = 'UVR', client=None,
+           delta: Optional[StateDeltaFilter] = None, document: Optional[DeviceState] = None, speed: float = 0.0,
+           loops: int = 1, interval: float = 60.0, backend: str = DEFAULT_PARSER_BACKEND,
+           sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.perf_counter) -> Dict[str, Any]:
+    """Run ``records`` through the pipeline and return throughput and per-stage latency."""
+    client = client if client is not None else NullClient()
+    timer = StageTimer()
+    pages = skipped = 0
+    started = clock()
+    for offset, record in _schedule(records, max(int(loops), 1), interval):
+        if speed > 0:
+            wait = started + offset / speed - clock()
+            if wait > 0:
+                sleep(wait)
+        Seite = record['Seite']
+        if not 0 <= Seite < len(layout):
+            skipped += 1
+            continue
+        t = clock()
+        page = combine_page(layout[Seite], record['html'], backend=backend)
+        timer.add('combine', clock() - t)
+        if page is None:
+            skipped += 1
+            continue
+        t = clock()
+        values = filter_empty_values([page])
+        timer.add('filter', clock() - t)
+        t = clock()
+        send_values(client, device_name, values, delta=delta, document=document)
+        timer.add('publish', clock() - t)
+        pages += 1
+    seconds = clock() - started
+    report = {
+        'pages': pages,
+        'skipped': skipped,
+        'seconds': seconds,
+        'pages_per_s': pages / seconds if seconds > 0 else 0.0,
+        'stages': timer.summary(),
+    }
+    if isinstance(client, NullClient):
+        report['publishes'] = client.count
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{report['pages']} pages ({report['skipped']} skipped) in {report['seconds']:.2f} s"
+             f" = {report['pages_per_s']:.1f} pages/s"]
+    if 'publishes' in report:
+        lines[0] += f", {report['publishes']} publishes"
+    for stage, s in report['stages'].items():
+        lines.append(f"  {stage:8s} mean {s['mean_ms']:8.3f} ms  p50 {s['p50_ms']:8.3f} ms"
+                     f"  p95 {s['p95_ms']:8.3f} ms  max {s['max_ms']:8.3f} ms")
+    return '\n'.join(lines)
+
+
+def run(path: str, uvr_cfg: Dict[str, Any], mqtt_cfg: Dict[str, Any], device_name: str, speed: float = 0.0,
+        loops: int = 1, client=None) -> Dict[str, Any]:
+    """Replay ``path`` with the layout and publish settings of the given config sections."""
+    layout = load_layout(uvr_cfg['xml_filename'], cache_path=uvr_cfg.get('layout_cache'))
+    interval = float(uvr_cfg.get('poll_interval', 60))
+    records = load_records(path, interval=interval)
+    logger.info("Replaying %d recorded pages from %s (%s)", len(records), path,
+                f"{speed:g}x" if speed > 0 else "as fast as possible")
+    report = replay(records, layout, device_name, client=client, delta=delta_filter_from_config(mqtt_cfg),
+                    document=device_state_from_config(mqtt_cfg, device_name),
+                    speed=speed, loops=loops, interval=interval,
+                    backend=uvr_cfg.get('parser_backend') or DEFAULT_PARSER_BACKEND)
+    logger.info("Replay finished:\n%s", format_report(report))
+    return report
@@ -0,0 +1,104 @@
+"""Per-page polling intervals for the CMI schematic pages.
+
+Instead of polling every page every 60 s, each `Seite` gets its own
+interval. Pages with a configured interval keep it; all others start at the
+default interval and adapt: when a poll finds changed values the interval
+shrinks (down to ``min_interval``), when nothing changed it backs off (up to
+``max_interval``). ``min_interval`` defaults to the start interval, so
+adaptation only ever lowers the CMI load unless a smaller floor is
+configured. With a `uvr_mqtt.StateDeltaFilter`, values that moved within
+their deadband do not count as changed.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60.0
+DEFAULT_MAX_INTERVAL = 300.0
+TIGHTEN_FACTOR = 0.5
+BACKOFF_FACTOR = 1.5
+
+
+class PageScheduler:
+    def __init__(self, pages: int, interval: float = DEFAULT_INTERVAL, min_interval: Optional[float] = None,
+                 max_interval: float = DEFAULT_MAX_INTERVAL, fixed: Optional[Dict[int, float]] = None,
+                 adaptive: bool = True, delta: Any = None, clock=time.monotonic):
+        self.min_interval = float(interval if min_interval is None else min_interval)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.adaptive = adaptive
+        # StateDeltaFilter whose deadbands decide what counts as a change; None compares exactly
+        self.delta = delta
+        self.clock = clock
+        self.fixed = {int(Seite): float(v) for Seite, v in (fixed or {}).items()}
+        start = min(max(float(interval), self.min_interval), self.max_interval) if adaptive else float(interval)
+        self.intervals: Dict[int, float] = {Seite: self.fixed.get(Seite, start) for Seite in range(pages)}
+        now = clock()
+        # every page is due right away on the first poll
+        self.next_poll: Dict[int, float] = {Seite: now for Seite in range(pages)}
+        self._last_values: Dict[int, Dict[str, Any]] = {}
+        self.changes: Dict[int, int] = {Seite: 0 for Seite in range(pages)}
+        self.polls: Dict[int, int] = {Seite: 0 for Seite in range(pages)}
+
+    @classmethod
+    def from_config(cls, uvr_cfg: Dict[str, Any], pages: int, **kwargs) -> 'PageScheduler':
+        """Build a scheduler from the ``uvr`` config section (see `load_configs`)."""
+        return cls(
+            pages,
+            interval=uvr_cfg.get('poll_interval', DEFAULT_INTERVAL),
+            min_interval=uvr_cfg.get('min_interval'),
+            max_interval=uvr_cfg.get('max_interval', DEFAULT_MAX_INTERVAL),
+            fixed=uvr_cfg.get('page_intervals'),
+            adaptive=uvr_cfg.get('adaptive_polling', True),
+            **kwargs,
+        )
+
+    def due(self, now: Optional[float] = None) -> List[int]:
+        """Pages whose next poll time has been reached."""
+        now = self.clock() if now is None else now
+        return [Seite for Seite, t in self.next_poll.items() if t <= now]
+
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        now = self.clock() if now is None else now
+        if not self.next_poll:
+            return self.max_interval
+        return max(0.0, min(self.next_poll.values()) - now)
+
+    def record(self, Seite: int, values: Optional[Dict[str, Any]], now: Optional[float] = None) -> None:
+        """Register the result of polling ``Seite`` and schedule its next poll.
+
+        ``values`` is the combined dict of the page, or None if it could not
+        be read (the interval is then left unchanged).
+        """
+        now = self.clock() if now is None else now
+        interval = self.intervals[Seite]
+        if values is not None:
+            self.polls[Seite] += 1
+            snapshot = {name: (data.get('value'), data.get('unit')) for name, data in values.items()}
+            previous = self._last_values.get(Seite)
+            if previous is not None:
+                changed = self._changed(previous, snapshot)
+                if changed:
+                    # compare against the last change, so a slow drift still crosses the deadband
+                    self._last_values[Seite] = snapshot
+                    self.changes[Seite] += 1
+                if self.adaptive and Seite not in self.fixed:
+                    factor = TIGHTEN_FACTOR if changed else BACKOFF_FACTOR
+                    interval = min(max(interval * factor, self.min_interval), self.max_interval)
+                    if interval != self.intervals[Seite]:
+                        logger.debug('Seite %s interval %.0f s -> %.0f s (%s)', Seite, self.intervals[Seite],
+                                     interval, 'changed' if changed else 'static')
+                    self.intervals[Seite] = interval
+            else:
+                self._last_values[Seite] = snapshot
+        self.next_poll[Seite] = now + interval
+
+    def _changed(self, previous: Dict[str, Any], snapshot: Dict[str, Any]) -> bool:
+        if self.delta is None or previous.keys() != snapshot.keys():
+            return snapshot != previous
+        return any(self.delta.differs(value, previous[name][0], unit) for name, (value, unit) in snapshot.items())
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        return {Seite: {'interval': self.intervals[Seite], 'polls': self.polls[Seite], 'changes': self.changes[Seite]}
+                for Seite in self.intervals}
@@ -0,0 +1,197 @@
+"""Simulated C.M.I. serving ``/schematic_files/<N>.cgi`` over HTTP.
+
+Pages come either from a `SyntheticSchema` (fresh random values on every
+request, optionally shaped after a real TA-Designer XML) or from recorded
+pages (capture archive or debug_html files, see `uvr_replay.load_records`),
+which are served round-robin per page. Requests need the configured basic
+auth credentials, like on a real CMI.
+
+Faults for load and latency tests:
+
+* ``latency`` / ``jitter`` — response delay in seconds (uniform +-jitter).
+* ``error_rate`` — share of requests answered with HTTP 500.
+* ``timeout_rate`` — share of requests that hang for ``hang`` seconds and
+  are then dropped without a response.
+
+Each `Simulator` is one controller on its own port; start several for
+multi-controller setups (see `scripts/cmi_simulator.py`).
+"""
+import base64
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from uvr_synthetic import SyntheticSchema
+
+logger = logging.getLogger(__name__)
+
+_PAGE_RE = re.compile(r'^/schematic_files/(\d+)\.cgi$')
+
+
+class SyntheticPages:
+    """New random values for every request."""
+
+    def __init__(self, schema: SyntheticSchema, seed: Optional[int] = None):
+        self.schema = schema
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.schema.pages)
+
+    def html(self, Seite: int) -> str:
+        with self._lock:
+            rng = random.Random(self._rng.random())
+        return self.schema.html(Seite, rng)
+
+
+class RecordedPages:
+    """Recorded pages, cycling through the recordings of each page."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.pages: Dict[int, List[str]] = {}
+        for record in records:
+            self.pages.setdefault(record['Seite'], []).append(record['html'])
+        self._next: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return max(self.pages) + 1 if self.pages else 0
+
+    def html(self, Seite: int) -> Optional[str]:
+        recordings = self.pages.get(Seite)
+        if not recordings:
+            return None
+        with self._lock:
+            i = self._next.get(Seite, 0)
+            self._next[Seite] = (i + 1) % len(recordings)
+        return recordings[i]
+
+
+class SimulatedCMI:
+    """Pages, credentials and fault settings of one simulated controller."""
+
+    def __init__(self, pages, user: str = 'user', password: str = '', latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, timeout_rate: float = 0.0, hang: float = 30.0, seed: Optional[int] = None):
+        self.pages = pages
+        self.user = user
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'ok': 0, 'errors': 0, 'timeouts': 0, 'unauthorized': 0, 'not_found': 0}
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def authorized(self, header: Optional[str]) -> bool:
+        expected = base64.b64encode(f'{self.user}:{self.password}'.encode('utf-8')).decode('ascii')
+        return header == f'Basic {expected}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'CMI-Simulator'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        cmi: SimulatedCMI = self.server.cmi
+        cmi.count('requests')
+        if not cmi.authorized(self.headers.get('Authorization')):
+            cmi.count('unauthorized')
+            self._reply(401, b'', {'WWW-Authenticate': 'Basic realm="CMI"'})
+            return
+        m = _PAGE_RE.match(self.path)
+        html = cmi.pages.html(int(m.group(1)) - 1) if m and int(m.group(1)) >= 1 else None
+        if html is None:
+            cmi.count('not_found')
+            self._reply(404, b'')
+            return
+        delay = cmi.delay()
+        if delay:
+            time.sleep(delay)
+        roll = cmi.roll()
+        if roll < cmi.timeout_rate:
+            cmi.count('timeouts')
+            time.sleep(cmi.hang)
+            self.close_connection = True
+            return
+        if roll < cmi.timeout_rate + cmi.error_rate:
+            cmi.count('errors')
+            self._reply(500, b'Internal Server Error')
+            return
+        cmi.count('ok')
+        # the CMI sends no charset, so requests decodes the body as ISO-8859-1 (hence "Â°C")
+        try:
+            body = html.encode('latin-1')
+        except UnicodeEncodeError:
+            body = html.encode('utf-8')
+        self._reply(200, body, {'Content-Type': 'text/html'})
+
+    def _reply(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug('%s %s', self.address_string(), format % args)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cmi: SimulatedCMI):
+        super().__init__(address, _Handler)
+        self.cmi = cmi
+
+
+class Simulator:
+    """Serve one `SimulatedCMI` on ``host:port`` (0 picks a free port) from a background thread."""
+
+    def __init__(self, cmi: SimulatedCMI, host: str = '127.0.0.1', port: int = 0):
+        self.cmi = cmi
+        self.server = _Server((host, port), cmi)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        """``host:port`` as used for ``uvr.ip``."""
+        host, port = self.server.server_address[:2]
+        return f'{host}:{port}'
+
+    def start(self) -> 'Simulator':
+        self._thread = threading.Thread(target=self.server.serve_forever, name=f'cmi-sim-{self.address}',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'Simulator':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
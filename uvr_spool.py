@@ -0,0 +1,388 @@
+"""Store-and-forward queue for MQTT messages while the broker is unreachable.
+
+During an outage the polling loop keeps reading the CMI and publishes into a
+`SpoolClient` instead of the MQTT client. Every message is appended as one
+JSON line (``time``, ``topic``, ``payload``, ``retain``) to segment files
+``spool-<seq>.jsonl`` in the spool directory, so a restart does not lose the
+backlog. The spool never holds more than ``max_bytes`` on disk: when it is
+full the oldest segment is deleted and its unsent messages are counted as
+``dropped``. Nothing but the segment sizes, message counts and the read
+position is kept in memory; the sizes are tracked as messages are written,
+so appending never lists the directory. Appends are buffered and flushed
+before a batch is read or the spool is closed.
+
+Once the broker is back, `Spool.drain_batch` sends the oldest ``batch_size``
+messages; the polling loop calls it once per iteration, ``batch_size /
+rate`` seconds apart, and keeps polling in between. A message is removed
+only once the client reports it written (QoS 0) or acknowledged (QoS 1/2).
+The polling loop does not wait for that: messages still in flight are
+remembered and checked by the next call, which sends nothing new until
+they are confirmed, and sends them again only if the client reports them
+lost. The read position within the oldest segment is kept in
+``cursor.json`` so nothing is sent twice after a restart, apart from
+messages that were in flight. With ``aggregate``, `Spool.compact` first reduces the backlog to
+the newest payload per topic, i.e. one snapshot of every entity instead of
+the whole outage.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("UVR2MQTT")
+
+DEFAULT_DIRECTORY = 'spool'
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_SEGMENTS = 8
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_RATE = 50.0
+# how long `Spool.drain` waits for the client to write/acknowledge a batch
+DEFAULT_ACK_TIMEOUT = 5.0
+CURSOR_FILE = 'cursor.json'
+
+_SEGMENT_RE = re.compile(r'^spool-(\d+)\.jsonl$')
+
+Publish = Callable[..., Any]
+
+
+def _accepted(info: Any) -> bool:
+    """True unless paho refused the message (fake clients in tests return None)."""
+    return getattr(info, 'rc', 0) == 0
+
+
+def _delivered(infos: List[Any], timeout: float) -> Tuple[int, bool]:
+    """Length of the prefix of ``infos`` written or acknowledged within ``timeout`` seconds,
+    and whether the message after it failed (True) or is still in flight (False)."""
+    deadline = time.monotonic() + timeout
+    for done, info in enumerate(infos):
+        if not _accepted(info):
+            return done, True
+        if not hasattr(info, 'is_published'):
+            continue
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                info.wait_for_publish(remaining)
+            published = info.is_published()
+        except (RuntimeError, ValueError):
+            return done, True
+        # a QoS 0 message lost on a disconnect is marked published with an error code
+        if not _accepted(info):
+            return done, True
+        if not published:
+            return done, False
+    return len(infos), False
+
+
+class Spool:
+    """Bounded on-disk FIFO of MQTT messages (see module docstring)."""
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, max_bytes: int = DEFAULT_MAX_BYTES,
+                 segments: int = DEFAULT_SEGMENTS, clock: Callable[[], float] = time.time):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_bytes)
+        self.segment_bytes = max(self.max_bytes // max(int(segments), 1), 1)
+        self.clock = clock
+        self.dropped = 0
+        self.drained = 0
+        # sent by `drain_batch` but not yet written/acknowledged: (message, segment, end offset), info
+        self._unconfirmed: List[Tuple[Tuple[Optional[Dict[str, Any]], Path, int], Any]] = []
+        self._file = None
+        self._current: Optional[Path] = None
+        # unsent messages and bytes per segment, oldest first
+        self._counts: Dict[Path, int] = {}
+        self._sizes: Dict[Path, int] = {}
+        self._bytes = 0
+        self._next_seq = 0
+        # read position: byte offset into the segment of that name (always the oldest one)
+        self._cursor: Tuple[str, int] = ('', 0)
+        self._lock = threading.Lock()
+        existing = self.segments()
+        self._load_cursor(existing)
+        for path in existing:
+            self._counts[path] = sum(1 for _line in self._lines(path, self._start(path)))
+            self._sizes[path] = path.stat().st_size
+            self._bytes += self._sizes[path]
+        if existing:
+            self._next_seq = int(_SEGMENT_RE.match(existing[-1].name).group(1)) + 1
+        if len(self):
+            logger.info('Spool %s holds %d messages from an earlier run', self.directory, len(self))
+
+    def __len__(self) -> int:
+        return sum(self._counts.values())
+
+    def segments(self) -> List[Path]:
+        """Segment files, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        found = [(int(m.group(1)), p) for p in self.directory.iterdir() if (m := _SEGMENT_RE.match(p.name))]
+        return [p for _seq, p in sorted(found)]
+
+    def append(self, topic: str, payload: Any, retain: bool = False) -> None:
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8', 'replace')
+        line = json.dumps({'time': self.clock(), 'topic': topic, 'payload': payload, 'retain': bool(retain)},
+                          ensure_ascii=False).encode('utf-8') + b'\n'
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(line)
+            path = self._current
+            self._counts[path] += 1
+            self._sizes[path] += len(line)
+            self._bytes += len(line)
+            rolled = self._sizes[path] >= self.segment_bytes
+            if rolled:
+                self._close_segment()
+            if rolled or self._bytes > self.max_bytes:
+                self._prune()
+
+    def _open_segment(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'spool-{self._next_seq:06d}.jsonl'
+        self._next_seq += 1
+        self._file = open(path, 'ab')
+        self._current = path
+        self._counts[path] = 0
+        self._sizes[path] = 0
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remove(self, path: Path) -> None:
+        if self._file is not None and self._current == path:
+            self._close_segment()
+        self._counts.pop(path, None)
+        self._bytes -= self._sizes.pop(path, 0)
+        path.unlink(missing_ok=True)
+        if self._cursor[0] == path.name:
+            self._set_cursor('', 0)
+
+    def _prune(self) -> None:
+        segments = list(self._sizes)
+        current = self._current if self._file is not None else None
+        while len(segments) > 1 and self._bytes > self.max_bytes and segments[0] != current:
+            path = segments.pop(0)
+            lost = self._counts.get(path, 0)
+            self.dropped += lost
+            self._remove(path)
+            logger.warning('Spool full; dropped %d oldest messages (%s)', lost, path.name)
+
+    def _load_cursor(self, segments: List[Path]) -> None:
+        try:
+            with open(self.directory / CURSOR_FILE, 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+            name, offset = str(cursor['segment']), int(cursor['offset'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        # only meaningful while its segment is still the oldest one
+        if segments and segments[0].name == name:
+            self._cursor = (name, offset)
+
+    def _set_cursor(self, name: str, offset: int) -> None:
+        self._cursor = (name, offset)
+        path = self.directory / CURSOR_FILE
+        try:
+            if not name:
+                path.unlink(missing_ok=True)
+                return
+            tmp = path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'segment': name, 'offset': offset}, f)
+            os.replace(tmp, path)
+        except OSError:
+            logger.warning('Could not write spool cursor %s', path, exc_info=True)
+
+    def _start(self, path: Path) -> int:
+        return self._cursor[1] if self._cursor[0] == path.name else 0
+
+    def _lines(self, path: Path, start: int) -> Iterator[Tuple[bytes, int]]:
+        """Complete lines of ``path`` from byte ``start`` on, with the offset after each."""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                pos = start
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # still being written, or cut short by a crash
+                        return
+                    pos += len(line)
+                    yield line, pos
+        except FileNotFoundError:
+            return
+
+    def _read(self, limit: int) -> List[Tuple[Optional[Dict[str, Any]], Path, int]]:
+        """The oldest ``limit`` unsent messages as (message or None if unreadable, segment, end offset)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            segments = [(path, self._start(path)) for path in self._sizes]
+        batch: List[Tuple[Optional[Dict[str, Any]], Path, int]] = []
+        for path, start in segments:
+            for line, pos in self._lines(path, start):
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logger.debug('Skipping broken spool line in %s', path.name)
+                    message = None
+                batch.append((message, path, pos))
+                if len(batch) >= limit:
+                    return batch
+        return batch
+
+    def _commit(self, done: List[Tuple[Optional[Dict[str, Any]], Path, int]]) -> None:
+        """Remove the messages in ``done`` (a prefix of the oldest ones) from the spool."""
+        with self._lock:
+            for _message, path, _pos in done:
+                if path in self._counts:
+                    self._counts[path] -= 1
+            _message, last, pos = done[-1]
+            if last not in self._sizes:
+                # pruned meanwhile, together with every older segment
+                return
+            for path in list(self._sizes):
+                if path == last:
+                    break
+                self._remove(path)
+            # no append can happen meanwhile, so a fully read segment is done even if it is still open
+            if pos >= self._sizes[last]:
+                self._remove(last)
+            else:
+                self._set_cursor(last.name, pos)
+
+    def drain_batch(self, publish: Publish, batch_size: int = DEFAULT_BATCH_SIZE,
+                    ack_timeout: float = 0.0) -> int:
+        """Send the oldest ``batch_size`` messages through ``publish``; returns how many were delivered.
+
+        Stops at the first message the client refuses. Only the prefix the
+        client wrote or acknowledged within ``ack_timeout`` is removed. The
+        messages after it stay in flight: the next call confirms them before
+        it sends anything new, and sends them again if the client lost them.
+        """
+        sent = 0
+        if self._unconfirmed:
+            sent = self._confirm(self._unconfirmed, ack_timeout)
+            if self._unconfirmed:
+                return sent
+        batch = self._read(batch_size)
+        if not batch:
+            return sent
+        infos = []
+        for message, _path, _pos in batch:
+            if message is None:
+                infos.append(None)
+                continue
+            info = publish(message['topic'], message['payload'], retain=message['retain'])
+            infos.append(info)
+            if not _accepted(info):
+                break
+        return sent + self._confirm(list(zip(batch, infos)), ack_timeout)
+
+    def _confirm(self, sent: List[Tuple[Tuple[Optional[Dict[str, Any]], Path, int], Any]],
+                 ack_timeout: float) -> int:
+        """Remove the delivered prefix of ``sent`` and remember the rest while it is in flight."""
+        done, failed = _delivered([info for _entry, info in sent], ack_timeout)
+        # after a failure the rest is read and sent again
+        self._unconfirmed = [] if failed else sent[done:]
+        if not done:
+            return 0
+        self._commit([entry for entry, _info in sent[:done]])
+        delivered = sum(1 for (message, _path, _pos), _info in sent[:done] if message is not None)
+        self.drained += delivered
+        if not len(self):
+            logger.info('Spool drained (%d messages sent, %d dropped)', self.drained, self.dropped)
+        return delivered
+
+    def compact(self) -> int:
+        """Keep only the newest message per topic; returns how many messages were discarded."""
+        with self._lock:
+            self._close_segment()
+            segments = list(self._sizes)
+            if not segments:
+                return 0
+            # their offsets point into the segments about to be replaced; resent if still wanted
+            self._unconfirmed = []
+            # newest payload per topic; bounded by the number of entities
+            latest: Dict[str, bytes] = {}
+            total = 0
+            for path in segments:
+                for line, _pos in self._lines(path, self._start(path)):
+                    try:
+                        topic = json.loads(line)['topic']
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    total += 1
+                    latest.pop(topic, None)
+                    latest[topic] = line
+            self._open_segment()
+            self._file.writelines(latest.values())
+            self._counts[self._current] = len(latest)
+            self._sizes[self._current] = size = sum(len(line) for line in latest.values())
+            self._bytes += size
+            self._close_segment()
+            for path in segments:
+                self._remove(path)
+        logger.info('Spool compacted to the newest of %d messages per topic: %d left', total, len(latest))
+        return total - len(latest)
+
+    def drain(self, publish: Publish, batch_size: int = DEFAULT_BATCH_SIZE, rate: float = DEFAULT_RATE,
+              aggregate: bool = False, wait: Callable[[float], Any] = time.sleep,
+              ack_timeout: float = DEFAULT_ACK_TIMEOUT) -> int:
+        """Send the whole backlog, one `drain_batch` every ``batch_size / rate`` seconds.
+
+        Unlike the polling loop this waits up to ``ack_timeout`` for each
+        batch. Stops early, keeping the rest, when a batch delivers nothing or
+        ``wait`` returns true (e.g. ``stop_event.wait``).
+        """
+        if aggregate:
+            self.compact()
+        pacing = batch_size / rate if rate > 0 else 0.0
+        sent = 0
+        while len(self):
+            before = len(self)
+            sent += self.drain_batch(publish, batch_size, ack_timeout)
+            if not len(self) or len(self) == before or wait(pacing):
+                break
+        return sent
+
+    def stats(self) -> Dict[str, int]:
+        return {'pending': len(self), 'dropped': self.dropped, 'drained': self.drained,
+                'bytes': self._bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_segment()
+
+
+class SpoolClient:
+    """Stands in for the MQTT client during an outage: every publish goes to the spool."""
+
+    def __init__(self, spool: Spool):
+        self.spool = spool
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> None:
+        self.spool.append(topic, payload, retain=retain)
+
+    def is_connected(self) -> bool:
+        return False
+
+
+def spool_from_config(mqtt_cfg: Dict[str, Any]) -> Optional[Spool]:
+    """Build the spool from ``mqtt.spool`` (see `load_configs`); None when the directory is empty."""
+    cfg = mqtt_cfg.get('spool') or {}
+    if not cfg.get('directory'):
+        return None
+    return Spool(cfg['directory'], int(float(cfg.get('max_mb', 20)) * 1024 * 1024))
+
+
+def drain_options(mqtt_cfg: Dict[str, Any]) -> Dict[str, Any]:
+    cfg = mqtt_cfg.get('spool') or {}
+    return {'batch_size': int(cfg.get('batch_size', DEFAULT_BATCH_SIZE)),
+            'rate': float(cfg.get('rate', DEFAULT_RATE)),
+            'aggregate': bool(cfg.get('aggregate', False))}
@@ -0,0 +1,61 @@
+"""Time-to-first-publish breakdown for ``send_uvr_mqtt.py --startup-report``.
+
+`StartupReport.mark` closes the current phase; the first phase starts when
+the process was created (read from ``/proc`` on Linux, otherwise when this
+module was imported), so interpreter start-up and imports are included.
+"""
+import logging
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger("UVR2MQTT")
+
+IMPORTED = time.time()
+
+
+def process_started() -> Optional[float]:
+    """Wall-clock time the current process was created, or None where ``/proc`` is missing."""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            # the command name may contain spaces; the fields after it do not
+            fields = f.read().rsplit(b')', 1)[1].split()
+        with open('/proc/uptime', 'rb') as f:
+            uptime = float(f.read().split()[0])
+        ticks = os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+    # field 22 of stat (starttime, in clock ticks since boot) is the 20th after the command name
+    return time.time() - uptime + int(fields[19]) / ticks
+
+
+class StartupReport:
+    """Consecutive startup phases and their durations in seconds."""
+
+    def __init__(self, started: Optional[float] = None, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        if started is None:
+            started = process_started() or IMPORTED
+        self.started = started
+        self.phases: List[Tuple[str, float]] = []
+        self._last = started
+
+    def mark(self, phase: str) -> float:
+        """End ``phase`` now; returns its duration."""
+        now = self.clock()
+        seconds = max(now - self._last, 0.0)
+        self.phases.append((phase, seconds))
+        self._last = now
+        return seconds
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+    def format(self) -> str:
+        width = max([len(name) for name, _ in self.phases] + [len('time to first publish')])
+        lines = ['Startup report:']
+        for name, seconds in self.phases:
+            lines.append(f'  {name:<{width}}  {seconds * 1000:9.1f} ms')
+        lines.append(f'  {"time to first publish":<{width}}  {self.total * 1000:9.1f} ms')
+        return '\n'.join(lines)
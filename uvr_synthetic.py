@@ -0,0 +1,115 @@
+"""Synthetic TA-Designer XML and CMI schematic pages.
+
+Used by the benchmarks (and anything else that needs production-shaped
+input without a real C.M.I.). Pages follow the layout of the captures in
+`debug_html/`: a flat list of ``<div id="posN" >`` blocks, some wrapped in
+``loadChanger`` anchors, with German decimal commas and the CMI's ``Â°C``.
+"""
+import random
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, Optional, Sequence
+from xml.sax.saxutils import quoteattr
+
+from uvr_parse import read_page_objects
+
+# object kind -> generator for the text the CMI shows for it
+_KINDS: Dict[str, Callable[[random.Random], str]] = {
+    'temperature': lambda rng: f" {rng.uniform(-20, 90):.1f} Â°C".replace('.', ','),
+    'switch': lambda rng: rng.choice(('EIN', 'AUS')),
+    'flow': lambda rng: f" {rng.randint(0, 900)} l/h",
+    'power': lambda rng: f" {rng.uniform(0, 15):.2f} kW".replace('.', ','),
+    'energy': lambda rng: f" {rng.uniform(0, 9999):.1f} kWh".replace('.', ','),
+    'runtime': lambda rng: f" {rng.randint(0, 60)} min",
+    'counter': lambda rng: f" {rng.randint(0, 500)}",
+    'modus': lambda rng: f"{rng.choice(('AUTO', 'HAND'))}<br>  {rng.uniform(0, 100):.1f} %".replace('.', ','),
+}
+
+_LABELS = {
+    'temperature': 'T.Fuehler {n} Wert',
+    'switch': 'Pumpe {n} Zustand (Ein/Aus)',
+    'flow': 'Durchfluss {n} Wert',
+    'power': 'WMZ {n} Momentanleistung',
+    'energy': 'WMZ {n} Kilowattstunden (Zähler)',
+    'runtime': 'Laufzeit {n}',
+    'counter': 'Zähler {n} Startversuche',
+    'modus': 'Ausgang {n} (analog)  Modus (Hand/Auto)',
+}
+
+KINDS = tuple(_KINDS)
+# label keyword -> kind, checked in order (a "Kilowattstunden (Zähler)" label is energy, not a counter)
+_KIND_HINTS = (('Modus', 'modus'), ('Durchfluss', 'flow'), ('Momentanleistung', 'power'),
+               ('Kilowattstunden', 'energy'), ('kWh', 'energy'), ('Laufzeit', 'runtime'), ('Zähler', 'counter'),
+               ('Zustand', 'switch'), ('Status', 'switch'), ('Pumpe', 'switch'), ('Ventil', 'switch'))
+# roughly the mix seen on real installations
+DEFAULT_WEIGHTS = {'temperature': 40, 'switch': 30, 'flow': 6, 'power': 5, 'energy': 5, 'runtime': 4,
+                   'counter': 6, 'modus': 4}
+
+
+def kind_for_label(label: str) -> str:
+    """Guess the object kind from an XML label; unknown labels are temperatures."""
+    for hint, kind in _KIND_HINTS:
+        if hint in label:
+            return kind
+    return 'temperature'
+
+
+class SyntheticSchema:
+    """Object kinds per page of a made-up TA-Designer export."""
+
+    def __init__(self, pages: Sequence[Sequence[str]], pic_every: int = 0):
+        self.pages = [list(kinds) for kinds in pages]
+        self.pic_every = pic_every
+
+    @classmethod
+    def generate(cls, positions: Sequence[int], seed: Optional[int] = 0, pic_every: int = 7) -> 'SyntheticSchema':
+        """Schema with ``positions[i]`` value objects on page i, kinds drawn by DEFAULT_WEIGHTS."""
+        rng = random.Random(seed)
+        kinds = list(DEFAULT_WEIGHTS)
+        weights = [DEFAULT_WEIGHTS[k] for k in kinds]
+        return cls([rng.choices(kinds, weights, k=n) for n in positions], pic_every=pic_every)
+
+    @classmethod
+    def from_xml(cls, root: ET.Element) -> 'SyntheticSchema':
+        """Schema whose pages match the value objects of a real TA-Designer export."""
+        pages = []
+        Seite = 0
+        while root.find(f'./Seiten/Seite_{Seite}') is not None:
+            objects = read_page_objects(root, Seite)
+            pages.append([kind_for_label(label) for label, _typ, skip in objects if not skip])
+            Seite += 1
+        return cls(pages)
+
+    def labels(self, Seite: int) -> List[str]:
+        return [_LABELS[kind].format(n=f'{Seite + 1}.{pos}') for pos, kind in enumerate(self.pages[Seite])]
+
+    def xml(self) -> str:
+        """TA-Designer style XML; every ``pic_every``-th object is a picture without a value."""
+        out = ['<?xml version="1.0" encoding="utf-8"?>', '<TA>', '  <Seiten>']
+        for Seite in range(len(self.pages)):
+            out.append(f'    <Seite_{Seite}>')
+            out.append('      <Objekte>')
+            obj = 0
+            for pos, label in enumerate(self.labels(Seite)):
+                if self.pic_every and pos % self.pic_every == 0:
+                    out.append(f'        <Objekt_{obj} Bezeichnung="Bild {obj}" Objekt_Typ="Pic_Obj"/>')
+                    obj += 1
+                bezeichnung = quoteattr(f'Seite {Seite + 1}: {label}')
+                out.append(f'        <Objekt_{obj} Bezeichnung={bezeichnung} Objekt_Typ="Text_Obj"/>')
+                obj += 1
+            out.append('      </Objekte>')
+            out.append(f'    </Seite_{Seite}>')
+        out.extend(['  </Seiten>', '</TA>', ''])
+        return '\n'.join(out)
+
+    def html(self, Seite: int, rng: Optional[random.Random] = None) -> str:
+        """One schematic page as served by ``schematic_files/<Seite+1>.cgi``."""
+        rng = rng or random.Random()
+        out = []
+        for pos, kind in enumerate(self.pages[Seite]):
+            fragment = _KINDS[kind](rng)
+            if kind in ('modus', 'switch') and pos % 2:
+                fragment = f"\n<a href=\"javascript:loadChanger('10{pos:05X}0180');\">\n{fragment}</a>\n"
+            else:
+                fragment = f"\n{fragment}"
+            out.append(f'<div id="pos{pos}" >{fragment}</div>\n')
+        return ''.join(out)